@@ -0,0 +1,221 @@
+"""
+Benchmarks every verification layer across archive sizes, entry counts,
+compression levels and formats.
+
+Usage:
+    python benchmarks/layers.py [--sizes-mb 1 64] [--entries 1 1000]
+                                [--formats zip tar.gz 7z] [--engines 7z native]
+                                [--output report.json]
+
+Archives are generated in a temporary directory. Each operation is timed
+in a fresh child process so that its peak RSS (and that of the 7z
+processes it starts) can be attributed to it alone. The report is written
+as JSON; a summary table is printed as the cases complete.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Add src to path so we can import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from data_integrity_tool.core import (
+    calculate_file_hash,
+    verify_archive_integrity,
+    get_archive_content_hash,
+    create_hashes,
+    verify_layers,
+    check_7z_installed,
+    ENGINES,
+)
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+MB = 1024 * 1024
+FORMATS = ("zip", "tar.gz", "7z")
+COMPRESSION_LEVELS = {"store": 0, "fast": 1, "max": 9}
+# Half of every entry is random (incompressible), half a repeated pattern
+PATTERN = b"The quick brown fox jumps over the lazy dog. " * 23
+
+OPERATIONS = {
+    "file_hash": lambda archive, engine: calculate_file_hash(archive),
+    "integrity": lambda archive, engine: verify_archive_integrity(archive, engine),
+    "content_hash": lambda archive, engine: get_archive_content_hash(archive, engine),
+    "create": lambda archive, engine: create_hashes(archive, engine=engine),
+    "verify": lambda archive, engine: verify_layers(archive, engine=engine),
+}
+# Layer 1 hashing does not depend on the archive engine
+ENGINE_INDEPENDENT = {"file_hash"}
+
+def entry_data(size: int) -> bytes:
+    random_part = os.urandom(size // 2)
+    pattern_part = (PATTERN * (size // len(PATTERN) + 1))[:size - len(random_part)]
+    return random_part + pattern_part
+
+def write_entries(directory: Path, size_mb: int, entries: int) -> Path:
+    """Writes the files to archive and returns the directory holding them."""
+    source = directory / "source"
+    source.mkdir()
+    entry_size = max(1, size_mb * MB // entries)
+    for i in range(entries):
+        subdir = source / f"d{i % 16:02d}"
+        subdir.mkdir(exist_ok=True)
+        (subdir / f"f{i:06d}.bin").write_bytes(entry_data(entry_size))
+    return source
+
+def build_archive(source: Path, target: Path, fmt: str, level: int) -> Path:
+    files = sorted(p for p in source.rglob("*") if p.is_file())
+    if fmt == "zip":
+        method = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(target, "w", method, compresslevel=level or None) as zf:
+            for f in files:
+                zf.write(f, f.relative_to(source).as_posix())
+    elif fmt == "tar.gz":
+        with tarfile.open(target, "w:gz", compresslevel=max(level, 1)) as tf:
+            for f in files:
+                tf.add(f, f.relative_to(source).as_posix())
+    elif fmt == "7z":
+        subprocess.run(
+            ["7z", "a", f"-mx={level}", str(target), "."],
+            cwd=source, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return target
+
+def peak_rss_mb(who) -> float:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / MB
+
+def measure(operation: str, engine: str, archive: Path, repeat: int) -> dict:
+    """Runs in the child process: times one operation and reports its footprint."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        OPERATIONS[operation](archive, engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": best,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "child_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+
+def measure_in_child(operation: str, engine: str, archive: Path, repeat: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, __file__, "--measure", operation, engine, str(archive), "--repeat", str(repeat)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+def run_case(workdir: Path, fmt: str, compression: str, size_mb: int, entries: int, engines, repeat: int):
+    case_dir = Path(tempfile.mkdtemp(dir=workdir))
+    source = write_entries(case_dir, size_mb, entries)
+    archive = build_archive(source, case_dir / f"bench.{fmt}", fmt, COMPRESSION_LEVELS[compression])
+    data_bytes = sum(p.stat().st_size for p in source.rglob("*") if p.is_file())
+    shutil.rmtree(source)
+    archive_bytes = archive.stat().st_size
+
+    for operation in OPERATIONS:
+        for engine in engines:
+            if operation in ENGINE_INDEPENDENT and engine != engines[0]:
+                continue
+            measured = measure_in_child(operation, engine, archive, repeat)
+            seconds = measured["seconds"]
+            yield {
+                "format": fmt,
+                "compression": compression,
+                "size_mb": size_mb,
+                "entries": entries,
+                "engine": None if operation in ENGINE_INDEPENDENT else engine,
+                "operation": operation,
+                "archive_bytes": archive_bytes,
+                "data_bytes": data_bytes,
+                "seconds": seconds,
+                "archive_mb_s": archive_bytes / MB / seconds,
+                "data_mb_s": data_bytes / MB / seconds,
+                "files_s": entries / seconds,
+                "peak_rss_mb": measured["peak_rss_mb"],
+                "child_peak_rss_mb": measured["child_peak_rss_mb"],
+            }
+    shutil.rmtree(case_dir)
+
+def format_row(record: dict) -> str:
+    rss = record["peak_rss_mb"]
+    child_rss = record["child_peak_rss_mb"]
+    return (
+        f"{record['format']:<7}{record['compression']:<6}{record['size_mb']:>6}{record['entries']:>8} "
+        f"{record['operation']:<13}{record['engine'] or '-':<7}"
+        f"{record['seconds']:>9.3f}{record['data_mb_s']:>9.1f}{record['files_s']:>10.0f}"
+        f"{rss if rss is not None else float('nan'):>8.1f}{child_rss if child_rss is not None else float('nan'):>8.1f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Verification layer benchmark")
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 64], help="Total uncompressed size per archive")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1, 1000], help="Number of files per archive")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--compression", nargs="+", choices=COMPRESSION_LEVELS, default=["store", "fast"])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--output", default="bench_report.json", help="Where to write the JSON report")
+    parser.add_argument("--workdir", help="Directory for generated archives (default: system temp)")
+    parser.add_argument("--measure", nargs=3, metavar=("OPERATION", "ENGINE", "ARCHIVE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        operation, engine, archive = args.measure
+        print(json.dumps(measure(operation, engine, Path(archive), args.repeat)))
+        return
+
+    formats = list(args.formats)
+    if not check_7z_installed():
+        # Without 7z only the native engine on zip/tar.gz can run
+        print("[WARN] 7z not found: skipping the 7z format and engine.", file=sys.stderr)
+        formats = [f for f in formats if f != "7z"]
+        engines = [e for e in args.engines if e != "7z"]
+    else:
+        engines = list(args.engines)
+    if not engines:
+        parser.error("No runnable engine selected.")
+
+    records = []
+    print(f"{'format':<7}{'comp':<6}{'MiB':>6}{'entries':>8} {'operation':<13}{'engine':<7}"
+          f"{'seconds':>9}{'MiB/s':>9}{'files/s':>10}{'RSS':>8}{'7z RSS':>8}")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for fmt in formats:
+            for compression in args.compression:
+                for size_mb in args.sizes_mb:
+                    for entries in args.entries:
+                        for record in run_case(Path(workdir), fmt, compression, size_mb, entries, engines, args.repeat):
+                            records.append(record)
+                            print(format_row(record), flush=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": records,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
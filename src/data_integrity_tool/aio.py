@@ -0,0 +1,243 @@
+"""
+asyncio variants of the core API, for services that multiplex many
+verifications on one event loop.
+
+7z runs through asyncio.create_subprocess_exec and waits for its
+scheduler slot without blocking a thread; file hashing and the native
+engine run in the loop's default executor. The layer logic itself is
+shared with the blocking functions in core, so results are identical.
+
+Cancelling a call kills its 7z process and writes nothing. A hash
+already running in the executor finishes there, but its result is
+discarded; pass a CancelToken (or a timeout) as well to stop it early.
+Small metadata reads (hash files, the cache) run on the loop.
+"""
+import asyncio
+import contextvars
+import functools
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from . import core
+from .core import (
+    ArchiveCheck,
+    ArchiveError,
+    CancelToken,
+    InvalidArchiveError,
+    OperationCancelled,
+    ProgressCallback,
+    SevenZipResult,
+    SevenZipScheduler,
+    ENGINE_7Z,
+    ENGINE_NATIVE,
+    CANCEL_POLL_INTERVAL,
+    SEVENZIP_READ_SIZE,
+    STDERR_TAIL_BYTES,
+)
+
+async def _in_thread(function, *args) -> Any:
+    """Runs function in the default executor, in a copy of the current context."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(context.run, function, *args))
+
+@asynccontextmanager
+async def _slot(scheduler: SevenZipScheduler, archive_path: Path, cancel: Optional[CancelToken] = None):
+    """SevenZipScheduler.slot without blocking the event loop."""
+    need = await _in_thread(scheduler.estimate, archive_path) if scheduler.memory_budget else 0
+    loop = asyncio.get_running_loop()
+    while True:
+        released = loop.create_future()
+
+        def wake(released=released):
+            loop.call_soon_threadsafe(lambda: released.done() or released.set_result(None))
+
+        # Listening before trying means a release in between is not missed
+        scheduler.add_release_listener(wake)
+        try:
+            if scheduler.try_acquire(need):
+                break
+            if cancel is None:
+                await released
+            else:
+                await asyncio.wait({released}, timeout=CANCEL_POLL_INTERVAL)
+                cancel.check()
+        finally:
+            scheduler.remove_release_listener(wake)
+    try:
+        yield
+    finally:
+        scheduler.release(need)
+
+async def _collect_tail(stream: asyncio.StreamReader, tail: bytearray):
+    while True:
+        chunk = await stream.read(SEVENZIP_READ_SIZE)
+        if not chunk:
+            return
+        tail += chunk
+        del tail[:-STDERR_TAIL_BYTES]
+
+async def _kill_when_cancelled(process: asyncio.subprocess.Process, cancel: CancelToken):
+    while not cancel.cancelled:
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+    process.kill()
+
+async def arun_7z_test(
+    archive_path: Path,
+    content_hash: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> SevenZipResult:
+    """core.run_7z_test as a coroutine; progress is called on the event loop."""
+    scheduler = core.default_scheduler
+    args = core.sevenzip_test_args(archive_path, content_hash, progress, scheduler)
+    async with _slot(scheduler, archive_path, cancel):
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        stderr_tail = bytearray()
+        stderr_reader = asyncio.ensure_future(_collect_tail(process.stderr, stderr_tail))
+        killer = asyncio.ensure_future(_kill_when_cancelled(process, cancel)) if cancel is not None else None
+        parser = core.SevenZipOutputParser(content_hash, progress)
+        try:
+            while True:
+                chunk = await process.stdout.read(SEVENZIP_READ_SIZE)
+                parser.feed(chunk)
+                if not chunk:
+                    break
+            await stderr_reader
+            await process.wait()
+        finally:
+            if killer is not None:
+                killer.cancel()
+            if process.returncode is None:
+                # Cancelled (or failed) while 7z was still running
+                process.kill()
+                stderr_reader.cancel()
+                await asyncio.shield(process.wait())
+            core.note_subprocess(started, process.returncode)
+
+    if cancel is not None:
+        cancel.check()
+    return SevenZipResult(process.returncode, parser.digest, stderr_tail.decode(errors="replace"))
+
+async def acheck_archive(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> ArchiveCheck:
+    """core.check_archive as a coroutine."""
+    core.check_engine(engine)
+    if engine == ENGINE_NATIVE:
+        native = await _in_thread(core.native_check_archive, archive_path)
+        if native is not None:
+            return native
+
+    core.ensure_7z_installed()
+
+    try:
+        result = await arun_7z_test(archive_path, content_hash=True, progress=progress, cancel=cancel)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        raise ArchiveError(f"Failed to run 7z: {e}")
+
+    if result.returncode != 0:
+        return ArchiveCheck(ok=False, content_hash=None, error=result.stderr)
+    return ArchiveCheck(ok=True, content_hash=result.content_hash, error="")
+
+async def averify_archive_integrity(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> bool:
+    """core.verify_archive_integrity as a coroutine."""
+    core.check_engine(engine)
+    if engine == ENGINE_NATIVE:
+        native = await _in_thread(core.native_check_archive, archive_path)
+        if native is not None:
+            return native.ok
+
+    if not core.check_7z_installed():
+        raise RuntimeError("7z is not installed or not in PATH.")
+
+    try:
+        return (await arun_7z_test(archive_path, progress=progress, cancel=cancel)).returncode == 0
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        raise ArchiveError(f"Failed to run 7z: {e}")
+
+async def aget_archive_content_hash(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Optional[str]:
+    """core.get_archive_content_hash as a coroutine."""
+    core.check_engine(engine)
+    try:
+        check = await acheck_archive(archive_path, engine, progress, cancel)
+    except (core.DependencyError, OperationCancelled):
+        raise
+    except Exception as e:
+        raise ArchiveError(f"Failed to get content hash: {e}")
+
+    if not check.ok:
+        raise InvalidArchiveError(f"Failed to get content hash: 7z command failed: {check.error}")
+    return check.content_hash
+
+# Steps that have a native coroutine; everything else runs in the executor
+_COROUTINES = {
+    core.check_archive: acheck_archive,
+    core.verify_archive_integrity: averify_archive_integrity,
+    core.get_archive_content_hash: aget_archive_content_hash,
+}
+
+async def _run_steps(steps: core.Steps) -> Any:
+    """core.run_steps for the event loop."""
+    background = []
+    try:
+        request = next(steps)
+        while True:
+            try:
+                if isinstance(request, core.StepStart):
+                    result = asyncio.ensure_future(_in_thread(request.function, *request.args))
+                    background.append(result)
+                elif isinstance(request, core.StepJoin):
+                    result = await request.handle
+                elif request.function in _COROUTINES:
+                    result = await _COROUTINES[request.function](*request.args)
+                else:
+                    result = await _in_thread(request.function, *request.args)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        for future in background:
+            future.cancel()
+        steps.close()
+
+async def acreate_hashes(archive_path: Path, **options) -> Tuple[Path, Optional[Path]]:
+    """core.create_hashes as a coroutine; takes the same keyword arguments."""
+    return await _run_steps(core.create_hashes_steps(archive_path, **options))
+
+async def averify_layers(
+    archive_path: Path,
+    hash_file: Optional[Path] = None,
+    content_hash_file: Optional[Path] = None,
+    **options
+) -> dict:
+    """
+    core.verify_layers as a coroutine; takes the same arguments.
+    cpu_seconds in the stats counts the event loop thread, which other
+    tasks share.
+    """
+    return await _run_steps(core.verify_layers_steps(archive_path, hash_file, content_hash_file, **options))
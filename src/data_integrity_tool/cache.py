@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+CACHE_DIR_ENV = "DATA_INTEGRITY_CACHE_DIR"
+CACHE_FILE_NAME = "hash_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 100_000
+# Counting rows is a full scan, so the size bound is enforced every N writes
+EVICTION_INTERVAL = 100
+
+FileIdentity = Tuple[int, int, int, int]
+
+class CacheEntry(NamedTuple):
+    """What is known about one version of a file."""
+    file_hashes: Dict[str, str]
+    archive_ok: Optional[bool]
+    content_hash: Optional[str]
+    content_known: bool
+
+def file_identity(path: Path) -> FileIdentity:
+    """Returns (device, inode, size, mtime_ns); any change to the file changes the key."""
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def default_cache_dir() -> Optional[Path]:
+    """The cache directory configured through the environment, if any."""
+    value = os.environ.get(CACHE_DIR_ENV)
+    return Path(value) if value else None
+
+class HashCache:
+    """
+    Persistent SQLite cache of verification results keyed by file identity.
+
+    Entries hold the file hashes (per algorithm), the Layer 2 verdict and
+    the Layer 3 content hash of one exact version of a file, so unchanged
+    archives can be re-verified with a single stat call. Only passing
+    Layer 2 verdicts are stored; failures are always re-examined so their
+    7z diagnostics stay available. The table is bounded to max_entries
+    rows with least-recently-used eviction. Safe to share between threads.
+    """
+
+    def __init__(self, directory: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        # Imported on first use: the cache is opt-in and sqlite3 adds to every start-up
+        import sqlite3
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / CACHE_FILE_NAME
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                file_hashes TEXT NOT NULL DEFAULT '{}',
+                archive_ok INTEGER,
+                content_hash TEXT,
+                content_known INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
+
+    def lookup(self, key: FileIdentity) -> Optional[CacheEntry]:
+        """Returns the entry for key, marking it as recently used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hashes, archive_ok, content_hash, content_known FROM files "
+                "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE files SET last_used = ? WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                (time.time(), *key)
+            )
+        file_hashes, archive_ok, content_hash, content_known = row
+        return CacheEntry(
+            file_hashes=json.loads(file_hashes),
+            archive_ok=None if archive_ok is None else bool(archive_ok),
+            content_hash=content_hash,
+            content_known=bool(content_known)
+        )
+
+    def store(
+        self,
+        key: FileIdentity,
+        file_hashes: Optional[Dict[str, str]] = None,
+        archive_ok: Optional[bool] = None,
+        content_hash: Optional[str] = None,
+        content_known: bool = False
+    ):
+        """
+        Merges new facts into the entry for key. Fields left as None keep
+        their cached value; failed Layer 2 verdicts are ignored.
+        """
+        if archive_ok is False:
+            return
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hashes, archive_ok, content_hash, content_known FROM files "
+                "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                key
+            ).fetchone()
+            merged_hashes = json.loads(row[0]) if row else {}
+            merged_hashes.update(file_hashes or {})
+            if row:
+                archive_ok = archive_ok if archive_ok is not None else row[1]
+                if not content_known and row[3]:
+                    content_hash, content_known = row[2], True
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(dev, ino, size, mtime_ns, file_hashes, archive_ok, content_hash, content_known, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(merged_hashes), archive_ok, content_hash, int(content_known), time.time())
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= EVICTION_INTERVAL:
+                self._evict()
+
+    def _evict(self):
+        """Drops least recently used rows beyond max_entries. Caller holds the lock."""
+        self._writes_since_eviction = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM files WHERE rowid IN (SELECT rowid FROM files ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()
+        return count
@@ -1,21 +1,42 @@
 import argparse
+import json
 import sys
+from contextlib import contextmanager
 from pathlib import Path
+from typing import List, Optional
 from colorama import init, Fore, Style
+from .cache import HashCache, default_cache_dir, CACHE_DIR_ENV
+from .journal import Journal
+from .sums import SUMS_FILE_NAME
+from .stream import copy_archive, create_from_stream, digest_stream, verify_stream
 from .core import (
     create_hashes, 
-    verify_archive_integrity, 
-    get_archive_content_hash, 
-    calculate_file_hash, 
     find_hash_files,
+    sidecar_archive_path,
     verify_layers,
-    ArchiveError,
-    DependencyError
+    verify_members,
+    layer_timed_out,
+    manifest_path_for,
+    create_tree,
+    verify_tree,
+    set_7z_limits,
+    hash_file_path,
+    tree_hash_path_for,
+    hash_tag,
+    HASH_ALGORITHMS,
+    DEFAULT_HASH_ALGORITHM,
+    DEFAULT_SEGMENT_SIZE,
+    ENGINES,
+    ENGINE_7Z,
+    POLICIES,
+    POLICY_FULL,
+    POLICY_FAST,
+    InvalidArchiveError,
+    DependencyError,
+    OperationTimedOut,
+    CancelToken
 )
 
-# Initialize colorama
-init()
-
 # Colors
 RED = Fore.RED
 GREEN = Fore.GREEN
@@ -28,47 +49,202 @@ def print_color(text: str, color: str = NC):
     # colorama handles stripping colors if not a tty or on Windows
     print(f"{color}{text}{NC}")
 
-def cmd_create(args):
-    archive_path = Path(args.archive)
-    
-    # Verify valid archive
+@contextmanager
+def cache_from_args(args):
+    """Opens the hash cache selected by --cache-dir/--no-cache, or yields None."""
+    directory = None if args.no_cache else (args.cache_dir or default_cache_dir())
+    cache = HashCache(Path(directory)) if directory else None
+    try:
+        yield cache
+    finally:
+        if cache:
+            cache.close()
+
+LAYER_LABELS = {
+    "layer1": "Archive File",
+    "layer2": "Data Structure",
+    "layer3": "Content Authenticity",
+}
+MIB = 1024 * 1024
+
+def stats_hook_from_args(args):
+    """Returns (hook, collected) if --stats/--stats-json was given, else (None, {})."""
+    collected = {}
+    if not (args.stats or args.stats_json):
+        return None, collected
+    def hook(archive_path, layer, stats):
+        collected[layer] = stats
+    return hook, collected
+
+def report_stats(args, archive_path: Path, collected: dict):
+    """Prints the per-layer stats and/or writes them as JSON, as requested."""
+    if args.stats and collected:
+        print_color("Layer statistics:", BLUE)
+        for layer, stats in collected.items():
+            line = (
+                f"  {LAYER_LABELS.get(layer, layer) + ':':<22}wall {stats['wall_seconds']:.3f}s, "
+                f"cpu {stats['cpu_seconds']:.3f}s, read {stats['bytes_read'] / MIB:.1f} MiB"
+            )
+            if stats["subprocess_count"]:
+                line += f", 7z {stats['subprocess_seconds']:.3f}s (exit {stats['subprocess_returncode']})"
+            if stats["cached"]:
+                line += " [cached]"
+            print(line)
+        print()
+    if args.stats_json:
+        report = json.dumps({"archive": str(archive_path), "layers": collected}, indent=1)
+        if args.stats_json == "-":
+            print(report)
+        else:
+            with open(args.stats_json, "w", encoding="utf-8") as f:
+                f.write(report + "\n")
+
+def cmd_create_stream(args):
+    """create -: hashes (and with --output saves) the archive arriving on stdin."""
+    unsupported = unsupported_stream_options(args)
+    if unsupported:
+        print_color(f"[ERROR] {', '.join(unsupported)} cannot be used when creating hashes from stdin.", RED)
+        sys.exit(1)
+    algorithms = args.algorithm or [DEFAULT_HASH_ALGORITHM]
+    print_color("Reading archive from stdin...", CYAN)
     try:
-        if not verify_archive_integrity(archive_path):
-             print_color(f"[ERROR] '{archive_path}' is not a valid archive file.", RED)
-             sys.exit(1)
-    except (ArchiveError, DependencyError) as e:
+        if args.output:
+            hash_file, content_hash_file = create_from_stream(
+                sys.stdin.buffer, Path(args.output), algorithms, directory_sums=args.directory_sums, engine=args.engine
+            )
+        else:
+            digest = digest_stream(sys.stdin.buffer, algorithms, engine=args.engine)
+    except InvalidArchiveError:
+        print_color("[ERROR] stdin is not a valid archive file.", RED)
+        sys.exit(1)
+    except DependencyError as e:
         print_color(f"[ERROR] Failed to check archive: {e}", RED)
         sys.exit(1)
     except Exception as e:
-        print_color(f"[ERROR] Unexpected error checking archive: {e}", RED)
+        print_color(f"[ERROR] Failed to create hashes: {e}", RED)
         sys.exit(1)
 
-    print_color("Generating Archive File Hash...", CYAN)
-    try:
-        hash_file, content_hash_file = create_hashes(archive_path)
-        print_color(f"[SUCCESS] Created {hash_file.name}", GREEN)
-        
-        print_color("Generating Content Hash (Internal 7z data)...", CYAN)
-        if content_hash_file:
+    if args.output:
+        archive_path = Path(args.output)
+        print_color(f"[SUCCESS] Saved {archive_path.name}", GREEN)
+        if args.directory_sums:
+            print_color(f"[SUCCESS] Recorded archive hash in {hash_file.name}", GREEN)
+        else:
+            for algorithm in dict.fromkeys(algorithms):
+                print_color(f"[SUCCESS] Created {hash_file_path(archive_path, algorithm).name}", GREEN)
+        if content_hash_file and args.directory_sums:
+            print_color(f"[SUCCESS] Recorded content hash in {content_hash_file.name}", GREEN)
+        elif content_hash_file:
             print_color(f"[SUCCESS] Created {content_hash_file.name}", GREEN)
         else:
-            print_color("[WARN] Could not generate content hash (maybe not supported for this format).", YELLOW)
+            print_color("[WARN] Could not generate content hash (ZIP and 7z cannot be tested from a stream).", YELLOW)
+        return
+
+    # Nowhere to write sidecars: print the hashes in sha256sum --tag style
+    if digest.check is not None and not digest.check.ok:
+        print_color("[ERROR] stdin is not a valid archive file.", RED)
+        sys.exit(1)
+    for algorithm in dict.fromkeys(algorithms):
+        print(f"{hash_tag(algorithm)} (-) = {digest.file_hashes[algorithm]}")
+    if digest.check is not None and digest.check.content_hash:
+        print(f"CONTENT-SHA256 (-) = {digest.check.content_hash}")
+    else:
+        print_color("[WARN] Could not generate content hash (use --output to test ZIP and 7z archives).", YELLOW)
+
+def cmd_create(args):
+    if args.archive == "-":
+        cmd_create_stream(args)
+        return
+
+    archive_path = Path(args.archive)
+    stats_hook, collected = stats_hook_from_args(args)
+    algorithms = args.algorithm or [DEFAULT_HASH_ALGORITHM]
 
+    # Validation happens inside the same 7z pass that produces the content hash
+    print_color("Generating Archive File Hash...", CYAN)
+    try:
+        with cache_from_args(args) as cache:
+            hash_file, content_hash_file = create_hashes(
+                archive_path, cache=cache, refresh=args.refresh, engine=args.engine,
+                manifest=args.manifest, stats_hook=stats_hook, algorithms=algorithms,
+                tree_hash=args.tree_hash, segment_size=args.segment_size * MIB,
+                directory_sums=args.directory_sums
+            )
+    except InvalidArchiveError:
+        print_color(f"[ERROR] '{archive_path}' is not a valid archive file.", RED)
+        sys.exit(1)
+    except DependencyError as e:
+        print_color(f"[ERROR] Failed to check archive: {e}", RED)
+        sys.exit(1)
     except Exception as e:
         print_color(f"[ERROR] Failed to create hashes: {e}", RED)
         sys.exit(1)
 
-def cmd_verify(args):
+    if args.tree_hash:
+        print_color(f"[SUCCESS] Created {tree_hash_path_for(archive_path).name}", GREEN)
+    elif args.directory_sums:
+        print_color(f"[SUCCESS] Recorded archive hash in {hash_file.name}", GREEN)
+    else:
+        for algorithm in dict.fromkeys(algorithms):
+            print_color(f"[SUCCESS] Created {hash_file_path(archive_path, algorithm).name}", GREEN)
+
+    print_color("Generating Content Hash (Internal 7z data)...", CYAN)
+    if content_hash_file and args.directory_sums:
+        print_color(f"[SUCCESS] Recorded content hash in {content_hash_file.name}", GREEN)
+    elif content_hash_file:
+        print_color(f"[SUCCESS] Created {content_hash_file.name}", GREEN)
+    else:
+        print_color("[WARN] Could not generate content hash (maybe not supported for this format).", YELLOW)
+
+    if args.manifest:
+        print_color(f"[SUCCESS] Created {manifest_path_for(archive_path).name}", GREEN)
+
+    report_stats(args, archive_path, collected)
+
+def print_member_report(result: dict):
+    """Prints the outcome of verify_members, naming every bad entry."""
+    details = result["details"]
+    if result["status"] == "PASSED":
+        print_color(f"[PASS] Members: {result['message']}.", GREEN)
+        return
+    if result["status"] == "SKIPPED":
+        print_color(f"[SKIP] Members: {result['message']}.", YELLOW)
+        return
+    if result["status"] == "ERROR":
+        print_color(f"[ERROR] Members: {result['message']}", RED)
+        return
+
+    print_color(f"[FAIL] Members: {len(details['mismatches'])} of {details['checked']} checked member(s) differ.", RED)
+    for mismatch in details["mismatches"]:
+        expected, actual = mismatch["expected"], mismatch["actual"]
+        print(f"        {RED}{mismatch['name']}{NC}")
+        print(f"          Expected: size {expected['size']}, crc32 {expected['crc32']}, sha256 {expected['sha256']}")
+        print(f"          Actual:   size {actual['size']}, crc32 {actual['crc32']}, sha256 {actual['sha256']}")
+    for name in details["missing"]:
+        print(f"        {RED}{name}{NC} (missing from archive)")
+    for name in details["unexpected"]:
+        print(f"        {YELLOW}{name}{NC} (not in manifest)")
+
+def cmd_verify_members(args):
     archive_path = Path(args.archive)
-    hash_file = Path(args.hash_file) if args.hash_file else None
-    content_hash_file = Path(args.content_hash_file) if args.content_hash_file else None
+    manifest_file = Path(args.manifest_file) if args.manifest_file else None
+    result = verify_members(archive_path, manifest_file, patterns=args.members, engine=args.engine)
+    print_member_report(result)
+    if result["status"] != "PASSED":
+        sys.exit(1)
 
-    # Auto discovery
+def discover_hash_files(archive_path: Path, hash_file, content_hash_file):
+    """Reports which hash files will be used and returns the content hash file."""
     found_hashes = find_hash_files(archive_path)
     
-    if not hash_file and found_hashes['archive_hash']:
-        hash_file = found_hashes['archive_hash']
-        print_color(f"[INFO] Automatically discovered archive hash file: {hash_file.name}", CYAN)
+    if not hash_file and found_hashes['sums'] and found_hashes['archive_hash'] == found_hashes['sums']:
+        print_color(f"[INFO] Using archive hash recorded in {found_hashes['sums'].name}", CYAN)
+    elif not hash_file and found_hashes['tree_hash']:
+        print_color(f"[INFO] Automatically discovered tree hash file: {found_hashes['tree_hash'].name}", CYAN)
+    elif not hash_file and found_hashes['archive_hashes']:
+        # All discovered sidecars are checked from a single read of the archive
+        for discovered in found_hashes['archive_hashes'].values():
+            print_color(f"[INFO] Automatically discovered archive hash file: {discovered.name}", CYAN)
     elif hash_file:
         print_color(f"[INFO] Using provided archive hash file: {hash_file.name}", CYAN)
     else:
@@ -76,17 +252,98 @@ def cmd_verify(args):
 
     if not content_hash_file and found_hashes['content_hash']:
         content_hash_file = found_hashes['content_hash']
-        print_color(f"[INFO] Automatically discovered content hash file: {content_hash_file.name}", CYAN)
+        if content_hash_file == found_hashes['sums']:
+            print_color(f"[INFO] Using content hash recorded in {content_hash_file.name}", CYAN)
+        else:
+            print_color(f"[INFO] Automatically discovered content hash file: {content_hash_file.name}", CYAN)
     elif content_hash_file:
         print_color(f"[INFO] Using provided content hash file: {content_hash_file.name}", CYAN)
     else:
         print_color("[INFO] No content hash file found.", YELLOW)
     
     print("-" * 40)
+    return content_hash_file
+
+def stream_archive_path(args) -> Optional[Path]:
+    """
+    The archive a stream on stdin is verified as: --output, --name, or
+    the archive a given sidecar belongs to.
+    """
+    if args.output or args.name:
+        return Path(args.output or args.name)
+    for sidecar in (args.hash_file, args.content_hash_file):
+        archive_path = sidecar_archive_path(Path(sidecar)) if sidecar else None
+        if archive_path:
+            return archive_path
+    return None
+
+def unsupported_stream_options(args) -> List[str]:
+    """The given options the stream functions have no equivalent for: they make one pass, with no per-layer stats or cache."""
+    given = {
+        "--cache-dir": args.cache_dir is not None,
+        "--no-cache": args.no_cache,
+        "--refresh": args.refresh,
+        "--stats": args.stats,
+        "--stats-json": args.stats_json,
+    }
+    if args.command == "verify":
+        given.update({
+            "--policy": args.policy != POLICY_FULL,
+            "--fail-fast": args.fail_fast,
+            "--deadline": args.deadline is not None,
+            "--layer-timeout": args.layer_timeout is not None,
+        })
+    return [option for option, used in given.items() if used]
 
-    # Perform verification using core logic
-    results = verify_layers(archive_path, hash_file, content_hash_file)
+def cmd_verify(args):
+    if args.members:
+        cmd_verify_members(args)
+        return
 
+    hash_file = Path(args.hash_file) if args.hash_file else None
+    content_hash_file = Path(args.content_hash_file) if args.content_hash_file else None
+    collected = {}
+
+    if args.archive == "-":
+        unsupported = unsupported_stream_options(args)
+        if unsupported:
+            print_color(f"[ERROR] {', '.join(unsupported)} cannot be used when verifying stdin.", RED)
+            sys.exit(1)
+        archive_path = stream_archive_path(args)
+        if archive_path is None:
+            print_color("[ERROR] Verifying stdin needs --output, --name or a hash file to know which archive it is.", RED)
+            sys.exit(1)
+        content_hash_file = discover_hash_files(archive_path, hash_file, content_hash_file)
+        print_color("Reading archive from stdin...", CYAN)
+        try:
+            results = verify_stream(
+                sys.stdin.buffer, archive_path, hash_file, content_hash_file, output=bool(args.output),
+                engine=args.engine, cancel=CancelToken(args.timeout) if args.timeout else None
+            )
+        except OperationTimedOut:
+            print_color("[ERROR] Timed out reading the archive from stdin.", RED)
+            sys.exit(1)
+        except Exception as e:
+            print_color(f"[ERROR] Failed to verify stream: {e}", RED)
+            sys.exit(1)
+    else:
+        archive_path = Path(args.archive)
+        content_hash_file = discover_hash_files(archive_path, hash_file, content_hash_file)
+        stats_hook, collected = stats_hook_from_args(args)
+
+        # Perform verification using core logic
+        with cache_from_args(args) as cache:
+            results = verify_layers(
+                archive_path, hash_file, content_hash_file, cache=cache, refresh=args.refresh,
+                engine=args.engine, stats_hook=stats_hook,
+                policy=args.policy, fail_fast=args.fail_fast, deadline=args.deadline,
+                timeout=args.timeout, layer_timeout=args.layer_timeout
+            )
+
+    report_layers(args, archive_path, results, collected)
+
+def report_layers(args, archive_path: Path, results: dict, collected: dict):
+    """Prints the outcome of every layer and the summary, and exits non-zero on failure."""
     # Output results
     
     # --- 1. Data Structure (Layer 2) ---
@@ -97,6 +354,12 @@ def cmd_verify(args):
     elif l2["status"] == "FAILED":
          print_color(f"[FAIL] 1. Data Structure: {l2['message']}", RED)
          layer2_status = f"{RED}FAILED (Corrupted Structure){NC}"
+    elif l2["status"] == "SKIPPED":
+        print_color(f"[SKIP] 1. Data Structure: {l2['message']}", YELLOW)
+        layer2_status = f"{YELLOW}SKIPPED ({l2['message']}){NC}"
+    elif layer_timed_out(l2):
+        print_color(f"[ERROR] 1. Data Structure: Not finished: {l2['message']}", RED)
+        layer2_status = f"{RED}ERROR (Timed Out, Not Checked){NC}"
     else:
          print_color(f"[ERROR] 1. Data Structure: {l2['message']}", RED)
          layer2_status = f"{RED}ERROR{NC}"
@@ -129,6 +392,8 @@ def cmd_verify(args):
         if l1["details"]:
             print(f"        Expected: {RED}{l1['details']['expected']}{NC}")
             print(f"        Actual:   {RED}{l1['details']['actual']}{NC}")
+            for start, end in l1["details"].get("ranges", []):
+                print(f"        Corrupt bytes {start}-{end - 1} ({(end - start) / MIB:.1f} MiB)")
         layer1_status = f"{RED}WARNING (Re-archived / Modified){NC}"
     elif l1["status"] == "ERROR":
          print_color(f"[ERROR] 3. Archive File: Check failed: {l1['message']}", RED)
@@ -137,42 +402,362 @@ def cmd_verify(args):
         print_color(f"[SKIP] 3. Archive File: {l1['message']}", YELLOW)
         layer1_status = f"{YELLOW}SKIPPED ({l1['message']}){NC}"
 
+    # Localise the damage if a per-member manifest is available
+    manifest_file = Path(args.manifest_file) if args.manifest_file else manifest_path_for(archive_path)
+    damaged = l2["status"] in ("FAILED", "ERROR") and not layer_timed_out(l2) or l3["status"] in ("FAILED", "ERROR")
+    if damaged and manifest_file.exists() and archive_path.exists():
+        print_member_report(verify_members(archive_path, manifest_file, engine=args.engine))
+
     print("-" * 40)
     print("\n" + BLUE + f"Verification Summary for \"{archive_path.name}\":" + NC)
     print(f"  1. Data Structure:      {layer2_status}")
     print(f"  2. Content Authenticity:{layer3_status}")
     print(f"  3. Archive File:        {layer1_status}\n")
+    report_stats(args, archive_path, collected)
 
     if "FAILED" in layer2_status or "FAILED" in layer3_status or "ERROR" in layer2_status:
         sys.exit(1)
     
     if "WARNING" in layer1_status:
         print_color("[WARN] Verification passed, but with warnings.", YELLOW)
+    elif args.policy == POLICY_FAST and l1["status"] == "PASSED" and l2["status"] == "SKIPPED":
+        print_color("[SUCCESS] Archive file is byte-identical; decompression layers skipped (fast policy).", GREEN)
     elif "SKIPPED" in layer1_status or "SKIPPED" in layer2_status or "SKIPPED" in layer3_status:
         print_color("[WARN] Verification passed, but some layers were skipped.", YELLOW)
     else:
         print_color("[SUCCESS] All integrity layers passed.", GREEN)
 
+def cmd_copy(args):
+    source, destination = Path(args.source), Path(args.destination)
+    algorithms = args.algorithm or [DEFAULT_HASH_ALGORITHM]
+    discover_hash_files(source, None, None)
+    print_color(f"Copying {source.name} and verifying it in the same read...", CYAN)
+    try:
+        result = copy_archive(
+            source, destination, algorithms, directory_sums=args.directory_sums, reread=args.reread,
+            engine=args.engine, cancel=CancelToken(args.timeout) if args.timeout else None, force=args.force
+        )
+    except OperationTimedOut:
+        print_color(f"[ERROR] Timed out copying '{source}'.", RED)
+        sys.exit(1)
+    except FileExistsError as e:
+        print_color(f"[ERROR] {e}: pass --force to replace it.", RED)
+        sys.exit(1)
+    except Exception as e:
+        print_color(f"[ERROR] Failed to copy '{source}': {e}", RED)
+        sys.exit(1)
+
+    if result.hash_file:
+        print_color(f"[SUCCESS] Copied to {result.destination} ({result.size / MIB:.1f} MiB)", GREEN)
+    if result.reread:
+        print_color("[PASS] Re-read of the copy matches the source.", GREEN)
+    elif result.reread is False:
+        print_color("[FAIL] Re-read of the copy differs from the source!", RED)
+    if result.hash_file and args.directory_sums:
+        print_color(f"[SUCCESS] Recorded the copy's hashes in {result.hash_file.name}", GREEN)
+    elif result.hash_file:
+        for algorithm in dict.fromkeys(algorithms):
+            print_color(f"[SUCCESS] Created {hash_file_path(result.destination, algorithm).name}", GREEN)
+        if result.content_hash_file:
+            print_color(f"[SUCCESS] Created {result.content_hash_file.name}", GREEN)
+    else:
+        print_color("[FAIL] The copy did not verify and was removed; no hash files were written.", RED)
+    print("-" * 40)
+
+    # Exits non-zero itself on a structure or content failure
+    report_layers(args, result.destination, result.results, {})
+    if result.hash_file is None:
+        sys.exit(1)
+
+TREE_STATUS_STYLES = {
+    "PASSED": ("[PASS]", GREEN),
+    "CREATED": ("[DONE]", GREEN),
+    "WARNING": ("[WARN]", YELLOW),
+    "SKIPPED": ("[SKIP]", YELLOW),
+    "FAILED": ("[FAIL]", RED),
+    "ERROR": ("[ERROR]", RED),
+}
+
+def report_tree(results) -> int:
+    """Prints tree results as they stream in and returns the exit code."""
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        print_tree_result(result)
+
+    print("-" * 40)
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print_color(f"Processed {sum(counts.values())} archive(s). {summary}", BLUE)
+    return 1 if counts.get("FAILED") or counts.get("ERROR") else 0
+
+@contextmanager
+def journal_from_args(args):
+    """Opens the --journal file, or yields None."""
+    journal = Journal(Path(args.journal)) if args.journal else None
+    try:
+        yield journal
+    finally:
+        if journal:
+            journal.close()
+
+def cmd_create_tree(args):
+    root = Path(args.directory)
+    if not root.is_dir():
+        print_color(f"[ERROR] '{root}' is not a directory.", RED)
+        sys.exit(1)
+    with cache_from_args(args) as cache, journal_from_args(args) as journal:
+        exit_code = report_tree(create_tree(
+            root, workers=args.workers, skip_existing=args.skip_existing,
+            cache=cache, refresh=args.refresh, engine=args.engine, manifest=args.manifest,
+            algorithms=args.algorithm or [DEFAULT_HASH_ALGORITHM],
+            tree_hash=args.tree_hash, segment_size=args.segment_size * MIB,
+            directory_sums=args.directory_sums, journal=journal, resume=args.resume, timeout=args.timeout
+        ))
+    sys.exit(exit_code)
+
+def cmd_verify_tree(args):
+    root = Path(args.directory)
+    if not root.is_dir():
+        print_color(f"[ERROR] '{root}' is not a directory.", RED)
+        sys.exit(1)
+    with cache_from_args(args) as cache, journal_from_args(args) as journal:
+        exit_code = report_tree(verify_tree(
+            root, workers=args.workers, cache=cache, refresh=args.refresh, engine=args.engine,
+            journal=journal, resume=args.resume,
+            policy=args.policy, fail_fast=args.fail_fast, deadline=args.deadline,
+            timeout=args.timeout, layer_timeout=args.layer_timeout
+        ))
+    sys.exit(exit_code)
+
+def print_tree_result(result):
+    tag, color = TREE_STATUS_STYLES.get(result.status, ("[INFO]", CYAN))
+    print_color(f"{tag} {result.archive_path}: {result.message}", color)
+
+def cmd_watch(args):
+    # Imported here: ctypes and the watcher are only needed by this command
+    from .watch import watch_directory
+
+    root = Path(args.directory)
+    if not root.is_dir():
+        print_color(f"[ERROR] '{root}' is not a directory.", RED)
+        sys.exit(1)
+    print_color(f"[INFO] Watching {root} for new archives (Ctrl+C to stop)", CYAN)
+    with cache_from_args(args) as cache:
+        try:
+            watch_directory(
+                root, print_tree_result, workers=args.workers, settle_seconds=args.settle,
+                poll_interval=args.poll_interval, polling=args.polling, initial_scan=args.initial_scan,
+                cache=cache, refresh=args.refresh, engine=args.engine, manifest=args.manifest,
+                algorithms=args.algorithm or [DEFAULT_HASH_ALGORITHM],
+                tree_hash=args.tree_hash, segment_size=args.segment_size * MIB,
+                directory_sums=args.directory_sums
+            )
+        except KeyboardInterrupt:
+            print_color("[INFO] Stopped watching.", CYAN)
+
+def cmd_serve(args):
+    # Imported here: the HTTP server is only needed by this command
+    from .daemon import UNIX_SOCKETS, is_loopback, make_server, write_token_file
+    from .jobs import JobQueue
+
+    socket_path = Path(args.socket) if args.socket else None
+    if socket_path and not UNIX_SOCKETS:
+        print_color("[ERROR] --socket is not supported on this platform: serve on localhost instead.", RED)
+        sys.exit(1)
+    if not socket_path and not args.token_file and not is_loopback(args.host):
+        print_color(f"[ERROR] Serving on {args.host} is reachable from other machines: pass --token-file.", RED)
+        sys.exit(1)
+    token = write_token_file(Path(args.token_file)) if args.token_file else None
+    with cache_from_args(args) as cache:
+        jobs = JobQueue(workers=args.workers, cache=cache)
+        try:
+            server = make_server(jobs, args.host, args.port, socket_path, verbose=args.verbose, token=token)
+        except OSError as e:
+            print_color(f"[ERROR] Cannot listen: {e}", RED)
+            sys.exit(1)
+        where = socket_path if socket_path else f"http://{args.host}:{server.server_address[1]}"
+        print_color(f"[INFO] Serving {jobs.workers} worker(s) on {where} (Ctrl+C to stop)", CYAN)
+        if token:
+            print_color(f"[INFO] Clients must send the token in {args.token_file} as 'Authorization: Bearer <token>'", CYAN)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print_color("[INFO] Shutting down.", CYAN)
+        finally:
+            server.server_close()
+            if socket_path and socket_path.exists():
+                socket_path.unlink()
+
 def main():
+    # Initialize colorama here rather than at import, so importing the module stays side-effect free
+    init()
+
     parser = argparse.ArgumentParser(description="Data Integrity Tool")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    # Options shared by every command that reads archives
+    archive_options = argparse.ArgumentParser(add_help=False)
+    archive_options.add_argument("--cache-dir", help=f"Directory of the persistent hash cache (default: ${CACHE_DIR_ENV}, disabled if unset)")
+    archive_options.add_argument("--no-cache", action="store_true", help="Do not use the hash cache")
+    archive_options.add_argument("--refresh", action="store_true", help="Recompute everything and refresh the cache")
+    archive_options.add_argument(
+        "--engine", choices=ENGINES, default=ENGINE_7Z,
+        help="Archive engine: 7z, or native to handle ZIP/TAR/gzip/bzip2/xz in-process (falls back to 7z)"
+    )
+
+    # Per-layer timing and I/O for single-archive commands
+    stats_options = argparse.ArgumentParser(add_help=False)
+    stats_options.add_argument("--stats", action="store_true", help="Print wall/CPU time, bytes read and 7z runtime per layer")
+    stats_options.add_argument("--stats-json", metavar="FILE", help="Write the per-layer statistics as JSON to FILE ('-' for stdout)")
+
+    # 7z resource limits, honoured by every 7z process this run starts
+    limit_options = argparse.ArgumentParser(add_help=False)
+    limit_options.add_argument("--7z-processes", dest="sevenzip_processes", type=int, metavar="N", help="Run at most N 7z processes at once (default: CPU count)")
+    limit_options.add_argument("--7z-threads", dest="sevenzip_threads", type=int, metavar="N", help="Pass -mmt=N to 7z to limit its threads")
+    limit_options.add_argument("--7z-memory", dest="sevenzip_memory", type=int, metavar="MIB", help="Only start 7z processes while their estimated memory fits in MIB")
+
+    # Layer 1 algorithms for the create commands
+    algorithm_options = argparse.ArgumentParser(add_help=False)
+    algorithm_options.add_argument(
+        "--algorithm", action="append", choices=HASH_ALGORITHMS,
+        help=f"Archive hash algorithm (default: {DEFAULT_HASH_ALGORITHM}); repeat to write several sidecars from one read"
+    )
+    algorithm_options.add_argument(
+        "--tree-hash", action="store_true",
+        help="Hash fixed-size segments in parallel into a .treehash.json sidecar (for very large archives)"
+    )
+    algorithm_options.add_argument(
+        "--segment-size", type=int, default=DEFAULT_SEGMENT_SIZE // MIB, metavar="MIB",
+        help="Tree hash segment size in MiB (default: %(default)s)"
+    )
+    algorithm_options.add_argument(
+        "--directory-sums", action="store_true",
+        help=f"Record the hashes in the directory's {SUMS_FILE_NAME} file instead of two sidecars per archive"
+    )
+
+    # Progress journal for the batch commands
+    journal_options = argparse.ArgumentParser(add_help=False)
+    journal_options.add_argument("--journal", metavar="FILE", help="Append every finished archive and its result to FILE")
+    journal_options.add_argument("--resume", action="store_true", help="Skip archives the --journal records as done, if unchanged")
+
+    # Which layers verification runs, and in what order
+    policy_options = argparse.ArgumentParser(add_help=False)
+    policy_options.add_argument(
+        "--policy", choices=POLICIES, default=POLICY_FULL,
+        help="full: run every layer; fast: a matching archive hash is sufficient, skip decompression"
+    )
+    policy_options.add_argument("--fail-fast", action="store_true", help="Stop at the first layer that fails")
+    policy_options.add_argument(
+        "--deadline", type=float, metavar="SECONDS",
+        help="Time budget per archive: run the cheapest layers first and skip those that would not fit"
+    )
+    policy_options.add_argument(
+        "--timeout", type=float, metavar="SECONDS",
+        help="Hard limit per archive: interrupt hashing and kill 7z once exceeded (the archive is reported as an error)"
+    )
+    policy_options.add_argument(
+        "--layer-timeout", type=float, metavar="SECONDS",
+        help="Hard limit per layer, as --timeout; the remaining layers still run"
+    )
+
     # Create command
-    create_parser = subparsers.add_parser("create", help="Create hashes for an archive")
-    create_parser.add_argument("archive", help="Path to the archive file")
+    create_parser = subparsers.add_parser("create", help="Create hashes for an archive", parents=[archive_options, limit_options, algorithm_options, stats_options])
+    create_parser.add_argument("archive", help="Path to the archive file, or - to read it from stdin")
+    create_parser.add_argument("--manifest", action="store_true", help="Also write a per-member manifest (name, size, CRC32, SHA-256)")
+    create_parser.add_argument("--output", metavar="PATH", help="With -: save the archive to PATH and write its hash files there")
 
     # Verify command
-    verify_parser = subparsers.add_parser("verify", help="Verify hashes for an archive")
-    verify_parser.add_argument("archive", help="Path to the archive file")
+    verify_parser = subparsers.add_parser("verify", help="Verify hashes for an archive", parents=[archive_options, limit_options, policy_options, stats_options])
+    verify_parser.add_argument("archive", help="Path to the archive file, or - to read it from stdin")
+    verify_parser.add_argument("--output", metavar="PATH", help="With -: also save the archive to PATH (its hash files are looked up there)")
+    verify_parser.add_argument("--name", metavar="PATH", help="With -: the archive whose hash files the stream is checked against")
     verify_parser.add_argument("--hash-file", help="Explicit path to archive hash file")
     verify_parser.add_argument("--content-hash-file", help="Explicit path to content hash file")
+    verify_parser.add_argument("--manifest-file", help="Explicit path to the per-member manifest")
+    verify_parser.add_argument(
+        "--members", action="append", metavar="GLOB",
+        help="Only check members matching GLOB against the manifest (repeatable)"
+    )
+
+    # Copy command
+    copy_parser = subparsers.add_parser("copy", help="Copy an archive, verifying it and hashing the copy in the same read", parents=[limit_options, algorithm_options])
+    copy_parser.add_argument("source", help="Archive to copy; its hash files are checked")
+    copy_parser.add_argument("destination", help="Target file, or a directory to copy into")
+    copy_parser.add_argument("--engine", choices=ENGINES, default=ENGINE_7Z, help="Archive engine, as for verify")
+    copy_parser.add_argument("--reread", action="store_true", help="Read the copy back from disk (bypassing the page cache where possible) and compare")
+    copy_parser.add_argument("--timeout", type=float, metavar="SECONDS", help="Give up and remove the partial copy once exceeded")
+    copy_parser.add_argument("--force", action="store_true", help="Replace an existing destination file")
+    copy_parser.set_defaults(manifest_file=None, policy=POLICY_FULL, stats=False, stats_json=None)
+
+    # Tree commands
+    create_tree_parser = subparsers.add_parser("create-tree", help="Create hashes for every archive under a directory", parents=[archive_options, limit_options, algorithm_options, journal_options])
+    create_tree_parser.add_argument("directory", help="Directory to scan recursively")
+    create_tree_parser.add_argument("--workers", type=int, help="Parallel workers (default: CPU count)")
+    create_tree_parser.add_argument("--skip-existing", action="store_true", help="Skip archives that already have both hash files")
+    create_tree_parser.add_argument("--manifest", action="store_true", help="Also write per-member manifests")
+    create_tree_parser.add_argument(
+        "--timeout", type=float, metavar="SECONDS",
+        help="Hard limit per archive: interrupt hashing and kill 7z once exceeded (the archive is reported as an error)"
+    )
+
+    verify_tree_parser = subparsers.add_parser("verify-tree", help="Verify every archive under a directory", parents=[archive_options, limit_options, policy_options, journal_options])
+    verify_tree_parser.add_argument("directory", help="Directory to scan recursively")
+    verify_tree_parser.add_argument("--workers", type=int, help="Parallel workers (default: CPU count)")
+
+    # Drop directory watcher
+    watch_parser = subparsers.add_parser("watch", help="Create hashes for archives as they appear in a directory", parents=[archive_options, limit_options, algorithm_options])
+    watch_parser.add_argument("directory", help="Directory to watch recursively")
+    watch_parser.add_argument("--workers", type=int, default=2, help="Archives hashed at once (default: %(default)s)")
+    watch_parser.add_argument("--settle", type=float, default=5.0, metavar="SECONDS", help="Wait until a file is unchanged this long (default: %(default)s)")
+    watch_parser.add_argument("--polling", action="store_true", help="Poll instead of using inotify")
+    watch_parser.add_argument("--poll-interval", type=float, default=2.0, metavar="SECONDS", help="Rescan interval when polling (default: %(default)s)")
+    watch_parser.add_argument("--initial-scan", action="store_true", help="Also hash archives already present without hash files")
+    watch_parser.add_argument("--manifest", action="store_true", help="Also write per-member manifests")
+
+    # Resident service
+    serve_parser = subparsers.add_parser("serve", help="Run a job queue with a local JSON API for create/verify requests", parents=[limit_options])
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s, local only)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="TCP port (default: %(default)s)")
+    serve_parser.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket instead of TCP")
+    serve_parser.add_argument("--workers", type=int, help="Concurrent jobs (default: CPU count)")
+    serve_parser.add_argument("--cache-dir", help=f"Directory of the persistent hash cache (default: ${CACHE_DIR_ENV}, disabled if unset)")
+    serve_parser.add_argument("--no-cache", action="store_true", help="Do not use the hash cache")
+    serve_parser.add_argument("--verbose", action="store_true", help="Log every request")
+    serve_parser.add_argument(
+        "--token-file", metavar="PATH",
+        help="Write a fresh access token to PATH (owner-only) and require it on every request; needed for a non-loopback --host"
+    )
 
     args = parser.parse_args()
+    if getattr(args, "resume", False) and not args.journal:
+        parser.error("--resume requires --journal")
+    if args.command in ("create", "verify") and args.archive != "-" and (args.output or getattr(args, "name", None)):
+        parser.error("--output and --name only apply when reading the archive from stdin (-)")
+    if args.command == "create" and args.archive == "-" and (args.manifest or args.tree_hash):
+        parser.error("--manifest and --tree-hash need an archive file, not stdin")
+    if args.command == "copy" and args.tree_hash:
+        parser.error("--tree-hash is not supported by copy")
+    if args.sevenzip_processes or args.sevenzip_threads or args.sevenzip_memory:
+        set_7z_limits(
+            max_processes=args.sevenzip_processes,
+            threads=args.sevenzip_threads,
+            memory_budget=args.sevenzip_memory * MIB if args.sevenzip_memory else None
+        )
 
     if args.command == "create":
         cmd_create(args)
     elif args.command == "verify":
         cmd_verify(args)
+    elif args.command == "copy":
+        cmd_copy(args)
+    elif args.command == "create-tree":
+        cmd_create_tree(args)
+    elif args.command == "verify-tree":
+        cmd_verify_tree(args)
+    elif args.command == "watch":
+        cmd_watch(args)
+    elif args.command == "serve":
+        cmd_serve(args)
 
 if __name__ == "__main__":
     main()
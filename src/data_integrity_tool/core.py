@@ -1,9 +1,37 @@
+import fnmatch
+import contextvars
+import gzip
 import hashlib
+import json
+import mmap
+import os
+import queue
+import re
+import stat
 import subprocess
-import sys
 import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Callable, Generator, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from .cache import CacheEntry, FileIdentity, HashCache, file_identity
+from .journal import Journal
+from .sums import CONTENT_TAG, SUMS_FILE_NAME, load_sums, lookup_sums, sums_path_for, update_sums
+
+# Optional compression modules: some Python builds ship without them
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
 class IntegrityError(Exception):
     """Base exception for integrity tool errors."""
@@ -13,22 +41,484 @@ class ArchiveError(IntegrityError):
     """Raised when archive operations fail."""
     pass
 
+class InvalidArchiveError(ArchiveError):
+    """Raised when 7z reports that a file is not a valid archive."""
+    pass
+
 class DependencyError(IntegrityError):
     """Raised when a required external dependency is missing."""
     pass
 
-def calculate_file_hash(file_path: Path, algorithm: str = "sha256") -> str:
-    """Calculates the hash of a file."""
+class OperationCancelled(IntegrityError):
+    """Raised when an operation is stopped through its CancelToken."""
+    pass
+
+class OperationTimedOut(OperationCancelled):
+    """Raised when an operation outlives its CancelToken's timeout."""
+    pass
+
+DEFAULT_HASH_ALGORITHM = "sha256"
+# Layer 1 algorithms in sidecar discovery order. BLAKE2b is 2-3x faster
+# than SHA-256 on CPUs without SHA extensions.
+HASH_ALGORITHMS = ("sha256", "blake2b", "sha512", "blake2s")
+# BSD-style tags ("BLAKE2b (name) = digest"), as written by coreutils --tag
+HASH_TAGS = {"sha256": "SHA256", "blake2b": "BLAKE2b", "sha512": "SHA512", "blake2s": "BLAKE2s"}
+_TAGGED_LINE = re.compile(r"^(\w+) \((.*)\) = ([0-9a-fA-F]+)$")
+
+PROGRESS_PERCENT = "percent"
+PROGRESS_ENTRY = "entry"
+PROGRESS_BYTES = "bytes"
+PROGRESS_LAYER = "layer"
+# Byte counts are reported at most this often (plus once when complete)
+PROGRESS_INTERVAL = 0.1
+
+class ProgressEvent(NamedTuple):
+    """
+    A progress notification: 7z's percent complete or the entry it is
+    testing, bytes hashed so far (done of total, None for a stream), or
+    the layer starting.
+    """
+    kind: str
+    percent: Optional[int] = None
+    entry: Optional[str] = None
+    done: Optional[int] = None
+    total: Optional[int] = None
+    layer: Optional[str] = None
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+# How often blocking waits (a 7z process, a scheduler slot) look at their token
+CANCEL_POLL_INTERVAL = 0.1
+
+class CancelToken:
+    """
+    Stops an operation from another thread: hash loops check the token
+    between blocks and a running 7z is killed. With a timeout the token
+    also fires that many seconds after it was created. A token with a
+    parent fires whenever the parent does, which is how a per-layer
+    timeout nests inside an overall one.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancelToken"] = None):
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.parent = parent
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def check(self):
+        """Raises OperationCancelled (OperationTimedOut past a deadline) once the token has fired."""
+        if self._event.is_set():
+            raise OperationCancelled("Cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise OperationTimedOut(f"Timed out after {self.timeout:g}s")
+        if self.parent is not None:
+            self.parent.check()
+
+    @property
+    def cancelled(self) -> bool:
+        try:
+            self.check()
+        except OperationCancelled:
+            return True
+        return False
+
+def _linked_token(cancel: Optional[CancelToken], timeout: Optional[float]) -> Optional[CancelToken]:
+    """A token for a timeout within cancel; no token when neither is given."""
+    if timeout is None:
+        return cancel
+    return CancelToken(timeout, parent=cancel)
+
+class ByteProgress:
+    """
+    Adds up hashed bytes, possibly from several threads, into throttled
+    PROGRESS_BYTES events, and checks the cancel token as it goes. The
+    total is None for a stream of unknown length.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback], total: Optional[int], cancel: Optional[CancelToken] = None):
+        self.progress = progress
+        self.cancel = cancel
+        self.total = total
+        self.done = 0
+        self._next_report = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        if self.cancel is not None:
+            self.cancel.check()
+        if self.progress is None:
+            return
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            if now < self._next_report and (self.total is None or self.done < self.total):
+                return
+            self._next_report = now + PROGRESS_INTERVAL
+            done = self.done
+        self.progress(ProgressEvent(PROGRESS_BYTES, done=done, total=self.total))
+
+class _CountingHash:
+    """Passes updates on to a hash object and counts them into a ByteProgress."""
+
+    def __init__(self, hash_func, counter: ByteProgress):
+        self.hash_func = hash_func
+        self.counter = counter
+
+    def update(self, data):
+        self.hash_func.update(data)
+        self.counter.add(len(data))
+
+def _counting(hash_func, file_path: Path, progress: Optional[ProgressCallback], cancel: Optional[CancelToken]):
+    """hash_func, wrapped to report progress and honour cancel if either is given."""
+    if progress is None and cancel is None:
+        return hash_func
+    return _CountingHash(hash_func, ByteProgress(progress, _file_size(file_path), cancel))
+
+# Block size chosen with benchmarks/hash_engine.py: throughput plateaus
+# from 256 KiB upwards, while the old 4 KiB reads cost 15-20% in per-call
+# overhead. Larger blocks only add memory, which read-ahead multiplies.
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+READ_AHEAD_BUFFERS = 4
+
+def _hash_sequential(f, hash_func, block_size: int):
+    """Hashes a raw file handle by reading into one reused buffer."""
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    while True:
+        n = f.readinto(buffer)
+        if not n:
+            break
+        hash_func.update(view[:n])
+
+def _hash_read_ahead(f, hash_func, block_size: int):
+    """
+    Hashes a raw file handle while a reader thread fills the next buffers.
+
+    hashlib releases the GIL for large updates, so disk or network reads
+    overlap with hashing instead of alternating with it.
+    """
+    free_buffers = queue.Queue()
+    filled_buffers = queue.Queue()
+    for _ in range(READ_AHEAD_BUFFERS):
+        free_buffers.put(bytearray(block_size))
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                buffer = free_buffers.get()
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                filled_buffers.put((buffer, n))
+            filled_buffers.put(None)
+        except BaseException as e:
+            filled_buffers.put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = filled_buffers.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            buffer, n = item
+            with memoryview(buffer) as view:
+                hash_func.update(view[:n])
+            free_buffers.put(buffer)
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting for a free buffer
+        free_buffers.put(bytearray(0))
+        thread.join()
+
+def _hash_mmap(f, hash_func, block_size: int):
+    """Hashes a local file through a read-only memory map."""
+    if f.seek(0, 2) == 0:
+        return  # Empty files cannot be mapped
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            for offset in range(0, len(view), block_size):
+                # Released even if update raises: an exported slice would
+                # make closing the map fail with BufferError
+                with view[offset:offset + block_size] as chunk:
+                    hash_func.update(chunk)
+
+class MultiHash:
+    """Feeds every update to several hash objects, so one read serves all."""
+
+    def __init__(self, algorithms: Iterable[str]):
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def update(self, data):
+        for hash_func in self.hashes.values():
+            hash_func.update(data)
+
+def _hash_file(file_path: Path, hash_func, block_size: int, read_ahead: bool, use_mmap: bool):
     if not file_path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
-    
-    hash_func = getattr(hashlib, algorithm)()
-    with open(file_path, "rb") as f:
-        # Read in chunks to handle large files
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_func.update(chunk)
+    if block_size <= 0:
+        raise ValueError(f"Block size must be positive: {block_size}")
+
+    # Unbuffered handle: readinto() fills our buffer directly, with no extra copy
+    with open(file_path, "rb", buffering=0) as f:
+        if use_mmap:
+            _hash_mmap(f, hash_func, block_size)
+        elif read_ahead:
+            _hash_read_ahead(f, hash_func, block_size)
+        else:
+            _hash_sequential(f, hash_func, block_size)
+
+def calculate_file_hash(
+    file_path: Path,
+    algorithm: str = DEFAULT_HASH_ALGORITHM,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    read_ahead: bool = False,
+    use_mmap: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> str:
+    """
+    Calculates the hash of a file.
+
+    Args:
+        file_path: Path to the file.
+        algorithm: Any algorithm name accepted by hashlib.new().
+        block_size: Bytes read (or hashed, with mmap) per step.
+        read_ahead: Overlap reads with hashing using a reader thread.
+            Pays off on high-latency storage such as network shares.
+        use_mmap: Hash through a memory map. Intended for local files.
+        progress: Optional callable receiving PROGRESS_BYTES events, at
+            most every PROGRESS_INTERVAL seconds, from the hashing thread.
+        cancel: Optional CancelToken, checked after every block; raises
+            OperationCancelled once it fires.
+    """
+    hash_func = hashlib.new(algorithm)
+    _hash_file(file_path, _counting(hash_func, file_path, progress, cancel), block_size, read_ahead, use_mmap)
+    return hash_func.hexdigest()
+
+def calculate_file_hashes(
+    file_path: Path,
+    algorithms: Iterable[str],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    read_ahead: bool = False,
+    use_mmap: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> dict:
+    """
+    Calculates several hashes of a file in a single read pass and returns
+    them as {algorithm: hex digest}. Other arguments as calculate_file_hash.
+    """
+    multi = MultiHash(dict.fromkeys(algorithms))
+    if not multi.hashes:
+        raise ValueError("No hash algorithm given")
+    _hash_file(file_path, _counting(multi, file_path, progress, cancel), block_size, read_ahead, use_mmap)
+    return {algorithm: hash_func.hexdigest() for algorithm, hash_func in multi.hashes.items()}
+
+def _compute_file_hashes(
+    file_path: Path,
+    algorithms: List[str],
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> dict:
+    """One read pass for all algorithms; a single one needs no fan-out."""
+    if len(algorithms) == 1:
+        return {algorithms[0]: calculate_file_hash(file_path, algorithms[0], progress=progress, cancel=cancel)}
+    return calculate_file_hashes(file_path, algorithms, progress=progress, cancel=cancel)
+
+def hash_file_path(archive_path: Path, algorithm: str = DEFAULT_HASH_ALGORITHM) -> Path:
+    """The Layer 1 sidecar of archive_path for algorithm, e.g. test.zip.blake2b."""
+    return archive_path.with_name(f"{archive_path.name}.{algorithm}")
+
+def write_hash_file(archive_path: Path, algorithm: str, digest: str) -> Path:
+    """
+    Writes the Layer 1 sidecar for one algorithm. SHA-256 keeps the plain
+    sha256sum format for compatibility; other algorithms are written in
+    tagged form so the file names its algorithm. Both are accepted by
+    the matching coreutils *sum -c.
+    """
+    hash_file = hash_file_path(archive_path, algorithm)
+    with open(hash_file, "w") as f:
+        if algorithm == DEFAULT_HASH_ALGORITHM:
+            f.write(f"{digest}  {archive_path.name}\n")
+        else:
+            f.write(f"{hash_tag(algorithm)} ({archive_path.name}) = {digest}\n")
+    return hash_file
+
+def read_hash_file(hash_file: Path) -> Tuple[str, str]:
+    """
+    Returns (algorithm, lowercase digest) from a Layer 1 sidecar. The
+    algorithm comes from a tagged line if present, else from the file
+    suffix, else it is assumed to be SHA-256.
+    """
+    with open(hash_file, "r") as f:
+        line = f.readline().strip()
+    match = _TAGGED_LINE.match(line)
+    if match:
+        tag = match.group(1)
+        algorithm = next((name for name, known in HASH_TAGS.items() if known == tag), tag.lower())
+        return algorithm, match.group(3).lower()
+    suffix = hash_file.suffix[1:].lower()
+    algorithm = suffix if suffix in HASH_ALGORITHMS else DEFAULT_HASH_ALGORITHM
+    return algorithm, line.split()[0].lower()
+
+def hash_tag(algorithm: str) -> str:
+    return HASH_TAGS.get(algorithm, algorithm.upper())
+
+def _sums_file_hashes(entry: dict) -> dict:
+    """{algorithm: digest} of the Layer 1 hashes in a directory sums entry."""
+    return {a: entry[hash_tag(a)] for a in HASH_ALGORITHMS if hash_tag(a) in entry}
+
+def read_file_hashes(archive_path: Path, hash_files: Iterable[Path]) -> dict:
+    """
+    {algorithm: digest} expected for archive_path by its Layer 1 hash
+    files, which are sidecars or its directory's sums file.
+    """
+    expected = {}
+    for path in dict.fromkeys(hash_files):
+        if path.name == SUMS_FILE_NAME:
+            found = _sums_file_hashes(lookup_sums(archive_path) or {})
+            if not found:
+                raise ValueError(f"No hash of {archive_path.name} in {path}")
+            expected.update(found)
+        else:
+            algorithm, digest = read_hash_file(path)
+            expected[algorithm] = digest
+    return expected
+
+def read_content_hash(archive_path: Path, content_hash_file: Path) -> str:
+    """The canonical content hash from a .content.sha256 sidecar or a sums file."""
+    if content_hash_file.name == SUMS_FILE_NAME:
+        digest = (lookup_sums(archive_path) or {}).get(CONTENT_TAG)
+        if digest is None:
+            raise ValueError(f"No content hash of {archive_path.name} in {content_hash_file}")
+        return canonical_content_hash(digest)
+    with open(content_hash_file, "r") as f:
+        return canonical_content_hash(f.read())
+
+TREE_HASH_SUFFIX = ".treehash.json"
+TREE_HASH_VERSION = 1
+# Large enough that per-segment overhead vanishes, small enough that a
+# corrupt range is cheap to re-fetch and a few per core keep all busy
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+class TreeHash(NamedTuple):
+    """Segment digests of a file and the root digest combining them."""
+    algorithm: str
+    segment_size: int
+    size: int
+    root: str
+    segments: List[str]
+
+def _hash_segment(file_path: Path, algorithm: str, offset: int, length: int, counter: Optional[ByteProgress] = None) -> str:
+    """Hashes length bytes of file_path from offset, through its own handle."""
+    hash_func = hashlib.new(algorithm)
+    buffer = bytearray(min(DEFAULT_BLOCK_SIZE, length))
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            n = f.readinto(view[:min(remaining, len(buffer))])
+            if not n:
+                break
+            hash_func.update(view[:n])
+            remaining -= n
+            if counter is not None:
+                counter.add(n)
     return hash_func.hexdigest()
 
+def _tree_root(algorithm: str, segments: List[str]) -> str:
+    return hashlib.new(algorithm, b"".join(bytes.fromhex(digest) for digest in segments)).hexdigest()
+
+def calculate_tree_hash(
+    file_path: Path,
+    algorithm: str = DEFAULT_HASH_ALGORITHM,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> TreeHash:
+    """
+    Hashes a file as independent fixed-size segments, in parallel across
+    workers threads (one per core by default), and combines them into a
+    root digest: the hash of the concatenated segment digests.
+
+    Reads and hashlib updates release the GIL, so a single large file can
+    keep every core and several I/O queues busy. Because the segment
+    digests are kept, a mismatch can be narrowed to the damaged byte
+    ranges (see tree_hash_mismatches). progress receives the bytes hashed
+    across all workers and cancel stops them all (see calculate_file_hash).
+    """
+    if segment_size <= 0:
+        raise ValueError(f"Segment size must be positive: {segment_size}")
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+    hashlib.new(algorithm)  # Fail on unknown names before starting workers
+
+    size = os.stat(file_path).st_size
+    offsets = range(0, size, segment_size)
+    counter = ByteProgress(progress, size, cancel) if progress or cancel else None
+    def hash_at(offset: int) -> str:
+        return _hash_segment(file_path, algorithm, offset, min(segment_size, size - offset), counter)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(offsets) <= 1:
+        segments = [hash_at(offset) for offset in offsets]
+    else:
+        # Deferred: concurrent.futures pulls in logging, a large share of CLI start-up
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(workers, len(offsets))) as executor:
+            segments = list(executor.map(hash_at, offsets))
+    return TreeHash(algorithm, segment_size, size, _tree_root(algorithm, segments), segments)
+
+def tree_hash_mismatches(expected: TreeHash, actual: TreeHash) -> List[Tuple[int, int]]:
+    """
+    Byte ranges [start, end) whose segments differ between two tree hashes
+    of the same segment size, with adjacent segments merged.
+    """
+    end_of_data = max(expected.size, actual.size)
+    ranges = []
+    for index in range(max(len(expected.segments), len(actual.segments))):
+        want = expected.segments[index] if index < len(expected.segments) else None
+        got = actual.segments[index] if index < len(actual.segments) else None
+        if want == got:
+            continue
+        start = index * expected.segment_size
+        end = min(start + expected.segment_size, end_of_data)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+def tree_hash_path_for(archive_path: Path) -> Path:
+    return archive_path.with_name(archive_path.name + TREE_HASH_SUFFIX)
+
+def write_tree_hash(archive_path: Path, tree: TreeHash) -> Path:
+    """Writes the tree hash sidecar next to the archive and returns its path."""
+    tree_file = tree_hash_path_for(archive_path)
+    sidecar = {"version": TREE_HASH_VERSION, "archive": archive_path.name, **tree._asdict()}
+    with open(tree_file, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, indent=1)
+        f.write("\n")
+    return tree_file
+
+def read_tree_hash(tree_file: Path) -> TreeHash:
+    with open(tree_file, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    return TreeHash(*(sidecar[field] for field in TreeHash._fields))
+
+def _tree_cache_key(algorithm: str, segment_size: int) -> str:
+    """Name under which a tree root is cached next to the plain file hashes."""
+    return f"{algorithm}-tree-{segment_size}"
+
 def check_7z_installed() -> bool:
     """Checks if 7z is available in the PATH."""
     return shutil.which("7z") is not None
@@ -43,117 +533,1381 @@ def ensure_7z_installed():
             "Please install it from https://www.7-zip.org/ and ensure it is added to your system PATH."
         )
 
-def verify_archive_integrity(archive_path: Path) -> bool:
-    """Verifies the internal integrity of the archive using '7z t'."""
+ENGINE_7Z = "7z"
+ENGINE_NATIVE = "native"
+ENGINES = (ENGINE_7Z, ENGINE_NATIVE)
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+SHA256_DIGEST_BITS = 256
+# 7z sums digests with 8 extra bytes and appends the carry, if any, to the
+# printed hash ("<digest>-00000001"); it is compared in this width
+DATA_SUM_CARRY_DIGITS = 8
+
+def _format_data_sum(total: int) -> str:
+    """7z's 'SHA256 for data' of summed digests: the low 256 bits, little-endian, plus the carry."""
+    digest = (total % (1 << SHA256_DIGEST_BITS)).to_bytes(SHA256_DIGEST_BITS // 8, "little").hex()
+    carry = total >> SHA256_DIGEST_BITS
+    return f"{digest}-{carry:0{DATA_SUM_CARRY_DIGITS}x}" if carry else digest
+
+def canonical_content_hash(digest: str) -> str:
+    """A content hash in the form every path produces: lowercase, the carry normalised or dropped if zero."""
+    digest, _, carry = digest.strip().lower().partition("-")
+    if carry and int(carry, 16):
+        return f"{digest}-{int(carry, 16):0{DATA_SUM_CARRY_DIGITS}x}"
+    return digest
+
+class ArchiveCheck(NamedTuple):
+    """Outcome of a single '7z t -scrcSHA256' pass over an archive."""
+    ok: bool
+    content_hash: Optional[str]
+    error: str
+
+class _UnsupportedArchive(Exception):
+    """Raised by the native engine for input it must hand over to 7z."""
+    pass
+
+def _stream_digest(stream) -> int:
+    """SHA-256 of a stream, as the little-endian integer 7z sums up."""
+    hash_func = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(DEFAULT_BLOCK_SIZE), b""):
+        hash_func.update(chunk)
+    return int.from_bytes(hash_func.digest(), "little")
+
+def _native_zip_digest(archive_path: Path) -> int:
+    total = 0
+    files = 0
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            if info.flag_bits & 0x1 or stat.S_ISLNK(info.external_attr >> 16):
+                raise _UnsupportedArchive("Encrypted members and symlinks are left to 7z")
+            with zf.open(info) as member:
+                total += _stream_digest(member)
+            files += 1
+    if not files:
+        raise _UnsupportedArchive("Empty archives are left to 7z")
+    return total
+
+def _native_tar_digest(archive_path: Path) -> int:
+    try:
+        tf = tarfile.open(archive_path, mode="r:")
+    except tarfile.ReadError:
+        raise _UnsupportedArchive("Not a tar archive")
+    total = 0
+    files = 0
+    with tf:
+        while True:
+            member = tf.next()
+            if member is None:
+                break
+            # Sequential reading never needs earlier headers; keep memory flat
+            tf.members.clear()
+            if member.isdir():
+                continue
+            if not member.isreg() or member.issparse():
+                raise _UnsupportedArchive("Links, devices and sparse files are left to 7z")
+            total += _stream_digest(tf.extractfile(member))
+            files += 1
+    if not files:
+        raise _UnsupportedArchive("Empty archives are left to 7z")
+    return total
+
+def native_check_archive(archive_path: Path) -> Optional[ArchiveCheck]:
+    """
+    Tests an archive and computes its content hash in-process.
+
+    Reproduces 7z's "SHA256 for data": the SHA-256 of every file is read as
+    a little-endian 256-bit integer and the integers are summed, the carry
+    out of 256 bits printed after a dash as 7z does. Compressed single
+    streams (.gz, .bz2, .xz, including .tar.gz, which 7z does not descend
+    into) count as one file. Members are streamed in DEFAULT_BLOCK_SIZE
+    chunks.
+
+    Returns None for anything it cannot reproduce exactly (7z, RAR,
+    encrypted or empty archives, links, unsupported compression methods)
+    so the caller can fall back to 7z.
+    """
+    try:
+        with open(archive_path, "rb") as f:
+            magic = f.read(len(XZ_MAGIC))
+    except OSError:
+        return None
+
+    try:
+        if magic.startswith(GZIP_MAGIC):
+            with gzip.open(archive_path) as stream:
+                total = _stream_digest(stream)
+        elif magic.startswith(BZIP2_MAGIC) and bz2 is not None:
+            with bz2.open(archive_path) as stream:
+                total = _stream_digest(stream)
+        elif magic.startswith(XZ_MAGIC) and lzma is not None:
+            with lzma.open(archive_path) as stream:
+                total = _stream_digest(stream)
+        elif zipfile.is_zipfile(archive_path):
+            total = _native_zip_digest(archive_path)
+        else:
+            total = _native_tar_digest(archive_path)
+    except (_UnsupportedArchive, NotImplementedError):
+        return None
+    except Exception as e:
+        return ArchiveCheck(ok=False, content_hash=None, error=str(e))
+
+    return ArchiveCheck(ok=True, content_hash=_format_data_sum(total), error="")
+
+def check_engine(engine: str):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Expected one of: {', '.join(ENGINES)}")
+
+# Decoder state, I/O buffers and 7z itself, on top of the dictionary
+SEVENZIP_BASE_MEMORY = 32 * 1024 * 1024
+SEVENZIP_7Z_MAGIC = b"7z\xbc\xaf\x27\x1c"
+_SIZE_TOKEN = re.compile(r"^(?:mem)?(\d+)([kmg]?)$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+def _parse_size_token(token: str) -> Optional[int]:
+    """7z method parameters: "24" means 2^24 bytes, "1536k" or "mem192m" an exact size."""
+    match = _SIZE_TOKEN.match(token)
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2).lower()
+    if unit:
+        return value * _SIZE_UNITS[unit]
+    return 1 << value if value <= 40 else value
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+def xz_dictionary_size(header: bytes) -> Optional[int]:
+    """LZMA2 dictionary size from the first block header of an .xz stream."""
+    try:
+        offset = 12  # Stream header
+        flags = header[offset + 1]
+        offset += 2
+        for present in (0x40, 0x80):  # Compressed and uncompressed sizes
+            if flags & present:
+                _, offset = _read_varint(header, offset)
+        for _ in range((flags & 0x03) + 1):
+            filter_id, offset = _read_varint(header, offset)
+            props_size, offset = _read_varint(header, offset)
+            if filter_id == 0x21 and props_size == 1:
+                bits = header[offset] & 0x3F
+                return 0xFFFFFFFF if bits >= 40 else (2 | (bits & 1)) << (bits // 2 + 11)
+            offset += props_size
+    except IndexError:
+        pass
+    return None
+
+def estimate_7z_memory(archive_path: Path) -> int:
+    """
+    Estimates the memory 7z needs to decompress archive_path: a fixed
+    base plus the largest dictionary (or PPMd model), capped by the
+    unpacked size since 7z never allocates a dictionary larger than the
+    data. Dictionary sizes come from the xz block header or, for 7z
+    archives, from the method listed by '7z l -slt'. Formats with small
+    fixed windows (ZIP, gzip, bzip2) need only the base.
+    """
+    try:
+        with open(archive_path, "rb") as f:
+            header = f.read(64)
+    except OSError:
+        return SEVENZIP_BASE_MEMORY
+
+    dictionary = None
+    unpacked = None
+    if header.startswith(XZ_MAGIC):
+        dictionary = xz_dictionary_size(header)
+    elif header.startswith(SEVENZIP_7Z_MAGIC):
+        try:
+            listing = _7z_listing(archive_path)
+        except IntegrityError:
+            listing = []
+        sizes = []
+        for props in listing:
+            for method in props.get("Method", "").split():
+                for token in method.split(":")[1:]:
+                    size = _parse_size_token(token)
+                    if size:
+                        sizes.append(size)
+        dictionary = max(sizes, default=None)
+        unpacked = sum(int(props.get("Size") or 0) for props in listing) or None
+    if dictionary is None:
+        return SEVENZIP_BASE_MEMORY
+    if unpacked is not None:
+        dictionary = min(dictionary, unpacked)
+    return SEVENZIP_BASE_MEMORY + dictionary
+
+class SevenZipScheduler:
+    """
+    Admission control for 7z processes.
+
+    At most max_processes run at once (one per core by default). With a
+    memory_budget (bytes), a process is only started once the estimated
+    memory of everything running plus its own (see estimate_7z_memory)
+    fits; a single archive larger than the budget runs alone. threads, if
+    set, is passed to every 7z as -mmt so parallel runs do not
+    oversubscribe the CPU. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        max_processes: Optional[int] = None,
+        threads: Optional[int] = None,
+        memory_budget: Optional[int] = None
+    ):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.threads = threads
+        self.memory_budget = memory_budget
+        self._condition = threading.Condition()
+        self._running = 0
+        self._reserved = 0
+        self._release_listeners = []
+
+    def switches(self) -> List[str]:
+        """Extra 7z switches enforcing the thread limit."""
+        return [f"-mmt={self.threads}"] if self.threads else []
+
+    def estimate(self, archive_path: Path) -> int:
+        """Memory to reserve for a 7z process on archive_path."""
+        # Estimating costs a header read (a listing for .7z), so only with a budget
+        return estimate_7z_memory(archive_path) if self.memory_budget else 0
+
+    def _admits(self, need: int) -> bool:
+        if self._running >= self.max_processes:
+            return False
+        return not self.memory_budget or self._running == 0 or self._reserved + need <= self.memory_budget
+
+    def _take(self, need: int):
+        self._running += 1
+        self._reserved += need
+
+    def try_acquire(self, need: int) -> bool:
+        """Takes a slot for a process needing need bytes if one is free right now."""
+        with self._condition:
+            if not self._admits(need):
+                return False
+            self._take(need)
+            return True
+
+    def release(self, need: int):
+        """Returns a slot taken by try_acquire (slot does this itself)."""
+        with self._condition:
+            self._running -= 1
+            self._reserved -= need
+            self._condition.notify_all()
+            listeners = list(self._release_listeners)
+        for listener in listeners:
+            listener()
+
+    def add_release_listener(self, listener: Callable[[], None]):
+        """Calls listener (from the releasing thread) whenever a slot is freed."""
+        with self._condition:
+            self._release_listeners.append(listener)
+
+    def remove_release_listener(self, listener: Callable[[], None]):
+        with self._condition:
+            self._release_listeners.remove(listener)
+
+    def slot(self, archive_path: Path, cancel: Optional[CancelToken] = None):
+        """
+        Blocks until a 7z process for archive_path may start, and holds its
+        place. Raises OperationCancelled if cancel fires while waiting.
+        """
+        return self.reserve(self.estimate(archive_path), cancel)
+
+    @contextmanager
+    def reserve(self, need: int, cancel: Optional[CancelToken] = None):
+        """slot for a process whose memory need is already known, e.g. one reading a stream."""
+        with self._condition:
+            poll = None if cancel is None else CANCEL_POLL_INTERVAL
+            while not self._condition.wait_for(lambda: self._admits(need), poll):
+                cancel.check()
+            self._take(need)
+        try:
+            yield
+        finally:
+            self.release(need)
+
+default_scheduler = SevenZipScheduler()
+
+def set_7z_limits(
+    max_processes: Optional[int] = None,
+    threads: Optional[int] = None,
+    memory_budget: Optional[int] = None
+) -> SevenZipScheduler:
+    """
+    Replaces the process-wide 7z scheduler (see SevenZipScheduler) and
+    returns it. Processes already running keep their old slots.
+    """
+    global default_scheduler
+    default_scheduler = SevenZipScheduler(max_processes, threads, memory_budget)
+    return default_scheduler
+
+SEVENZIP_READ_SIZE = 64 * 1024
+# Only the end of stderr is kept: it holds the error summary
+STDERR_TAIL_BYTES = 64 * 1024
+# 7z redraws its progress line with backspaces and carriage returns
+_OUTPUT_SEPARATORS = re.compile(rb"[\r\n\x08]+")
+_PERCENT_PATTERN = re.compile(r"^\s*(\d{1,3})%")
+_TEST_ENTRY_PREFIX = "T "
+# An empty password: 7z then fails on encrypted archives instead of
+# prompting (stdin is closed as well, in case a prompt is attempted)
+SEVENZIP_NO_PASSWORD = "-p"
+
+LayerStats = dict
+# Receives (archive_path, layer, stats) for every layer measured
+StatsHook = Callable[[Path, str, LayerStats], None]
+
+# thread_time is Python 3.7+; process_time also counts other threads
+_thread_time = getattr(time, "thread_time", time.process_time)
+# A context variable rather than a thread-local, so asyncio tasks sharing
+# one thread (see aio) each see only their own processes
+_subprocess_runs = contextvars.ContextVar("subprocess_runs", default=None)
+
+@contextmanager
+def _record_subprocesses():
+    """Collects (seconds, returncode) of every 7z process this thread (or task) runs."""
+    runs = []
+    token = _subprocess_runs.set(runs)
+    try:
+        yield runs
+    finally:
+        _subprocess_runs.reset(token)
+
+def note_subprocess(started: float, returncode: int):
+    runs = _subprocess_runs.get()
+    if runs is not None:
+        runs.append((time.perf_counter() - started, returncode))
+
+class _Stopwatch:
+    """Wall and CPU time of the calling thread since it was created."""
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = _thread_time()
+
+    def stats(self, bytes_read: int = 0, runs: Iterable[Tuple[float, int]] = (), cached: bool = False) -> LayerStats:
+        runs = list(runs)
+        failed = [code for _, code in runs if code != 0]
+        return {
+            "wall_seconds": time.perf_counter() - self.wall,
+            "cpu_seconds": _thread_time() - self.cpu,
+            "bytes_read": bytes_read,
+            "subprocess_count": len(runs),
+            "subprocess_seconds": sum(seconds for seconds, _ in runs) if runs else None,
+            "subprocess_returncode": (failed or [code for _, code in runs] or [None])[-1],
+            "cached": cached,
+        }
+
+class SevenZipResult(NamedTuple):
+    """Exit code, parsed content hash and stderr tail of one 7z run."""
+    returncode: int
+    content_hash: Optional[str]
+    stderr: str
+
+def collect_tail(stream, tail: bytearray):
+    """Reads stream to EOF, keeping only its last STDERR_TAIL_BYTES."""
+    for chunk in iter(lambda: stream.read(SEVENZIP_READ_SIZE), b""):
+        tail += chunk
+        del tail[:-STDERR_TAIL_BYTES]
+
+def run_7z_test(
+    archive_path: Path,
+    content_hash: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> SevenZipResult:
+    """
+    Runs '7z t' (with -scrcSHA256 if content_hash) and parses its output
+    while it is produced, so memory stays flat whatever the entry count.
+    7z never waits for input: encrypted archives fail the test.
+
+    With a progress callback, 7z is asked for its percentage and per-entry
+    output (-bsp1 -bb1) and each update is reported as a ProgressEvent.
+    Once the digest line has been seen the rest of the output is drained
+    without being decoded. The process waits for a slot from the 7z
+    scheduler (see set_7z_limits) before it is started.
+
+    If cancel fires, while waiting for the slot or while 7z runs, the
+    process is killed and OperationCancelled raised.
+    """
+    scheduler = default_scheduler
+    args = sevenzip_test_args(archive_path, content_hash, progress, scheduler)
+    with scheduler.slot(archive_path, cancel):
+        return _run_7z_test_process(args, content_hash, progress, cancel)
+
+def sevenzip_test_args(
+    archive_path: Path,
+    content_hash: bool,
+    progress: Optional[ProgressCallback],
+    scheduler: SevenZipScheduler
+) -> List[str]:
+    args = ["7z", "t", SEVENZIP_NO_PASSWORD]
+    if content_hash:
+        args.append("-scrcSHA256")
+    if progress:
+        args += ["-bsp1", "-bb1"]
+    args += scheduler.switches()
+    args.append(str(archive_path))
+    return args
+
+class SevenZipOutputParser:
+    """Incremental parser of '7z t' output: the content digest and progress events."""
+
+    def __init__(self, content_hash: bool, progress: Optional[ProgressCallback]):
+        self.content_hash = content_hash
+        self.progress = progress
+        self.digest = None
+        self._last_percent = None
+        self._pending = b""
+
+    def feed(self, chunk: bytes):
+        """Parses the next chunk of stdout; b"" marks its end."""
+        if self.digest is not None:
+            return  # The rest is drained without being decoded
+        if chunk:
+            segments = _OUTPUT_SEPARATORS.split(self._pending + chunk)
+            # The last segment may be an incomplete line; a runaway one is truncated
+            self._pending = segments.pop()[-SEVENZIP_READ_SIZE:]
+        else:
+            segments, self._pending = [self._pending], b""
+
+        for segment in segments:
+            line = segment.decode(errors="replace")
+            if self.content_hash and "SHA256 for data:" in line:
+                self.digest = _parse_content_hash(line)
+                return
+            if not self.progress:
+                continue
+            match = _PERCENT_PATTERN.match(line)
+            if match and int(match.group(1)) != self._last_percent:
+                self._last_percent = int(match.group(1))
+                self.progress(ProgressEvent(PROGRESS_PERCENT, percent=self._last_percent))
+            elif line.startswith(_TEST_ENTRY_PREFIX):
+                self.progress(ProgressEvent(PROGRESS_ENTRY, entry=line[len(_TEST_ENTRY_PREFIX):]))
+
+def kill_when_cancelled(process: subprocess.Popen, cancel: CancelToken, finished: threading.Event):
+    while not finished.wait(CANCEL_POLL_INTERVAL):
+        if cancel.cancelled:
+            process.kill()
+            return
+
+def _run_7z_test_process(
+    args: List[str],
+    content_hash: bool,
+    progress: Optional[ProgressCallback],
+    cancel: Optional[CancelToken] = None
+) -> SevenZipResult:
+    started = time.perf_counter()
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = bytearray()
+    stderr_reader = threading.Thread(target=collect_tail, args=(process.stderr, stderr_tail), daemon=True)
+    stderr_reader.start()
+    finished = threading.Event()
+    if cancel is not None:
+        # The reader below blocks in read1, so another thread does the killing
+        threading.Thread(target=kill_when_cancelled, args=(process, cancel, finished), daemon=True).start()
+
+    parser = SevenZipOutputParser(content_hash, progress)
+    try:
+        while True:
+            chunk = process.stdout.read1(SEVENZIP_READ_SIZE)
+            parser.feed(chunk)
+            if not chunk:
+                break
+    except BaseException:
+        process.kill()  # The progress callback failed: do not wait for 7z to finish
+        raise
+    finally:
+        finished.set()
+        process.stdout.close()
+        returncode = process.wait()
+        note_subprocess(started, returncode)
+        stderr_reader.join()
+        process.stderr.close()
+
+    if cancel is not None:
+        cancel.check()
+    return SevenZipResult(returncode, parser.digest, stderr_tail.decode(errors="replace"))
+
+def verify_archive_integrity(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> bool:
+    """
+    Verifies the internal integrity of the archive using '7z t'.
+    With engine="native", ZIP/TAR/gzip/bzip2/xz are tested in-process.
+    progress receives 7z's ProgressEvents and cancel can stop 7z (see
+    run_7z_test).
+    """
+    check_engine(engine)
+    if engine == ENGINE_NATIVE:
+        native = native_check_archive(archive_path)
+        if native is not None:
+            return native.ok
+
     if not check_7z_installed():
         raise RuntimeError("7z is not installed or not in PATH.")
     
     try:
         # 7z t <archive>
-        result = subprocess.run(
-            ["7z", "t", str(archive_path)],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        return result.returncode == 0
+        return run_7z_test(archive_path, progress=progress, cancel=cancel).returncode == 0
+    except OperationCancelled:
+        raise
     except Exception as e:
         raise ArchiveError(f"Failed to run 7z: {e}")
 
-def get_archive_content_hash(archive_path: Path) -> Optional[str]:
+def _parse_content_hash(output: str) -> Optional[str]:
+    """Extracts the digest (with any carry suffix, canonicalised) from the 'SHA256 for data:' line of 7z output."""
+    for line in output.splitlines():
+        if "SHA256 for data:" in line:
+            # Line format: "SHA256 for data: <hash>[-<carry>]"
+            parts = line.split(":")
+            if len(parts) >= 2 and parts[1].strip():
+                return canonical_content_hash(parts[1].strip().split()[0]) # Take first part if there are extra spaces
+    return None
+
+def check_archive(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> ArchiveCheck:
     """
-    Gets the content hash of the archive using '7z t -scrcSHA256'.
-    Parses the output for 'SHA256 for data:'.
+    Runs '7z t -scrcSHA256' once and returns both the structural verdict
+    (Layer 2) and the content hash (Layer 3).
+
+    Testing and content hashing each decompress the whole archive, so
+    doing them in one pass halves the cost of a full verification.
+
+    With engine="native", formats the standard library can read are
+    handled in-process, avoiding a 7z process per archive; everything
+    else still goes to 7z. progress receives 7z's ProgressEvents and
+    cancel can stop 7z (see run_7z_test).
     """
+    check_engine(engine)
+    if engine == ENGINE_NATIVE:
+        native = native_check_archive(archive_path)
+        if native is not None:
+            return native
+
     ensure_7z_installed()
 
     try:
         # 7z t -scrcSHA256 <archive>
+        result = run_7z_test(archive_path, content_hash=True, progress=progress, cancel=cancel)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        raise ArchiveError(f"Failed to run 7z: {e}")
+
+    if result.returncode != 0:
+        return ArchiveCheck(ok=False, content_hash=None, error=result.stderr)
+    return ArchiveCheck(ok=True, content_hash=result.content_hash, error="")
+
+def get_archive_content_hash(
+    archive_path: Path,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Optional[str]:
+    """
+    Gets the content hash of the archive using '7z t -scrcSHA256'.
+    Parses the output for 'SHA256 for data:'.
+    Raises InvalidArchiveError if 7z rejects the archive.
+    See check_archive for the engine, progress and cancel arguments.
+    """
+    check_engine(engine)
+    try:
+        check = check_archive(archive_path, engine, progress, cancel)
+    except (DependencyError, OperationCancelled):
+        raise
+    except Exception as e:
+        raise ArchiveError(f"Failed to get content hash: {e}")
+
+    if not check.ok:
+        raise InvalidArchiveError(f"Failed to get content hash: 7z command failed: {check.error}")
+    return check.content_hash
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+LISTING_SEPARATOR = "----------"
+# Checksum placeholder for members whose data could not be read back
+UNREADABLE = "unreadable"
+
+class MemberInfo(NamedTuple):
+    """Name, size and checksums of one file inside an archive."""
+    name: str
+    size: int
+    crc32: str
+    sha256: str
+
+def _hash_member(stream, size: Optional[int] = None) -> Tuple[int, str, str]:
+    """
+    Hashes one member from stream, reading exactly size bytes when given
+    (or up to EOF). Returns (size, crc32, sha256).
+    """
+    sha = hashlib.sha256()
+    crc = 0
+    remaining = size
+    total = 0
+    while remaining is None or remaining > 0:
+        want = DEFAULT_BLOCK_SIZE if remaining is None else min(DEFAULT_BLOCK_SIZE, remaining)
+        chunk = stream.read(want)
+        if not chunk:
+            if remaining:
+                raise ArchiveError(f"Unexpected end of data ({remaining} bytes missing)")
+            break
+        sha.update(chunk)
+        crc = zlib.crc32(chunk, crc)
+        total += len(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+    return total, f"{crc:08x}", sha.hexdigest()
+
+def _native_members(archive_path: Path, select: Callable[[str], bool], strict: bool) -> Optional[List[MemberInfo]]:
+    """Per-member hashes for ZIP/TAR read in-process, or None if unsupported."""
+    members = []
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not select(info.filename):
+                    continue
+                if info.flag_bits & 0x1 or stat.S_ISLNK(info.external_attr >> 16):
+                    return None
+                try:
+                    with zf.open(info) as member:
+                        members.append(MemberInfo(info.filename, *_hash_member(member)))
+                except (zipfile.BadZipFile, zlib.error, EOFError):
+                    # A damaged member (e.g. bad CRC) does not stop the others from being checked
+                    if strict:
+                        raise
+                    members.append(MemberInfo(info.filename, info.file_size, UNREADABLE, UNREADABLE))
+        return members
+
+    with open(archive_path, "rb") as f:
+        magic = f.read(len(XZ_MAGIC))
+    if magic.startswith((GZIP_MAGIC, BZIP2_MAGIC, XZ_MAGIC)):
+        return None  # Single streams: 7z names the member from stream headers
+    try:
+        tf = tarfile.open(archive_path, mode="r:")
+    except tarfile.ReadError:
+        return None
+    with tf:
+        while True:
+            member = tf.next()
+            if member is None:
+                break
+            tf.members.clear()
+            if member.isdir() or not select(member.name):
+                continue
+            if not member.isreg() or member.issparse():
+                return None
+            members.append(MemberInfo(member.name, *_hash_member(tf.extractfile(member))))
+    return members
+
+def _normalize_member_name(name: str) -> str:
+    return name.replace("\\", "/") if os.sep == "\\" else name
+
+def _7z_listing(archive_path: Path) -> List[dict]:
+    """The properties of every entry '7z l -slt' lists, in archive order."""
+    ensure_7z_installed()
+    started = time.perf_counter()
+    try:
         result = subprocess.run(
-            ["7z", "t", "-scrcSHA256", str(archive_path)],
+            ["7z", "l", "-slt", SEVENZIP_NO_PASSWORD, str(archive_path)],
+            stdin=subprocess.DEVNULL,
             capture_output=True,
             text=True,
             check=False
         )
-        
-        if result.returncode != 0:
-            raise ArchiveError(f"7z command failed: {result.stderr}")
-
-        # Parse output
-        # Look for "SHA256 for data: <hash>"
-        for line in result.stdout.splitlines():
-            if "SHA256 for data:" in line:
-                # Line format: "SHA256 for data: <hash>"
-                parts = line.split(":")
-                if len(parts) >= 2:
-                    return parts[1].strip().split()[0] # Take first part if there are extra spaces
-        
+    except Exception as e:
+        raise ArchiveError(f"Failed to run 7z: {e}")
+    note_subprocess(started, result.returncode)
+    if result.returncode != 0:
+        raise InvalidArchiveError(f"Failed to list archive: 7z command failed: {result.stderr}")
+
+    _, _, listing = result.stdout.partition(LISTING_SEPARATOR)
+    entries = []
+    for block in listing.split("\n\n"):
+        props = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition(" = ")
+            if sep:
+                props[key.strip()] = value
+        if "Path" in props:
+            entries.append(props)
+    return entries
+
+def list_archive_members(archive_path: Path) -> List[Tuple[str, int]]:
+    """
+    Lists the files (not directories) in an archive as (name, size) using
+    '7z l -slt', in archive order.
+    """
+    return [
+        (_normalize_member_name(props["Path"]), int(props.get("Size") or 0))
+        for props in _7z_listing(archive_path)
+        if props.get("Folder") != "+" and "D" not in props.get("Attributes", "")[:1]
+    ]
+
+def _7z_members(archive_path: Path, select: Callable[[str], bool], strict: bool) -> List[MemberInfo]:
+    """
+    Per-member hashes from one '7z x -so' stream: 7z writes the selected
+    files back to back in archive order, so the stream is split using the
+    sizes from the listing. Only the selected members are decompressed.
+    Unless strict, a failing 7z still yields what it extracted, with
+    members it never delivered marked UNREADABLE.
+    """
+    listed = [(name, size) for name, size in list_archive_members(archive_path) if select(name)]
+    if not listed:
+        return []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        list_file = Path(tmp) / "members.txt"
+        list_file.write_text("\n".join(name for name, _ in listed) + "\n", encoding="utf-8")
+        # stderr goes to a file so a chatty 7z can never block on a full pipe
+        scheduler = default_scheduler
+        with open(Path(tmp) / "stderr.txt", "w+") as stderr, scheduler.slot(archive_path):
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                ["7z", "x", "-so", "-scsUTF-8", SEVENZIP_NO_PASSWORD, *scheduler.switches(), str(archive_path), f"@{list_file}"],
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                stdin=subprocess.DEVNULL
+            )
+            members = []
+            try:
+                for name, size in listed:
+                    members.append(MemberInfo(name, *_hash_member(process.stdout, size)))
+            except ArchiveError:
+                pass  # Truncated stream: reported through the exit code below
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+                note_subprocess(started, returncode)
+            if strict and (returncode != 0 or len(members) != len(listed)):
+                stderr.seek(0)
+                raise InvalidArchiveError(f"Failed to extract archive: 7z command failed: {stderr.read()}")
+    for name, size in listed[len(members):]:
+        members.append(MemberInfo(name, size, UNREADABLE, UNREADABLE))
+    return members
+
+def compute_member_hashes(
+    archive_path: Path,
+    patterns: Optional[List[str]] = None,
+    engine: str = ENGINE_7Z,
+    strict: bool = True
+) -> List[MemberInfo]:
+    """
+    Computes name, size, CRC32 and SHA-256 of every file in the archive,
+    sorted by name. With patterns (fnmatch globs), only matching members
+    are read. Raises InvalidArchiveError if the archive cannot be read;
+    without strict, damaged members are reported with UNREADABLE
+    checksums instead so the remaining members can still be compared.
+    """
+    check_engine(engine)
+
+    def select(name: str) -> bool:
+        return not patterns or any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+    members = None
+    if engine == ENGINE_NATIVE:
+        try:
+            members = _native_members(archive_path, select, strict)
+        except NotImplementedError:
+            members = None
+        except Exception as e:
+            raise InvalidArchiveError(f"Failed to read archive: {e}")
+    if members is None:
+        members = _7z_members(archive_path, select, strict)
+    return sorted(members, key=lambda m: m.name)
+
+def content_hash_from_members(members: List[MemberInfo]) -> Optional[str]:
+    """The 7z 'SHA256 for data' equivalent of a complete member list."""
+    if not members:
         return None
+    return _format_data_sum(sum(int.from_bytes(bytes.fromhex(m.sha256), "little") for m in members))
+
+def manifest_path_for(archive_path: Path) -> Path:
+    return archive_path.with_name(archive_path.name + MANIFEST_SUFFIX)
+
+def write_member_manifest(archive_path: Path, members: List[MemberInfo]) -> Path:
+    """Writes the per-member manifest next to the archive and returns its path."""
+    manifest_file = manifest_path_for(archive_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "archive": archive_path.name,
+        "members": [m._asdict() for m in members]
+    }
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.write("\n")
+    return manifest_file
+
+def read_member_manifest(manifest_file: Path) -> List[MemberInfo]:
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [MemberInfo(**m) for m in manifest["members"]]
+
+def verify_members(
+    archive_path: Path,
+    manifest_file: Optional[Path] = None,
+    patterns: Optional[List[str]] = None,
+    engine: str = ENGINE_7Z
+) -> dict:
+    """
+    Checks archive members against the per-member manifest, reading only
+    the members that match patterns (all members if None).
+
+    Returns a layer-style dictionary whose details list the checked count
+    and every mismatching, missing or unexpected entry by name.
+    """
+    manifest_file = manifest_file or manifest_path_for(archive_path)
+    if not manifest_file.exists():
+        return {"status": "SKIPPED", "message": "No manifest file", "details": str(manifest_file)}
 
+    try:
+        expected = {
+            m.name: m for m in read_member_manifest(manifest_file)
+            if not patterns or any(fnmatch.fnmatchcase(m.name, p) for p in patterns)
+        }
+        actual = {m.name: m for m in compute_member_hashes(archive_path, patterns, engine, strict=False)}
     except Exception as e:
-        raise ArchiveError(f"Failed to get content hash: {e}")
+        return {"status": "ERROR", "message": str(e), "details": None}
+
+    mismatches = [
+        {"name": name, "expected": expected[name]._asdict(), "actual": actual[name]._asdict()}
+        for name in sorted(expected.keys() & actual.keys())
+        if expected[name] != actual[name]
+    ]
+    details = {
+        "checked": len(expected.keys() & actual.keys()),
+        "mismatches": mismatches,
+        "missing": sorted(expected.keys() - actual.keys()),
+        "unexpected": sorted(actual.keys() - expected.keys())
+    }
+    if mismatches or details["missing"] or details["unexpected"]:
+        return {"status": "FAILED", "message": "Member mismatch", "details": details}
+    return {"status": "PASSED", "message": f"{details['checked']} member(s) match", "details": details}
+
+# create_hashes and verify_layers are written as generators that yield
+# their expensive operations instead of calling them, so the same code is
+# driven synchronously here (run_steps) and on an event loop (aio).
+class StepCall(NamedTuple):
+    """Step: call function(*args) and send back its result."""
+    function: Callable
+    args: tuple
+
+class StepStart(NamedTuple):
+    """Step: start function(*args) in the background and send back a handle."""
+    function: Callable
+    args: tuple
+
+class StepJoin(NamedTuple):
+    """Step: wait for a StepStart handle and send back its result."""
+    handle: Any
+
+Steps = Generator[Any, Any, Any]
+
+def run_steps(steps: Steps) -> Any:
+    """Runs a step generator in the calling thread and returns its result."""
+    executor = None
+    try:
+        request = next(steps)
+        while True:
+            try:
+                if isinstance(request, StepStart):
+                    if executor is None:
+                        # Deferred: concurrent.futures pulls in logging, a large share of CLI start-up
+                        from concurrent.futures import ThreadPoolExecutor
+                        executor = ThreadPoolExecutor(max_workers=1)
+                    result = executor.submit(request.function, *request.args)
+                elif isinstance(request, StepJoin):
+                    result = request.handle.result()
+                else:
+                    result = request.function(*request.args)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        # Background work is always waited for, even if a step failed
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+def _cache_lookup(cache: Optional[HashCache], archive_path: Path, refresh: bool) -> Tuple[Optional[FileIdentity], Optional[CacheEntry]]:
+    """Returns the archive's cache key and, unless refreshing, its cached entry."""
+    if cache is None:
+        return None, None
+    try:
+        key = file_identity(archive_path)
+    except OSError:
+        return None, None
+    return key, (None if refresh else cache.lookup(key))
+
+def _update_cache(cache: Optional[HashCache], archive_path: Path, key: Optional[FileIdentity], facts: dict):
+    """Stores newly computed facts unless the file changed while it was read."""
+    if cache is None or key is None or not facts:
+        return
+    try:
+        if file_identity(archive_path) != key:
+            return
+    except OSError:
+        return
+    cache.store(key, **facts)
+
+def _file_size(path: Path) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+def _timed_file_hashes(
+    archive_path: Path,
+    algorithms: List[str],
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[dict, LayerStats]:
+    """_compute_file_hashes plus the stats of the thread that ran it."""
+    watch = _Stopwatch()
+    digests = _compute_file_hashes(archive_path, algorithms, progress, cancel)
+    return digests, watch.stats(bytes_read=_file_size(archive_path))
+
+def _timed_tree_hash(
+    archive_path: Path,
+    algorithm: str,
+    segment_size: int,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[TreeHash, LayerStats]:
+    """calculate_tree_hash plus the stats of the thread that ran it."""
+    watch = _Stopwatch()
+    tree = calculate_tree_hash(archive_path, algorithm, segment_size, progress=progress, cancel=cancel)
+    return tree, watch.stats(bytes_read=tree.size)
+
+def _report_layer(progress: Optional[ProgressCallback], layer: str):
+    if progress is not None:
+        progress(ProgressEvent(PROGRESS_LAYER, layer=layer))
+
+def _report_stats(stats_hook: Optional[StatsHook], archive_path: Path, stats: dict):
+    if stats_hook is None:
+        return
+    for layer in sorted(stats):
+        stats_hook(archive_path, layer, stats[layer])
 
-def create_hashes(archive_path: Path) -> Tuple[Path, Optional[Path]]:
+def create_hashes(
+    archive_path: Path,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    manifest: bool = False,
+    stats_hook: Optional[StatsHook] = None,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    tree_hash: bool = False,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    directory_sums: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None
+) -> Tuple[Path, Optional[Path]]:
     """
     Creates .sha256 and .content.sha256 files for the given archive.
     Returns paths to the created files.
+
+    algorithms selects the Layer 1 hashes (see HASH_ALGORITHMS); all of
+    them are computed in one read pass and each gets its own sidecar,
+    e.g. test.zip.blake2b. The first one's sidecar is returned.
+
+    With tree_hash, Layer 1 is instead a tree hash (see
+    calculate_tree_hash) over segments of segment_size bytes, hashed in
+    parallel with the single given algorithm and written to a
+    .treehash.json sidecar, which is returned.
+
+    The archive is validated by the same 7z pass that produces the content
+    hash, and the file hash is computed concurrently so both readers are
+    served by one trip through the page cache. Raises InvalidArchiveError
+    (and writes nothing) if 7z rejects the archive.
+
+    With a cache, results for an unchanged file are reused instead of
+    recomputed (unless refresh is set) and new results are recorded.
+    See check_archive for the engine argument.
+
+    With directory_sums, the file and content hashes are recorded in the
+    directory's sums file (see sums.update_sums) instead of sidecars, and
+    its path is returned for both; a tree hash keeps its own sidecar.
+
+    With manifest, a per-member manifest (see verify_members) is written
+    as well; the content hash is then derived from the member hashes, so
+    the archive is still decompressed only once.
+
+    stats_hook, if given, is called with (archive_path, layer, stats) for
+    "layer1" (file hash) and "layer2" (the pass producing the content
+    hash); see verify_layers for the stats fields.
+
+    progress, if given, receives ProgressEvents as in verify_layers. Layer
+    1 hashing and the 7z pass overlap, so their events interleave.
+
+    cancel (a CancelToken) and timeout (seconds) stop the hashing and kill
+    7z, raising OperationCancelled or OperationTimedOut; nothing is
+    written then.
     """
+    return run_steps(create_hashes_steps(
+        archive_path, cache, refresh, engine, manifest, stats_hook, algorithms, tree_hash, segment_size, directory_sums,
+        progress, cancel, timeout
+    ))
+
+def create_hashes_steps(
+    archive_path: Path,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    manifest: bool = False,
+    stats_hook: Optional[StatsHook] = None,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    tree_hash: bool = False,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    directory_sums: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None
+) -> Steps:
+    """create_hashes as a step generator (see run_steps)."""
     if not archive_path.exists():
         raise FileNotFoundError(f"Archive not found: {archive_path}")
 
-    # Layer 1: File Hash
-    file_hash = calculate_file_hash(archive_path)
-    # Standard: Append .sha256 to the full filename (e.g., test.zip -> test.zip.sha256)
-    hash_file = archive_path.with_name(archive_path.name + ".sha256")
-    
-    with open(hash_file, "w") as f:
-        f.write(f"{file_hash}  {archive_path.name}\n")
+    algorithms = list(dict.fromkeys(algorithms))
+    if not algorithms:
+        raise ValueError("No hash algorithm given")
+    for algorithm in algorithms:
+        hashlib.new(algorithm)  # Fail on unknown names before any work is done
+    if tree_hash and len(algorithms) > 1:
+        raise ValueError("A tree hash uses a single algorithm")
+
+    token = _linked_token(cancel, timeout)
+    cache_key, cached = _cache_lookup(cache, archive_path, refresh)
+    file_hashes = {a: cached.file_hashes[a] for a in algorithms if a in cached.file_hashes} if cached else {}
+    # A cached tree root cannot replace the segment digests, so trees are always computed
+    missing = [] if tree_hash else [a for a in algorithms if a not in file_hashes]
+    content_cached = cached is not None and cached.content_known
+    facts = {}
+    stats = {}
+
+    # Layer 1: File Hash, in the background while the archive is tested.
+    # It has its own token so an invalid archive does not wait for the full read.
+    file_hash_job = None
+    file_hash_token = CancelToken(parent=token)
+    if tree_hash or missing:
+        _report_layer(progress, "layer1")
+    if tree_hash:
+        file_hash_job = yield StepStart(_timed_tree_hash, (archive_path, algorithms[0], segment_size, progress, file_hash_token))
+    elif missing:
+        file_hash_job = yield StepStart(_timed_file_hashes, (archive_path, missing, progress, file_hash_token))
+    else:
+        stats["layer1"] = _Stopwatch().stats(cached=True)
+    # Layer 2 & 3: Validity and Content Hash
+    members = None
+    watch = _Stopwatch()
+    with _record_subprocesses() as runs:
+        try:
+            if manifest:
+                _report_layer(progress, "layer2")
+                members = yield StepCall(compute_member_hashes, (archive_path, None, engine))
+                content_hash = content_hash_from_members(members)
+                facts.update(archive_ok=True, content_hash=content_hash, content_known=True)
+            elif content_cached:
+                content_hash = cached.content_hash
+            else:
+                _report_layer(progress, "layer2")
+                content_hash = yield StepCall(get_archive_content_hash, (archive_path, engine, progress, token))
+                facts.update(archive_ok=True, content_hash=content_hash, content_known=True)
+        except BaseException:
+            file_hash_token.cancel()  # Nothing will be written: stop reading the file
+            raise
+    from_cache = content_cached and not manifest
+    stats["layer2"] = watch.stats(
+        bytes_read=0 if from_cache else _file_size(archive_path), runs=runs, cached=from_cache
+    )
+    tree = None
+    if tree_hash:
+        tree, stats["layer1"] = yield StepJoin(file_hash_job)
+        facts["file_hashes"] = {_tree_cache_key(tree.algorithm, tree.segment_size): tree.root}
+    elif file_hash_job is not None:
+        computed, stats["layer1"] = yield StepJoin(file_hash_job)
+        file_hashes.update(computed)
+        facts["file_hashes"] = computed
+    if token is not None:
+        token.check()  # Covers the member pass too, which cannot be interrupted
+
+    _update_cache(cache, archive_path, cache_key, facts)
+
+    hash_file, content_hash_file = write_hashes(archive_path, algorithms, file_hashes, content_hash, directory_sums, tree)
+
+    if members is not None:
+        write_member_manifest(archive_path, members)
+
+    _report_stats(stats_hook, archive_path, stats)
+    return hash_file, content_hash_file
+
+def write_hashes(
+    archive_path: Path,
+    algorithms: List[str],
+    file_hashes: dict,
+    content_hash: Optional[str],
+    directory_sums: bool,
+    tree: Optional[TreeHash] = None
+) -> Tuple[Path, Optional[Path]]:
+    """Records computed hashes as create_hashes does and returns the same paths."""
+    if tree is not None:
+        hash_file = write_tree_hash(archive_path, tree)
+    elif directory_sums:
+        hash_file = None
+    else:
+        # Standard: Append .<algorithm> to the full filename (e.g., test.zip -> test.zip.sha256)
+        hash_files = [write_hash_file(archive_path, algorithm, file_hashes[algorithm]) for algorithm in algorithms]
+        hash_file = hash_files[0]
 
-    # Layer 3: Content Hash
-    content_hash = get_archive_content_hash(archive_path)
     content_hash_file = None
-    if content_hash:
+    if directory_sums:
+        # One append covers every hash of the archive
+        record = {} if tree is not None else {hash_tag(a): file_hashes[a] for a in algorithms}
+        if content_hash:
+            record[CONTENT_TAG] = content_hash
+        sums_file = update_sums(archive_path, record)
+        hash_file = hash_file or sums_file
+        content_hash_file = sums_file if content_hash else None
+    elif content_hash:
         content_hash_file = archive_path.with_name(archive_path.name + ".content.sha256")
         with open(content_hash_file, "w") as f:
             f.write(f"{content_hash}\n")
-            
     return hash_file, content_hash_file
 
 def find_hash_files(archive_path: Path) -> dict:
     """
     Finds existing hash files for the given archive.
-    Returns a dictionary with paths or None.
+    Returns a dictionary with paths or None: archive_hash is the preferred
+    Layer 1 sidecar (the tree hash if there is one), archive_hashes maps
+    every algorithm found to its plain sidecar.
+
+    The directory's sums file is consulted first: hashes recorded there
+    map to its path (also in 'sums'), and sidecars are only looked for
+    what it does not hold, so a fully recorded archive costs no stat of
+    its own.
     """
     result = {
         'archive_hash': None,
-        'content_hash': None
+        'archive_hashes': {},
+        'tree_hash': None,
+        'content_hash': None,
+        'sums': None
     }
-    
-    # Layer 1: Archive Hash
-    # Check for .sha256 extension
-    potential_hash = archive_path.with_name(archive_path.name + ".sha256")
-    if potential_hash.exists():
-        result['archive_hash'] = potential_hash
+
+    entry = lookup_sums(archive_path)
+    if entry:
+        sums_file = sums_path_for(archive_path.parent)
+        result['sums'] = sums_file
+        result['archive_hashes'] = {algorithm: sums_file for algorithm in _sums_file_hashes(entry)}
+        if CONTENT_TAG in entry:
+            result['content_hash'] = sums_file
+
+    if result['archive_hashes']:
+        result['archive_hash'] = result['sums']
+    else:
+        # Layer 1: Archive Hash
+        # Check for a .<algorithm> sidecar per supported algorithm; the first
+        # found in HASH_ALGORITHMS order is the preferred one
+        for algorithm in HASH_ALGORITHMS:
+            potential_hash = hash_file_path(archive_path, algorithm)
+            if potential_hash.exists():
+                result['archive_hashes'][algorithm] = potential_hash
+        if result['archive_hashes']:
+            result['archive_hash'] = next(iter(result['archive_hashes'].values()))
+
+        # A tree hash sidecar takes precedence: it is verified in parallel
+        potential_tree = tree_hash_path_for(archive_path)
+        if potential_tree.exists():
+            result['tree_hash'] = potential_tree
+            result['archive_hash'] = potential_tree
         
     # Layer 3: Content Hash
-    potential_content = archive_path.with_name(archive_path.name + ".content.sha256")
-    if potential_content.exists():
-        result['content_hash'] = potential_content
+    if result['content_hash'] is None:
+        potential_content = archive_path.with_name(archive_path.name + CONTENT_HASH_SUFFIX)
+        if potential_content.exists():
+            result['content_hash'] = potential_content
         
     return result
 
-def verify_layers(archive_path: Path, hash_file: Optional[Path] = None, content_hash_file: Optional[Path] = None) -> dict:
+def sidecar_archive_path(sidecar: Path) -> Optional[Path]:
+    """
+    The archive a sidecar as named by find_hash_files belongs to, e.g.
+    test.zip for test.zip.treehash.json, test.zip.blake2b or
+    test.zip.content.sha256; None for any other file.
+    """
+    # The content suffix ends in an algorithm one, so it is tried first
+    suffixes = [CONTENT_HASH_SUFFIX, TREE_HASH_SUFFIX] + [f".{algorithm}" for algorithm in HASH_ALGORITHMS]
+    for suffix in suffixes:
+        if sidecar.name.endswith(suffix) and sidecar.name != suffix:
+            return sidecar.with_name(sidecar.name[:-len(suffix)])
+    return None
+
+def _verify_tree_hash(
+    archive_path: Path,
+    tree_file: Path,
+    cached: Optional[CacheEntry],
+    facts: dict,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[dict, int, bool]:
+    """
+    Layer 1 against a tree hash sidecar. A mismatch lists the corrupt byte
+    ranges under details["ranges"]. Returns (result, bytes read, cached).
+    """
+    expected = read_tree_hash(tree_file)
+    key = _tree_cache_key(expected.algorithm, expected.segment_size)
+    if cached and cached.file_hashes.get(key) == expected.root:
+        return {"status": "PASSED", "message": "Match", "details": None}, 0, True
+
+    actual = calculate_tree_hash(archive_path, expected.algorithm, expected.segment_size, progress=progress, cancel=cancel)
+    facts["file_hashes"] = {key: actual.root}
+    if actual.root == expected.root:
+        return {"status": "PASSED", "message": "Match", "details": None}, actual.size, False
+    result = {
+        "status": "WARNING",
+        "message": "Hash mismatch",
+        "details": {
+            "expected": expected.root,
+            "actual": actual.root,
+            "algorithm": expected.algorithm,
+            "ranges": tree_hash_mismatches(expected, actual)
+        }
+    }
+    return result, actual.size, False
+
+POLICY_FULL = "full"
+POLICY_FAST = "fast"
+POLICIES = (POLICY_FULL, POLICY_FAST)
+# Why a layer was not run, in its details["reason"]; "timeout" also
+# marks the layer that was running when its time ran out
+SKIP_POLICY = "policy"
+SKIP_FAIL_FAST = "fail_fast"
+SKIP_DEADLINE = "deadline"
+SKIP_TIMEOUT = "timeout"
+# Rough single-core throughputs used to order layers under a deadline:
+# Layer 1 is one sequential read, Layers 2/3 a full decompression
+ESTIMATED_HASH_RATE = 500 * 1024 * 1024
+ESTIMATED_TEST_RATE = 100 * 1024 * 1024
+
+def _not_run(message: str, reason: str) -> dict:
+    return {"status": "SKIPPED", "message": f"Not run: {message}", "details": {"reason": reason}}
+
+def _skipped_by_policy(layer: dict) -> bool:
+    details = layer.get("details")
+    return layer["status"] == "SKIPPED" and isinstance(details, dict) and details.get("reason") == SKIP_POLICY
+
+def layer_timed_out(layer: dict) -> bool:
+    """Whether layer was interrupted by a timeout, which says nothing about the archive."""
+    details = layer.get("details")
+    return layer["status"] == "ERROR" and isinstance(details, dict) and details.get("reason") == SKIP_TIMEOUT
+
+def verify_layers(
+    archive_path: Path,
+    hash_file: Optional[Path] = None,
+    content_hash_file: Optional[Path] = None,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    stats_hook: Optional[StatsHook] = None,
+    policy: str = POLICY_FULL,
+    fail_fast: bool = False,
+    deadline: Optional[float] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None,
+    layer_timeout: Optional[float] = None
+) -> dict:
     """
     Performs the 3-layer verification.
     
     Args:
         archive_path: Path to the archive.
-        hash_file: Optional explicit path to the layer 1 hash file.
+        hash_file: Optional explicit path to the layer 1 hash file (plain
+            or tree hash). Without it, a tree hash sidecar is used if
+            present, else every plain sidecar find_hash_files discovers is
+            checked, all from a single read of the archive.
         content_hash_file: Optional explicit path to the layer 3 content hash file.
+        cache: Optional HashCache. Hashes and verdicts of an unchanged
+            archive are taken from it instead of being recomputed.
+        refresh: Ignore cached results (fresh results are still stored).
+        engine: "7z", or "native" to test and hash ZIP/TAR/gzip/bzip2/xz
+            in-process (other formats still use 7z).
+        stats_hook: Optional callable receiving (archive_path, layer, stats)
+            for each layer, e.g. to forward timings to a metrics system.
+        policy: "full" runs every layer; "fast" treats a Layer 1 match
+            as sufficient and skips the decompression of Layers 2 and 3.
+        fail_fast: Stop once a layer has FAILED or ERROR.
+        deadline: Optional budget in seconds. Layers then run cheapest
+            first (by estimated cost), and a layer that would not finish
+            within what is left of the budget is not started.
+        progress: Optional callable receiving ProgressEvents from the
+            working threads: PROGRESS_LAYER as each layer starts, then
+            PROGRESS_BYTES while Layer 1 hashes and 7z's PROGRESS_PERCENT
+            and PROGRESS_ENTRY during the Layer 2/3 pass. It must be
+            thread-safe and quick, e.g. a queue's put.
+        cancel: Optional CancelToken. Once it fires, hashing stops, 7z is
+            killed and OperationCancelled is raised.
+        timeout: Hard limit in seconds for the whole verification, and
+        layer_timeout: for each layer (the Layer 2/3 pass counts as one).
+            Unlike deadline, these interrupt work already running: the
+            interrupted layer is an ERROR and the layers after an expired
+            timeout are SKIPPED, both with details["reason"] "timeout".
         
     Returns:
-        A dictionary containing the status and details of each layer.
+        A dictionary containing the status, message, details and stats of
+        each layer. stats holds wall_seconds, cpu_seconds (of the calling
+        thread), bytes_read, subprocess_count, subprocess_seconds and
+        subprocess_returncode (None when no 7z process ran) and cached.
+        The single pass serving Layers 2 and 3 is accounted to layer2.
+        Layers that were not run are SKIPPED with details["reason"] set
+        to "policy", "fail_fast", "deadline" or "timeout".
     """
+    return run_steps(verify_layers_steps(
+        archive_path, hash_file, content_hash_file, cache, refresh, engine, stats_hook, policy, fail_fast, deadline,
+        progress, cancel, timeout, layer_timeout
+    ))
+
+def verify_layers_steps(
+    archive_path: Path,
+    hash_file: Optional[Path] = None,
+    content_hash_file: Optional[Path] = None,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    stats_hook: Optional[StatsHook] = None,
+    policy: str = POLICY_FULL,
+    fail_fast: bool = False,
+    deadline: Optional[float] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None,
+    layer_timeout: Optional[float] = None
+) -> Steps:
+    """verify_layers as a step generator (see run_steps)."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    started = time.monotonic()
+    token = _linked_token(cancel, timeout)
     results = {
         "layer1": {"status": "SKIPPED", "message": "No hash file", "details": None},
         "layer2": {"status": "PENDING", "message": "", "details": None},
@@ -162,63 +1916,443 @@ def verify_layers(archive_path: Path, hash_file: Optional[Path] = None, content_
 
     # Auto-discovery if not provided
     found_hashes = find_hash_files(archive_path)
-    if not hash_file and found_hashes['archive_hash']:
-        hash_file = found_hashes['archive_hash']
+    if hash_file:
+        hash_files = [hash_file]
+    elif found_hashes['tree_hash']:
+        hash_files = [found_hashes['tree_hash']]
+    else:
+        hash_files = list(dict.fromkeys(found_hashes['archive_hashes'].values()))
     if not content_hash_file and found_hashes['content_hash']:
         content_hash_file = found_hashes['content_hash']
+    content_expected = content_hash_file is not None and content_hash_file.exists()
 
-    # Layer 1: Archive Hash
-    if hash_file:
-        if not hash_file.exists():
-             results["layer1"] = {"status": "SKIPPED", "message": "File not found", "details": str(hash_file)}
-        else:
+    cache_key, cached = _cache_lookup(cache, archive_path, refresh)
+    facts = {}
+
+    def check_archive_hash(token):
+        # Layer 1: Archive Hash
+        watch = _Stopwatch()
+        hashed_bytes = 0
+        hash_cached = False
+        if hash_files:
+            if not hash_files[0].exists():
+                 results["layer1"] = {"status": "SKIPPED", "message": "File not found", "details": str(hash_files[0])}
+            else:
+                try:
+                    if hash_files[0].name.endswith(TREE_HASH_SUFFIX):
+                        results["layer1"], hashed_bytes, hash_cached = yield StepCall(
+                            _verify_tree_hash, (archive_path, hash_files[0], cached, facts, progress, token)
+                        )
+                    else:
+                        expected = read_file_hashes(archive_path, hash_files)
+                        actual = {a: cached.file_hashes[a] for a in expected if a in cached.file_hashes} if cached else {}
+                        missing = [a for a in expected if a not in actual]
+                        hash_cached = not missing
+                        if missing:
+                            computed = yield StepCall(_compute_file_hashes, (archive_path, missing, progress, token))
+                            hashed_bytes = _file_size(archive_path)
+                            actual.update(computed)
+                            facts["file_hashes"] = computed
+
+                        mismatched = [a for a in expected if expected[a] != actual[a]]
+                        if mismatched:
+                            algorithm = mismatched[0]
+                            results["layer1"] = {
+                                "status": "WARNING",
+                                "message": "Hash mismatch",
+                                "details": {"expected": expected[algorithm], "actual": actual[algorithm], "algorithm": algorithm}
+                            }
+                        else:
+                            results["layer1"] = {"status": "PASSED", "message": "Match", "details": None}
+                except OperationCancelled:
+                    raise
+                except Exception as e:
+                    results["layer1"] = {"status": "ERROR", "message": str(e), "details": None}
+        results["layer1"]["stats"] = watch.stats(bytes_read=hashed_bytes, cached=hash_cached)
+
+    def check_archive_contents(token):
+        # Layer 2 & 3 share one 7z pass whenever a content hash must be checked
+        archive_check = None
+        check_error = None
+        from_cache = False
+        watch = _Stopwatch()
+        with _record_subprocesses() as runs:
             try:
-                with open(hash_file, "r") as f:
-                    expected = f.read().split()[0].strip().lower()
-                actual = calculate_file_hash(archive_path)
-                
-                if expected != actual:
-                    results["layer1"] = {
-                        "status": "WARNING", 
-                        "message": "Hash mismatch", 
-                        "details": {"expected": expected, "actual": actual}
-                    }
+                if content_expected and cached and cached.content_known:
+                    archive_check = ArchiveCheck(ok=True, content_hash=cached.content_hash, error="")
+                    archive_ok = from_cache = True
+                elif content_expected:
+                    archive_check = yield StepCall(check_archive, (archive_path, engine, progress, token))
+                    archive_ok = archive_check.ok
+                    facts.update(archive_ok=archive_ok, content_hash=archive_check.content_hash, content_known=archive_ok)
+                elif cached and cached.archive_ok:
+                    archive_ok = from_cache = True
+                else:
+                    archive_ok = yield StepCall(verify_archive_integrity, (archive_path, engine, progress, token))
+                    facts["archive_ok"] = archive_ok
+
+                if archive_ok:
+                    results["layer2"] = {"status": "PASSED", "message": "Integrity OK", "details": None}
                 else:
-                    results["layer1"] = {"status": "PASSED", "message": "Match", "details": None}
+                    results["layer2"] = {"status": "FAILED", "message": "Integrity Check Failed", "details": None}
+            except OperationCancelled:
+                raise
             except Exception as e:
-                results["layer1"] = {"status": "ERROR", "message": str(e), "details": None}
+                check_error = e
+                results["layer2"] = {"status": "FAILED", "message": f"Error: {e}", "details": None}
+        results["layer2"]["stats"] = watch.stats(
+            bytes_read=0 if from_cache or check_error else _file_size(archive_path), runs=runs, cached=from_cache
+        )
+
+        # Layer 3: Content Hash
+        watch = _Stopwatch()
+        if content_hash_file:
+            if not content_hash_file.exists():
+                 results["layer3"] = {"status": "SKIPPED", "message": "File not found", "details": str(content_hash_file)}
+            elif archive_check is None:
+                results["layer3"] = {"status": "ERROR", "message": str(check_error), "details": None}
+            elif not archive_check.ok:
+                results["layer3"] = {
+                    "status": "ERROR",
+                    "message": f"Failed to get content hash: 7z command failed: {archive_check.error}",
+                    "details": None
+                }
+            else:
+                try:
+                    expected_content = read_content_hash(archive_path, content_hash_file)
+                    
+                    actual_content = archive_check.content_hash
+                    if actual_content:
+                        actual_content = canonical_content_hash(actual_content)
+                    
+                    if expected_content != actual_content:
+                         results["layer3"] = {
+                            "status": "FAILED", 
+                            "message": "Hash mismatch", 
+                            "details": {"expected": expected_content, "actual": actual_content}
+                        }
+                    else:
+                        results["layer3"] = {"status": "PASSED", "message": "Match", "details": None}
+                except Exception as e:
+                    results["layer3"] = {"status": "ERROR", "message": str(e), "details": None}
+        results["layer3"]["stats"] = watch.stats()
+
+    # (layers, run, estimated seconds). A cached result costs nothing;
+    # a tree hash reads the same bytes as a plain one, only in parallel.
+    size = _file_size(archive_path)
+    hash_known = bool(cached) and bool(cached.file_hashes)
+    contents_known = bool(cached) and (cached.content_known if content_expected else cached.archive_ok)
+    steps = [
+        (("layer1",), check_archive_hash, 0.0 if not hash_files or hash_known else size / ESTIMATED_HASH_RATE),
+        (("layer2", "layer3"), check_archive_contents, 0.0 if contents_known else size / ESTIMATED_TEST_RATE),
+    ]
+    # The fast policy needs the Layer 1 verdict before deciding anything else
+    if deadline is not None and policy != POLICY_FAST:
+        steps.sort(key=lambda step: step[2])
+
+    def record(layers, result, watch):
+        for name in layers:
+            # A missing content hash stays reported as such
+            if name != "layer3" or content_hash_file:
+                results[name] = dict(result)
+            results[name]["stats"] = watch.stats()
+
+    stop = None
+    for layers, run, estimate in steps:
+        skip = stop
+        if skip is None and deadline is not None and estimate > deadline - (time.monotonic() - started):
+            skip = _not_run(f"deadline ({deadline:g}s) would be exceeded", SKIP_DEADLINE)
+        if skip is not None:
+            record(layers, skip, _Stopwatch())
+            continue
+
+        _report_layer(progress, layers[0])
+        watch = _Stopwatch()
+        try:
+            yield from run(_linked_token(token, layer_timeout))
+        except OperationTimedOut as e:
+            # Cancellation propagates; running out of time is a verdict
+            record(layers, {"status": "ERROR", "message": str(e), "details": {"reason": SKIP_TIMEOUT}}, watch)
+            if token is not None and token.cancelled:
+                stop = _not_run("the timeout expired", SKIP_TIMEOUT)
+                continue
+        statuses = [results[name]["status"] for name in layers]
+        if policy == POLICY_FAST and statuses == ["PASSED"]:
+            stop = _not_run("archive hash matches (fast policy)", SKIP_POLICY)
+        elif fail_fast and any(status in ("FAILED", "ERROR") for status in statuses):
+            stop = _not_run("an earlier layer failed (fail-fast)", SKIP_FAIL_FAST)
+
+    _update_cache(cache, archive_path, cache_key, facts)
+    _report_stats(stats_hook, archive_path, {name: layer["stats"] for name, layer in results.items()})
+    return results
 
-    # Layer 2: 7z Internal Integrity
+def overall_status(results: dict) -> str:
+    """
+    Reduces verify_layers results to one verdict, using the same rules as
+    the CLI: a broken structure or content mismatch fails the archive,
+    an archive hash mismatch only warns. A Layer 1 match passes on its own
+    when the fast policy skipped the decompression layers. A layer that
+    timed out makes the result an ERROR, which a resumed run retries.
+    """
+    l1 = results["layer1"]["status"]
+    l2 = results["layer2"]["status"]
+    l3 = results["layer3"]["status"]
+    if l2 == "FAILED" or (l2 == "ERROR" and not layer_timed_out(results["layer2"])) or l3 == "FAILED":
+        return "FAILED"
+    if "ERROR" in (l1, l2, l3):
+        return "ERROR"
+    if l1 == "WARNING":
+        return "WARNING"
+    if l1 == "PASSED" and _skipped_by_policy(results["layer2"]):
+        return "PASSED"
+    if "SKIPPED" in (l1, l2, l3):
+        return "SKIPPED"
+    return "PASSED"
+
+ARCHIVE_EXTENSIONS = (".zip", ".7z", ".rar", ".tar", ".gz", ".tgz", ".bz2", ".tbz2", ".xz", ".txz")
+CONTENT_HASH_SUFFIX = ".content.sha256"
+# Keep a few tasks queued per worker so no worker idles between results
+PENDING_TASKS_PER_WORKER = 2
+
+class ArchiveEntry(NamedTuple):
+    """An archive found by iter_archives and the sidecars next to it."""
+    archive_path: Path
+    hash_file: Optional[Path]
+    content_hash_file: Optional[Path]
+
+class TreeResult(NamedTuple):
+    """Per-archive outcome of create_tree / verify_tree."""
+    archive_path: Path
+    status: str
+    message: str
+    details: Any
+
+def iter_archives(root: Path) -> Iterator[ArchiveEntry]:
+    """
+    Lazily walks root with os.scandir and yields every archive together
+    with its sidecars (the preferred Layer 1 one, as in find_hash_files).
+    Sidecars are matched against the directory listing, so discovery
+    costs no extra stat calls; a directory sums file is read once per
+    directory and takes precedence over sidecars, as in find_hash_files.
+    Entries are sorted within each directory for deterministic output.
+    """
+    if not root.is_dir():
+        raise NotADirectoryError(f"Not a directory: {root}")
+
+    pending_dirs = [root]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+
+        file_names = set()
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(Path(entry.path))
+            elif entry.is_file():
+                file_names.add(entry.name)
+
+        sums = load_sums(directory) if SUMS_FILE_NAME in file_names else None
+        for name in sorted(file_names):
+            if not name.lower().endswith(ARCHIVE_EXTENSIONS):
+                continue
+            recorded = (sums.get(name) if sums else None) or {}
+            if _sums_file_hashes(recorded):
+                hash_name = SUMS_FILE_NAME
+            else:
+                candidates = [name + TREE_HASH_SUFFIX] + [f"{name}.{a}" for a in HASH_ALGORITHMS]
+                hash_name = next((candidate for candidate in candidates if candidate in file_names), None)
+            content_name = SUMS_FILE_NAME if CONTENT_TAG in recorded else name + CONTENT_HASH_SUFFIX
+            yield ArchiveEntry(
+                archive_path=directory / name,
+                hash_file=directory / hash_name if hash_name else None,
+                content_hash_file=directory / content_name if content_name in file_names else None
+            )
+
+        # Reversed so the stack visits subdirectories in sorted order
+        pending_dirs.extend(reversed(subdirs))
+
+def _run_bounded(task: Callable[[Any], TreeResult], items: Iterable, workers: Optional[int]) -> Iterator[TreeResult]:
+    """
+    Runs task over items on a thread pool, yielding results as they finish.
+
+    Only a bounded number of items is pulled from the (lazy) input at a
+    time. Threads suffice because the heavy lifting happens in 7z child
+    processes and in hashlib, which releases the GIL.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * PENDING_TASKS_PER_WORKER
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(task, item))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+JOURNAL_CREATE = "create"
+JOURNAL_VERIFY = "verify"
+
+def _fingerprint(paths: Iterable[Optional[Path]]) -> list:
+    """File identities of paths as JSON-friendly lists (None if absent)."""
+    fingerprint = []
+    for path in paths:
+        try:
+            fingerprint.append(list(file_identity(path)) if path else None)
+        except OSError:
+            fingerprint.append(None)
+    return fingerprint
+
+def _journaled(
+    task: Callable[[ArchiveEntry], TreeResult],
+    command: str,
+    journal: Optional[Journal],
+    resume: bool,
+    with_sidecars: bool
+) -> Callable[[ArchiveEntry], TreeResult]:
+    """
+    Wraps a tree task so every finished archive is recorded in journal and,
+    with resume, archives finished by an earlier run are skipped if they
+    (and, with_sidecars, their sidecars) are unchanged. ERROR results are
+    always retried.
+    """
+    if journal is None:
+        if resume:
+            raise ValueError("Resuming needs a journal")
+        return task
+
+    def run(entry: ArchiveEntry) -> TreeResult:
+        paths = [entry.archive_path] + ([entry.hash_file, entry.content_hash_file] if with_sidecars else [])
+        # Taken before the work: a file changed mid-run no longer matches on resume
+        fingerprint = _fingerprint(paths)
+        if resume:
+            previous = journal.lookup(command, entry.archive_path)
+            if previous and previous.fingerprint == fingerprint and previous.status != "ERROR":
+                return TreeResult(entry.archive_path, previous.status, f"{previous.message} (from journal)", None)
+        result = task(entry)
+        journal.record(command, entry.archive_path, fingerprint, result.status, result.message)
+        return result
+    return run
+
+def create_entry(entry: ArchiveEntry, **options) -> TreeResult:
+    cancel = options.get("cancel")
     try:
-        if verify_archive_integrity(archive_path):
-            results["layer2"] = {"status": "PASSED", "message": "Integrity OK", "details": None}
-        else:
-            results["layer2"] = {"status": "FAILED", "message": "Integrity Check Failed", "details": None}
+        hash_file, content_hash_file = create_hashes(entry.archive_path, **options)
+    except InvalidArchiveError:
+        return TreeResult(entry.archive_path, "FAILED", "Not a valid archive", None)
+    except OperationTimedOut as e:
+        if cancel is not None and cancel.cancelled:
+            raise  # The run's own token expired
+        return TreeResult(entry.archive_path, "ERROR", str(e), None)
+    except OperationCancelled:
+        raise  # Ends the whole tree run
     except Exception as e:
-        results["layer2"] = {"status": "FAILED", "message": f"Error: {e}", "details": None}
+        return TreeResult(entry.archive_path, "ERROR", str(e), None)
+    message = "Created hashes" if content_hash_file else "Created archive hash only"
+    return TreeResult(entry.archive_path, "CREATED", message, (hash_file, content_hash_file))
 
-    # Layer 3: Content Hash
-    if content_hash_file:
-        if not content_hash_file.exists():
-             results["layer3"] = {"status": "SKIPPED", "message": "File not found", "details": str(content_hash_file)}
-        else:
-            try:
-                with open(content_hash_file, "r") as f:
-                    expected_content = f.read().strip().lower()
-                
-                actual_content = get_archive_content_hash(archive_path)
-                if actual_content:
-                    actual_content = actual_content.lower()
-                
-                if expected_content != actual_content:
-                     results["layer3"] = {
-                        "status": "FAILED", 
-                        "message": "Hash mismatch", 
-                        "details": {"expected": expected_content, "actual": actual_content}
-                    }
-                else:
-                    results["layer3"] = {"status": "PASSED", "message": "Match", "details": None}
-            except Exception as e:
-                results["layer3"] = {"status": "ERROR", "message": str(e), "details": None}
+def _verify_entry(entry: ArchiveEntry, **options) -> TreeResult:
+    try:
+        results = verify_layers(entry.archive_path, entry.hash_file, entry.content_hash_file, **options)
+    except OperationCancelled:
+        raise  # Ends the whole tree run
+    except Exception as e:
+        return TreeResult(entry.archive_path, "ERROR", str(e), None)
+    status = overall_status(results)
+    failed = [
+        name for name, layer in results.items()
+        if layer["status"] not in ("PASSED", "SKIPPED")
+        or (isinstance(layer["details"], dict) and layer["details"].get("reason") in (SKIP_FAIL_FAST, SKIP_DEADLINE, SKIP_TIMEOUT))
+    ]
+    message = ", ".join(f"{name}: {results[name]['message']}" for name in failed) or "OK"
+    return TreeResult(entry.archive_path, status, message, results)
 
-    return results
+def create_tree(
+    root: Path,
+    workers: Optional[int] = None,
+    skip_existing: bool = False,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    manifest: bool = False,
+    stats_hook: Optional[StatsHook] = None,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    tree_hash: bool = False,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    journal: Optional[Journal] = None,
+    resume: bool = False,
+    directory_sums: bool = False,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None
+) -> Iterator[TreeResult]:
+    """
+    Runs create_hashes for every archive under root on a bounded worker
+    pool (one worker per core by default), yielding results as they finish.
+
+    With skip_existing, archives that already have both sidecars are
+    reported as SKIPPED without being read. cache, refresh, engine,
+    manifest, stats_hook, algorithms, tree_hash, segment_size,
+    directory_sums, cancel and timeout (per archive) are passed on to
+    create_hashes; stats_hook is called from the worker threads. An
+    archive that times out is an ERROR, with nothing written for it;
+    firing cancel ends the run with OperationCancelled.
+
+    With a journal, every finished archive is recorded; with resume,
+    archives an earlier run finished are reported from the journal
+    instead of being read again, provided they are unchanged.
+    """
+    def task(entry: ArchiveEntry) -> TreeResult:
+        if skip_existing and entry.hash_file and entry.content_hash_file:
+            return TreeResult(entry.archive_path, "SKIPPED", "Hashes already exist", None)
+        return create_entry(
+            entry, cache=cache, refresh=refresh, engine=engine, manifest=manifest,
+            stats_hook=stats_hook, algorithms=algorithms, tree_hash=tree_hash, segment_size=segment_size,
+            directory_sums=directory_sums, cancel=cancel, timeout=timeout
+        )
+
+    task = _journaled(task, JOURNAL_CREATE, journal, resume, with_sidecars=False)
+    return _run_bounded(task, iter_archives(root), workers)
+
+def verify_tree(
+    root: Path,
+    workers: Optional[int] = None,
+    cache: Optional[HashCache] = None,
+    refresh: bool = False,
+    engine: str = ENGINE_7Z,
+    stats_hook: Optional[StatsHook] = None,
+    journal: Optional[Journal] = None,
+    resume: bool = False,
+    policy: str = POLICY_FULL,
+    fail_fast: bool = False,
+    deadline: Optional[float] = None,
+    cancel: Optional[CancelToken] = None,
+    timeout: Optional[float] = None,
+    layer_timeout: Optional[float] = None
+) -> Iterator[TreeResult]:
+    """
+    Runs verify_layers for every archive under root on a bounded worker
+    pool (one worker per core by default), yielding results as they finish.
+    The status of each result is overall_status() of its layers; cache,
+    refresh, engine, stats_hook, policy, fail_fast, deadline, cancel,
+    timeout and layer_timeout (the last three per archive) are passed on
+    to verify_layers (stats_hook is called from the worker threads).
+    Firing cancel ends the run with OperationCancelled.
+
+    journal and resume work as in create_tree; an archive is only resumed
+    if neither it nor its sidecars changed since it was verified.
+    """
+    def task(entry: ArchiveEntry) -> TreeResult:
+        return _verify_entry(
+            entry, cache=cache, refresh=refresh, engine=engine, stats_hook=stats_hook,
+            policy=policy, fail_fast=fail_fast, deadline=deadline,
+            cancel=cancel, timeout=timeout, layer_timeout=layer_timeout
+        )
+
+    task = _journaled(task, JOURNAL_VERIFY, journal, resume, with_sidecars=True)
+    return _run_bounded(task, iter_archives(root), workers)
@@ -0,0 +1,244 @@
+"""
+Resident verification service: a prioritised job queue (see jobs)
+served by a warm worker pool, with a small JSON API over localhost HTTP
+or a Unix socket.
+
+    POST   /jobs         {"command": "verify", "archive": "/data/a.zip", "priority": 5, "options": {...}}
+    GET    /jobs/<id>    Job state; ?wait=SECONDS blocks until it has finished
+    DELETE /jobs/<id>    Cancels a queued job or stops a running one
+    GET    /events       Streams every finished job as one JSON line
+                         (empty lines are keep-alives)
+    GET    /health       Queue and worker counts
+
+Jobs with a higher priority run first, equal priorities in submission
+order. Workers call the core functions directly, so start-up and the
+hash cache are paid for once rather than per check.
+
+Since a job writes files next to any path it is given, requests are
+only accepted from API clients rather than from web pages the user
+visits: bodies must be application/json, and requests that carry an
+Origin header, or a Host header naming anything but the loopback
+interface, are refused. With a token (see write_token_file), every
+request must also send "Authorization: Bearer <token>"; a TCP server on
+a non-loopback address requires one.
+"""
+import hmac
+import ipaddress
+import json
+import os
+import queue
+import secrets
+import socket
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+from .jobs import Job, JobQueue
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_WAIT_SECONDS = 300
+MAX_REQUEST_BYTES = 1024 * 1024
+# An idle event stream sends an empty line this often to detect departed clients
+EVENT_KEEPALIVE_SECONDS = 15
+JSON_CONTENT_TYPE = "application/json"
+# Host header values a loopback-only server answers to (any port)
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+# Unix sockets are missing on Windows and some other platforms
+UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+def _host_name(host_header: str) -> str:
+    """The host part of a Host header, without the port."""
+    if host_header.startswith("["):
+        return host_header[:host_header.find("]") + 1]
+    return host_header.rsplit(":", 1)[0]
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "DataIntegrityTool"
+
+    @property
+    def jobs(self) -> JobQueue:
+        return self.server.jobs
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Any):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _refused(self) -> bool:
+        """Answers and returns True unless the request may come from an API client."""
+        if self.headers.get("Origin") is not None:
+            # Browsers send Origin on cross-site requests; API clients do not
+            self._send_json(403, {"error": "Cross-origin requests are not accepted"})
+            return True
+        if self.server.loopback_only:
+            # Against DNS rebinding: a page's own host name must not reach us
+            if _host_name(self.headers.get("Host") or "") not in LOOPBACK_HOSTS:
+                self._send_json(403, {"error": "Unexpected Host header"})
+                return True
+        token = self.server.token
+        if token is not None:
+            supplied = self.headers.get("Authorization") or ""
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+                self._send_json(401, {"error": "Missing or wrong token"})
+                return True
+        return False
+
+    def _job_from_path(self, path: str) -> Optional[Job]:
+        job = self.jobs.get(path[len("/jobs/"):])
+        if job is None:
+            self._send_json(404, {"error": "Unknown job"})
+        return job
+
+    def do_POST(self):
+        if self._refused():
+            return
+        if urlparse(self.path).path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        if (self.headers.get("Content-Type") or "").split(";")[0].strip().lower() != JSON_CONTENT_TYPE:
+            self._send_json(415, {"error": f"Content-Type must be {JSON_CONTENT_TYPE}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {"error": "Request too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.jobs.submit(
+                request.get("command"), request["archive"], request.get("priority", 0), request.get("options")
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+        self._send_json(202, job.to_dict())
+
+    def do_GET(self):
+        if self._refused():
+            return
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, self.jobs.counts())
+        elif url.path == "/events":
+            self._stream_events()
+        elif url.path.startswith("/jobs/"):
+            job = self._job_from_path(url.path)
+            if job is None:
+                return
+            try:
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+            except ValueError:
+                self._send_json(400, {"error": "Bad wait value"})
+                return
+            if wait > 0:
+                job.done.wait(min(wait, MAX_WAIT_SECONDS))
+            self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_DELETE(self):
+        if self._refused():
+            return
+        url = urlparse(self.path)
+        if not url.path.startswith("/jobs/"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        job = self._job_from_path(url.path)
+        if job is None:
+            return
+        if self.jobs.cancel(job.id):
+            self._send_json(200, job.to_dict())
+        else:
+            self._send_json(409, {"error": f"Job is {job.state}"})
+
+    def _stream_events(self):
+        """Newline-delimited JSON, one line per finished job, until the client leaves."""
+        events = self.jobs.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            while True:
+                try:
+                    line = json.dumps(events.get(timeout=EVENT_KEEPALIVE_SECONDS).to_dict()).encode()
+                except queue.Empty:
+                    line = b""
+                self.wfile.write(line + b"\n")
+                self.wfile.flush()
+        except OSError:
+            pass  # Client disconnected
+        finally:
+            self.jobs.unsubscribe(events)
+            self.close_connection = True
+
+if UNIX_SOCKETS:
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def write_token_file(path: Path) -> str:
+    """Generates a token for one server instance and writes it to path, readable by the owner only."""
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        if hasattr(os, "fchmod"):  # Not on Windows before Python 3.13
+            os.fchmod(f.fileno(), 0o600)  # The file may have existed with wider permissions
+        f.write(token + "\n")
+    return token
+
+def make_server(
+    jobs: JobQueue,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[Path] = None,
+    verbose: bool = False,
+    token: Optional[str] = None
+):
+    """
+    Creates the API server for jobs, on a Unix socket if socket_path is
+    given, else on host:port. Call serve_forever() on the result. With
+    token, requests must present it; a non-loopback host raises
+    ValueError without one. A socket_path raises OSError where Unix
+    sockets are unsupported (see UNIX_SOCKETS).
+    """
+    if socket_path is not None:
+        if not UNIX_SOCKETS:
+            raise OSError("Unix sockets are not supported on this platform")
+        if socket_path.exists():
+            socket_path.unlink()  # Left over from a previous run
+        # Created owner-only: a chmod after bind would leave a window open
+        umask = os.umask(0o177)
+        try:
+            server = _UnixHTTPServer(str(socket_path), _Handler)
+        finally:
+            os.umask(umask)
+        server.loopback_only = False  # The socket's permissions restrict access
+    else:
+        if token is None and not is_loopback(host):
+            raise ValueError(f"Serving on {host} needs a token")
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        server.loopback_only = is_loopback(host)
+    server.jobs = jobs
+    server.verbose = verbose
+    server.token = token
+    return server
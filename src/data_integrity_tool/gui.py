@@ -1,10 +1,17 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from tkinter import ttk
+import itertools
+import os
+import queue
 import threading
+import time
 import webbrowser
 from pathlib import Path
-from .core import create_hashes, verify_archive_integrity, get_archive_content_hash, calculate_file_hash, find_hash_files, verify_layers, ArchiveError, DependencyError
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+from .core import create_hashes, find_hash_files, verify_layers, iter_archives, InvalidArchiveError
+from .core import ProgressEvent, PROGRESS_BYTES, PROGRESS_ENTRY, PROGRESS_LAYER, PROGRESS_PERCENT
+from .jobs import JobQueue, QUEUED, RUNNING, DONE, FAILED, CANCELLED
 
 try:
     from ._build_info import VERSION, AUTHOR, URL
@@ -128,7 +135,7 @@ class DataIntegrityApp(tk.Tk):
         self.container.grid_columnconfigure(0, weight=1)
 
         self.frames = {}
-        for F in (HomePage, CreatePage, VerifyPage):
+        for F in (HomePage, CreatePage, VerifyPage, BatchPage):
             page_name = F.__name__
             frame = F(parent=self.container, controller=self)
             self.frames[page_name] = frame
@@ -200,7 +207,169 @@ class HomePage(ttk.Frame):
                                 command=lambda: controller.show_frame("VerifyPage"))
         verify_btn.pack(fill="x", pady=10, ipadx=20)
 
-class CreatePage(ttk.Frame):
+        batch_btn = ttk.Button(center_frame, text="Batch Queue", style="Primary.TButton",
+                               command=lambda: controller.show_frame("BatchPage"))
+        batch_btn.pack(fill="x", pady=10, ipadx=20)
+
+# Worker threads never touch Tk: they report through a ProgressMonitor,
+# which the page drains on a fixed tick. Only the latest progress event of
+# each kind is drawn, and a tick's log lines are written in one insert.
+PROGRESS_TICK_MS = 100
+MIB = 1024 * 1024
+# Rates need a little history before they give a useful ETA
+MIN_ETA_SECONDS = 1.0
+LAYER_ACTIVITIES = {"layer1": "Hashing archive file", "layer2": "Testing archive contents"}
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def _fraction(event: ProgressEvent) -> float:
+    if event.kind == PROGRESS_PERCENT:
+        return min(event.percent, 100) / 100
+    return event.done / event.total if event.total else 1.0
+
+class ProgressMonitor:
+    """
+    What one worker thread reports to its page: core ProgressEvents (the
+    monitor is itself the progress callback), log lines and UI updates.
+    Safe to feed from any thread; drain() belongs to the Tk thread.
+    """
+
+    _FINISHED = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.started = time.monotonic()
+        self.finished = None  # Time the worker finished
+        self.layer = None
+        self.latest = {}  # kind -> latest ProgressEvent
+        self._first = {}  # kind -> (time, fraction) of its first event, for ETAs
+
+    def __call__(self, event: ProgressEvent):
+        self._queue.put(event)
+
+    def log(self, message: str):
+        self._queue.put(message)
+
+    def call(self, function: Callable[[], Any]):
+        self._queue.put(function)
+
+    def finish(self):
+        self._queue.put(self._FINISHED)
+
+    def drain(self) -> Tuple[List[str], List[Callable[[], Any]]]:
+        """Applies the events queued since the last drain; returns the log lines and UI updates among them."""
+        lines, calls = [], []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._FINISHED:
+                self.finished = time.monotonic()
+            elif isinstance(item, ProgressEvent):
+                self._apply(item)
+            elif isinstance(item, str):
+                lines.append(item)
+            else:
+                calls.append(item)
+        return lines, calls
+
+    def _apply(self, event: ProgressEvent):
+        if event.kind == PROGRESS_LAYER:
+            self.layer = event.layer
+            return
+        if event.kind == PROGRESS_ENTRY:
+            self.latest[event.kind] = event
+            return
+        if event.kind not in self._first or _fraction(event) < self._first[event.kind][1]:
+            # A new pass of the same kind starts its own rate
+            self._first[event.kind] = (time.monotonic(), _fraction(event))
+        self.latest[event.kind] = event
+
+    def _seconds_left(self, kind: str, fraction: float, now: float) -> Optional[float]:
+        since, first_fraction = self._first[kind]
+        if now - since < MIN_ETA_SECONDS or fraction <= first_fraction:
+            return None
+        return (1 - fraction) * (now - since) / (fraction - first_fraction)
+
+    def summary(self) -> Tuple[float, str]:
+        """Fraction done of the slowest running activity and a one-line description."""
+        now = time.monotonic()
+        if self.finished is not None:
+            return 1.0, f"Finished in {format_duration(self.finished - self.started)}"
+        fractions = []
+        parts = []
+        for kind, activity in ((PROGRESS_BYTES, "Hashing"), (PROGRESS_PERCENT, "Testing")):
+            event = self.latest.get(kind)
+            fraction = _fraction(event) if event else 1.0
+            if fraction >= 1.0:
+                continue
+            text = f"{activity}: {fraction:.0%}"
+            if kind == PROGRESS_BYTES:
+                text += f" ({event.done / MIB:.0f} of {event.total / MIB:.0f} MiB)"
+            elif PROGRESS_ENTRY in self.latest:
+                text += f" ({self.latest[PROGRESS_ENTRY].entry})"
+            left = self._seconds_left(kind, fraction, now)
+            if left is not None:
+                text += f", {format_duration(left)} left"
+            fractions.append(fraction)
+            parts.append(text)
+        if not parts:
+            return 0.0, f"{LAYER_ACTIVITIES.get(self.layer, 'Starting')}..."
+        return min(fractions), " | ".join(parts)
+
+class ProgressPump:
+    """
+    Mixin for pages that run one job at a time in a worker thread. The
+    worker reports through the monitor start_monitor() returns; the page
+    applies it every PROGRESS_TICK_MS until the worker calls finish().
+    """
+
+    def build_progress(self, parent):
+        self.monitor = None
+        self.progress_bar = ttk.Progressbar(parent, mode="determinate", maximum=1.0)
+        self.progress_bar.pack(fill="x")
+        self.lbl_progress = ttk.Label(parent, text="", style="Pending.TLabel")
+        self.lbl_progress.pack(anchor="w", pady=(0, 10))
+
+    def start_monitor(self) -> ProgressMonitor:
+        self.monitor = ProgressMonitor()
+        self.after(PROGRESS_TICK_MS, self._pump, self.monitor)
+        return self.monitor
+
+    def reset_progress(self):
+        self.monitor = None
+        self.progress_bar.configure(value=0)
+        self.lbl_progress.config(text="")
+
+    def log(self, message):
+        self.write_log([message])
+
+    def write_log(self, lines):
+        self.log_area.config(state='normal')
+        self.log_area.insert(tk.END, "\n".join(lines) + "\n")
+        self.log_area.see(tk.END)
+        self.log_area.config(state='disabled')
+
+    def _pump(self, monitor):
+        lines, calls = monitor.drain()
+        if lines:
+            self.write_log(lines)
+        for call in calls:
+            call()
+        # A job left running by a reset still finishes, but no longer draws progress
+        if monitor is self.monitor:
+            fraction, text = monitor.summary()
+            self.progress_bar.configure(value=fraction)
+            self.lbl_progress.config(text=text)
+        if monitor.finished is None:
+            self.after(PROGRESS_TICK_MS, self._pump, monitor)
+
+class CreatePage(ProgressPump, ttk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
@@ -237,7 +406,8 @@ class CreatePage(ttk.Frame):
         ttk.Button(file_frame, text="Browse", command=lambda: self.browse_file(self.create_file_path)).pack(side='right')
 
         ttk.Button(content_frame, text="Generate Hashes", style="Primary.TButton", 
-                   command=self.run_create_hash).pack(pady=30)
+                   command=self.run_create_hash).pack(pady=(30, 10))
+        self.build_progress(content_frame)
 
         # Results Area
         self.results_frame = ttk.LabelFrame(content_frame, text="Results", padding=10)
@@ -259,17 +429,12 @@ class CreatePage(ttk.Frame):
         if filename:
             var.set(filename)
 
-    def log(self, message):
-        self.log_area.config(state='normal')
-        self.log_area.insert(tk.END, message + "\n")
-        self.log_area.see(tk.END)
-        self.log_area.config(state='disabled')
-
     def reset(self):
         self.create_file_path.set("")
         self.log_area.config(state='normal')
         self.log_area.delete(1.0, tk.END)
         self.log_area.config(state='disabled')
+        self.reset_progress()
         
         # Reset results
         self.set_status(self.lbl_hash_file, "Hash File: -", "Pending.TLabel")
@@ -290,33 +455,42 @@ class CreatePage(ttk.Frame):
         self.set_status(self.lbl_hash_file, "Hash File: Pending...", "Pending.TLabel")
         self.set_status(self.lbl_content_hash, "Content Hash File: Pending...", "Pending.TLabel")
         
-        threading.Thread(target=self._create_hash_thread, args=(Path(path),), daemon=True).start()
+        monitor = self.start_monitor()
+        threading.Thread(target=self._create_hash_thread, args=(Path(path), monitor), daemon=True).start()
 
-    def _create_hash_thread(self, archive_path):
+    def _create_hash_thread(self, archive_path, monitor):
         try:
-            if not verify_archive_integrity(archive_path):
-                 self.after(0, lambda: messagebox.showerror("Error", "Not a valid archive."))
-                 return
-
-            self.after(0, lambda: self.log("Generating Archive File Hash..."))
-            hash_file, content_hash_file = create_hashes(archive_path)
-            self.after(0, lambda: self.log(f"Created {hash_file.name}"))
-            self.after(0, lambda: self.set_status(self.lbl_hash_file, f"Hash File: {hash_file.name} \u2714", "Success.TLabel"))
+            monitor.log("Generating Archive File Hash...")
+            try:
+                hash_file, content_hash_file = create_hashes(archive_path, progress=monitor)
+            except InvalidArchiveError:
+                monitor.call(lambda: messagebox.showerror("Error", "Not a valid archive."))
+                monitor.log("Error: Not a valid archive.")
+                monitor.call(lambda: self.set_status(self.lbl_hash_file, "Hash File: Failed \u2718", "Failure.TLabel"))
+                monitor.call(lambda: self.set_status(self.lbl_content_hash, "Content Hash File: Failed \u2718", "Failure.TLabel"))
+                return
+
+            monitor.log(f"Created {hash_file.name}")
+            monitor.call(lambda: self.set_status(self.lbl_hash_file, f"Hash File: {hash_file.name} \u2714", "Success.TLabel"))
             
             if content_hash_file:
-                self.after(0, lambda: self.log(f"Created {content_hash_file.name}"))
-                self.after(0, lambda: self.set_status(self.lbl_content_hash, f"Content Hash File: {content_hash_file.name} \u2714", "Success.TLabel"))
+                monitor.log(f"Created {content_hash_file.name}")
+                monitor.call(lambda: self.set_status(self.lbl_content_hash, f"Content Hash File: {content_hash_file.name} \u2714", "Success.TLabel"))
             else:
-                self.after(0, lambda: self.set_status(self.lbl_content_hash, "Content Hash File: N/A", "Pending.TLabel"))
+                monitor.call(lambda: self.set_status(self.lbl_content_hash, "Content Hash File: N/A", "Pending.TLabel"))
             
 
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.after(0, lambda: self.log(f"Error: {e}"))
-            self.after(0, lambda: self.set_status(self.lbl_hash_file, "Hash File: Failed \u2718", "Failure.TLabel"))
-            self.after(0, lambda: self.set_status(self.lbl_content_hash, "Content Hash File: Failed \u2718", "Failure.TLabel"))
-
-class VerifyPage(ttk.Frame):
+            # e is unbound once the except block ends, before the tick runs the call
+            error = str(e)
+            monitor.call(lambda: messagebox.showerror("Error", error))
+            monitor.log(f"Error: {error}")
+            monitor.call(lambda: self.set_status(self.lbl_hash_file, "Hash File: Failed \u2718", "Failure.TLabel"))
+            monitor.call(lambda: self.set_status(self.lbl_content_hash, "Content Hash File: Failed \u2718", "Failure.TLabel"))
+        finally:
+            monitor.finish()
+
+class VerifyPage(ProgressPump, ttk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
@@ -370,7 +544,8 @@ class VerifyPage(ttk.Frame):
         ttk.Button(content_hash_frame, text="Browse", command=lambda: self.browse_file(self.content_hash_path)).pack(side='right')
 
         ttk.Button(content_frame, text="Verify Integrity", style="Primary.TButton", 
-                   command=self.run_verify_hash).pack(pady=30)
+                   command=self.run_verify_hash).pack(pady=(30, 10))
+        self.build_progress(content_frame)
 
         # Results Area
         self.results_frame = ttk.LabelFrame(content_frame, text="Verification Results", padding=10)
@@ -413,12 +588,6 @@ class VerifyPage(ttk.Frame):
         if filename:
             var.set(filename)
 
-    def log(self, message):
-        self.log_area.config(state='normal')
-        self.log_area.insert(tk.END, message + "\n")
-        self.log_area.see(tk.END)
-        self.log_area.config(state='disabled')
-
     def reset(self):
         self.verify_file_path.set("")
         self.archive_hash_path.set("")
@@ -426,6 +595,7 @@ class VerifyPage(ttk.Frame):
         self.log_area.config(state='normal')
         self.log_area.delete(1.0, tk.END)
         self.log_area.config(state='disabled')
+        self.reset_progress()
         
         # Reset results
         self.set_status(self.lbl_structure, "1. Data Structure: -", "Pending.TLabel")
@@ -473,73 +643,479 @@ class VerifyPage(ttk.Frame):
         archive_hash = self.archive_hash_path.get()
         content_hash = self.content_hash_path.get()
         
-        threading.Thread(target=self._verify_hash_thread, args=(Path(path), archive_hash, content_hash), daemon=True).start()
+        monitor = self.start_monitor()
+        threading.Thread(target=self._verify_hash_thread, args=(Path(path), archive_hash, content_hash, monitor), daemon=True).start()
 
-    def _verify_hash_thread(self, archive_path, archive_hash_path_str, content_hash_path_str):
+    def _verify_hash_thread(self, archive_path, archive_hash_path_str, content_hash_path_str, monitor):
         try:
             # Use centralized verification logic
-            results = verify_layers(archive_path, Path(archive_hash_path_str) if archive_hash_path_str else None, Path(content_hash_path_str) if content_hash_path_str else None)
+            results = verify_layers(archive_path, Path(archive_hash_path_str) if archive_hash_path_str else None, Path(content_hash_path_str) if content_hash_path_str else None, progress=monitor)
 
             # --- New Layer 1: Structure (Old Layer 2) ---
             l2 = results["layer2"]
-            self.after(0, lambda: self.log("Checking Data Structure (7z integrity)..."))
+            monitor.log("Checking Data Structure (7z integrity)...")
             
             if l2["status"] == "PASSED":
-                self.after(0, lambda: self.log("Structure Check: PASS"))
-                self.after(0, lambda: self.set_status(self.lbl_structure, "1. Data Structure: PASSED: Valid Structure \u2714", "Success.TLabel"))
+                monitor.log("Structure Check: PASS")
+                monitor.call(lambda: self.set_status(self.lbl_structure, "1. Data Structure: PASSED: Valid Structure \u2714", "Success.TLabel"))
             else:
-                self.after(0, lambda: self.log(f"Structure Check: FAIL ({l2['message']})"))
-                self.after(0, lambda: self.set_status(self.lbl_structure, "1. Data Structure: FAILED: Corrupted Structure \u2718", "Failure.TLabel"))
+                monitor.log(f"Structure Check: FAIL ({l2['message']})")
+                monitor.call(lambda: self.set_status(self.lbl_structure, "1. Data Structure: FAILED: Corrupted Structure \u2718", "Failure.TLabel"))
                 
                 # Stop if structure invalid?
                 if l2["status"] == "FAILED":
-                     self.after(0, lambda: messagebox.showerror("Failure", f"Structure check failed: {l2['message']}"))
+                     monitor.call(lambda: messagebox.showerror("Failure", f"Structure check failed: {l2['message']}"))
                      return
 
             # --- New Layer 2: Content Authenticity (Old Layer 3) ---
             l3 = results["layer3"]
-            self.after(0, lambda: self.log("Checking Content Authenticity..."))
+            monitor.log("Checking Content Authenticity...")
 
             content_passed = False
             if l3["status"] == "PASSED":
                 content_passed = True
-                self.after(0, lambda: self.log("Content Check: PASS"))
-                self.after(0, lambda: self.set_status(self.lbl_content, "2. Content Authenticity: PASSED: Matches Original Source \u2714", "Success.TLabel"))
+                monitor.log("Content Check: PASS")
+                monitor.call(lambda: self.set_status(self.lbl_content, "2. Content Authenticity: PASSED: Matches Original Source \u2714", "Success.TLabel"))
             elif l3["status"] == "FAILED":
-                self.after(0, lambda: self.log(f"Content Check: FAIL - Expected: {l3.get('details', {}).get('expected')} Actual: {l3.get('details', {}).get('actual')}"))
-                self.after(0, lambda: self.set_status(self.lbl_content, "2. Content Authenticity: FAILED: Content Mismatch / Tampered \u2718", "Failure.TLabel"))
+                monitor.log(f"Content Check: FAIL - Expected: {l3.get('details', {}).get('expected')} Actual: {l3.get('details', {}).get('actual')}")
+                monitor.call(lambda: self.set_status(self.lbl_content, "2. Content Authenticity: FAILED: Content Mismatch / Tampered \u2718", "Failure.TLabel"))
             elif l3["status"] == "ERROR":
-                self.after(0, lambda: self.log(f"Content Check: ERROR: {l3['message']}"))
-                self.after(0, lambda: self.set_status(self.lbl_content, f"2. Content Authenticity: FAILED: Error ({l3['message']}) \u2718", "Failure.TLabel"))
+                monitor.log(f"Content Check: ERROR: {l3['message']}")
+                monitor.call(lambda: self.set_status(self.lbl_content, f"2. Content Authenticity: FAILED: Error ({l3['message']}) \u2718", "Failure.TLabel"))
             else: # SKIPPED
-                self.after(0, lambda: self.log(f"Content Check: SKIPPED ({l3['message']})"))
-                self.after(0, lambda: self.set_status(self.lbl_content, f"2. Content Authenticity: SKIPPED: {l3['message']} \u2013", "Skipped.TLabel"))
+                monitor.log(f"Content Check: SKIPPED ({l3['message']})")
+                monitor.call(lambda: self.set_status(self.lbl_content, f"2. Content Authenticity: SKIPPED: {l3['message']} \u2013", "Skipped.TLabel"))
 
             # --- New Layer 3: Archive File (Old Layer 1) ---
             l1 = results["layer1"]
-            self.after(0, lambda: self.log("Checking Archive File Hash..."))
+            monitor.log("Checking Archive File Hash...")
             
             if l1["status"] == "PASSED":
-                 self.after(0, lambda: self.log("Archive Check: PASS"))
-                 self.after(0, lambda: self.set_status(self.lbl_archive, "3. Archive File: PASSED: Original File (Untouched) \u2714", "Success.TLabel"))
+                 monitor.log("Archive Check: PASS")
+                 monitor.call(lambda: self.set_status(self.lbl_archive, "3. Archive File: PASSED: Original File (Untouched) \u2714", "Success.TLabel"))
             elif l1["status"] == "WARNING":
-                 self.after(0, lambda: self.log(f"Archive Check: MISMATCH! Expected: {l1.get('details', {}).get('expected')} Actual: {l1.get('details', {}).get('actual')}"))
+                 monitor.log(f"Archive Check: MISMATCH! Expected: {l1.get('details', {}).get('expected')} Actual: {l1.get('details', {}).get('actual')}")
                  # Check if we should say "Re-archived" or just failed
                  if content_passed:
-                    self.after(0, lambda: self.set_status(self.lbl_archive, "3. Archive File: WARNING: Re-archived (Data Valid) \u26A0", "Skipped.TLabel")) # Orange for warning
+                    monitor.call(lambda: self.set_status(self.lbl_archive, "3. Archive File: WARNING: Re-archived (Data Valid) \u26A0", "Skipped.TLabel")) # Orange for warning
                  else:
-                    self.after(0, lambda: self.set_status(self.lbl_archive, "3. Archive File: FAILED: Modified \u2718", "Failure.TLabel"))
+                    monitor.call(lambda: self.set_status(self.lbl_archive, "3. Archive File: FAILED: Modified \u2718", "Failure.TLabel"))
             elif l1["status"] == "ERROR":
-                 self.after(0, lambda: self.log(f"Archive Check: ERROR: {l1['message']}"))
-                 self.after(0, lambda: self.set_status(self.lbl_archive, f"3. Archive File: FAILED: Error ({l1['message']}) \u2718", "Failure.TLabel"))
+                 monitor.log(f"Archive Check: ERROR: {l1['message']}")
+                 monitor.call(lambda: self.set_status(self.lbl_archive, f"3. Archive File: FAILED: Error ({l1['message']}) \u2718", "Failure.TLabel"))
             else: # SKIPPED
-                 self.after(0, lambda: self.log(f"Archive Check: SKIPPED ({l1['message']})"))
-                 self.after(0, lambda: self.set_status(self.lbl_archive, f"3. Archive File: SKIPPED: {l1['message']} \u2013", "Skipped.TLabel"))
+                 monitor.log(f"Archive Check: SKIPPED ({l1['message']})")
+                 monitor.call(lambda: self.set_status(self.lbl_archive, f"3. Archive File: SKIPPED: {l1['message']} \u2013", "Skipped.TLabel"))
 
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.after(0, lambda: self.log(f"Error: {e}"))
+            # e is unbound once the except block ends, before the tick runs the call
+            error = str(e)
+            monitor.call(lambda: messagebox.showerror("Error", error))
+            monitor.log(f"Error: {error}")
+        finally:
+            monitor.finish()
+
+# Batch page: the Treeview only holds the rows in view (see RowWindow),
+# only rows that changed since the last tick are redrawn, and new jobs are
+# queued a slice at a time, so thousands of jobs never stall the event loop
+BATCH_WORKERS = min(4, os.cpu_count() or 1)
+BATCH_TICK_MS = 100
+MAX_ROWS_PER_TICK = 500
+# Used until the theme reports the Treeview's row height
+DEFAULT_ROW_HEIGHT = 20
+BATCH_ACTIVITIES = {"layer1": "Hashing", "layer2": "Testing"}
+
+class ScanFinished(NamedTuple):
+    """Queued by a folder scan after its last archive; error is None if it completed."""
+    directory: Path
+    error: Optional[str]
+
+class BatchRow:
+    """One archive on the batch page and its latest job."""
+
+    def __init__(self, command: str, archive: Path):
+        self.command = command
+        self.archive = archive
+        self.job = None
+        self.state = QUEUED
+        self._progress = (None, 0.0)  # (layer, fraction), written by the worker thread
+
+    def __call__(self, event: ProgressEvent):
+        """Progress callback of the row's job."""
+        if event.kind == PROGRESS_LAYER:
+            self._progress = (event.layer, 0.0)
+        elif event.kind in (PROGRESS_BYTES, PROGRESS_PERCENT):
+            self._progress = (self._progress[0], _fraction(event))
+
+    def reset_progress(self):
+        self._progress = (None, 0.0)
+
+    def progress(self) -> str:
+        """What a running job is doing, e.g. 'Hashing 40%'."""
+        if self.state != RUNNING:
+            return ""
+        layer, fraction = self._progress
+        return f"{BATCH_ACTIVITIES.get(layer, 'Starting')} {int(fraction * 100)}%"
+
+    def status(self) -> str:
+        """PASSED/FAILED/... once finished, else the job state."""
+        if self.job is None or self.job.state != DONE:
+            return self.state.upper()
+        return self.job.result["status"] if self.command == "verify" else "CREATED"
+
+    def summary(self) -> str:
+        job = self.job
+        if job is None or job.state in (QUEUED, RUNNING, CANCELLED):
+            return ""
+        if job.state == FAILED:
+            return job.error
+        if self.command == "create":
+            return ", ".join(Path(p).name for p in dict.fromkeys(job.result.values()) if p)
+        layers = job.result["layers"]
+        failed = [name for name, layer in layers.items() if layer["status"] not in ("PASSED", "SKIPPED")]
+        return ", ".join(f"{name}: {layers[name]['message']}" for name in failed) or "OK"
+
+    def elapsed(self) -> str:
+        job = self.job
+        if job is None or job.started is None:
+            return ""
+        return format_duration((job.finished or time.time()) - job.started)
+
+class BatchQueue:
+    """
+    The rows of the batch page and the jobs behind them, run on a bounded
+    JobQueue. Knows nothing about Tk: poll() reports which rows changed so
+    the page redraws only those.
+    """
+
+    def __init__(self, workers: int = BATCH_WORKERS):
+        self.jobs = JobQueue(workers=workers)
+        self.rows = {}
+        self._finished = self.jobs.subscribe()
+        self._row_of_job = {}
+        self._active = set()
+        self._ids = itertools.count()
+
+    def add(self, command: str, archive: Path) -> str:
+        row_id = f"row{next(self._ids)}"
+        self.rows[row_id] = BatchRow(command, archive)
+        self._submit(row_id)
+        return row_id
+
+    def _submit(self, row_id: str):
+        row = self.rows[row_id]
+        row.reset_progress()
+        row.job = self.jobs.submit(row.command, row.archive, progress=row)
+        row.state = QUEUED
+        self._row_of_job[row.job.id] = row_id
+        self._active.add(row_id)
+
+    def cancel(self, row_id: str) -> bool:
+        """Cancels the row's job, stopping it if it is already running."""
+        row = self.rows[row_id]
+        return self.jobs.cancel(row.job.id)
+
+    def retry(self, row_id: str) -> bool:
+        """Queues a finished row again; False while it is still queued or running."""
+        if row_id in self._active:
+            return False
+        del self._row_of_job[self.rows[row_id].job.id]
+        self._submit(row_id)
+        return True
+
+    def remove(self, row_id: str) -> bool:
+        """Forgets a finished row."""
+        if row_id in self._active:
+            return False
+        row = self.rows.pop(row_id)
+        del self._row_of_job[row.job.id]
+        return True
+
+    def poll(self) -> set:
+        """Row ids whose state changed since the last poll, plus running rows (their time advances)."""
+        changed = set()
+        while True:
+            try:
+                job = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            row_id = self._row_of_job.get(job.id)
+            if row_id is not None and self.rows[row_id].job is job:
+                self._active.discard(row_id)
+                changed.add(row_id)
+        for row_id in self._active:
+            row = self.rows[row_id]
+            if row.job.state == RUNNING:
+                changed.add(row_id)
+        for row_id in changed:
+            self.rows[row_id].state = self.rows[row_id].job.state
+        return changed
+
+    def counts(self) -> Tuple[int, int]:
+        """(finished, total) rows."""
+        return len(self.rows) - len(self._active), len(self.rows)
+
+class RowWindow:
+    """
+    The slice of a long list of rows that is in view. The batch page keeps
+    only these rows in its Treeview and scrolls by swapping them, so a
+    list of any length costs no more to draw than a screenful. Knows
+    nothing about Tk.
+    """
+
+    def __init__(self, size: int = 1):
+        self.order: List[str] = []  # Every row id, in display order
+        self.top = 0
+        self.size = size
+
+    def visible(self) -> List[str]:
+        return self.order[self.top:self.top + self.size]
+
+    def append(self, row_id: str):
+        self.order.append(row_id)
+
+    def remove(self, row_ids: Iterable[str]):
+        gone = set(row_ids)
+        self.order = [row_id for row_id in self.order if row_id not in gone]
+        self._clamp()
+
+    def resize(self, size: int):
+        self.size = max(1, size)
+        self._clamp()
+
+    def scroll(self, rows: int):
+        self.top += rows
+        self._clamp()
+
+    def move_to(self, fraction: float):
+        self.top = round(fraction * len(self.order))
+        self._clamp()
+
+    def fractions(self) -> Tuple[float, float]:
+        """The visible part as a scrollbar's (first, last) fractions."""
+        if not self.order:
+            return 0.0, 1.0
+        total = len(self.order)
+        return self.top / total, min(1.0, (self.top + self.size) / total)
+
+    def _clamp(self):
+        self.top = max(0, min(self.top, len(self.order) - self.size))
+
+class BatchPage(ttk.Frame):
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+        self.controller = controller
+        self.batch = None  # Created on first use, so idle apps start no workers
+        self._pending = queue.Queue()  # (command, archive) and ScanFinished from folder scans
+        self._scans = 0  # Folder scans still walking; counted on the Tk thread
+        self._ticking = False
+        self.window = RowWindow()
+        self._shown: List[str] = []  # Row ids currently in the Treeview
+        self._selected = set()  # Selected row ids, including rows scrolled out of view
+
+        # Header
+        header_frame = ttk.Frame(self)
+        header_frame.pack(fill="x", padx=20, pady=20)
+
+        home_btn = ttk.Button(header_frame, text="← Back to Home",
+                              command=lambda: controller.show_frame("HomePage"))
+        home_btn.pack(side="left")
 
+        title = ttk.Label(header_frame, text="Batch Queue", style="Header.TLabel", font=("Helvetica", 18, "bold"))
+        title.pack(side="left", padx=20)
+
+        content_frame = ttk.Frame(self, padding=(20, 0, 20, 20))
+        content_frame.pack(fill="both", expand=True)
+
+        # Controls
+        controls = ttk.Frame(content_frame)
+        controls.pack(fill="x", pady=(0, 10))
+        self.command = tk.StringVar(value="verify")
+        ttk.Radiobutton(controls, text="Verify", variable=self.command, value="verify").pack(side="left")
+        ttk.Radiobutton(controls, text="Create", variable=self.command, value="create").pack(side="left", padx=(5, 15))
+        ttk.Button(controls, text="Add Files", command=self.add_files).pack(side="left", padx=2)
+        ttk.Button(controls, text="Add Folder", command=self.add_folder).pack(side="left", padx=2)
+        ttk.Button(controls, text="Clear Finished", command=self.clear_finished).pack(side="right", padx=2)
+        ttk.Button(controls, text="Retry", command=self.retry_selected).pack(side="right", padx=2)
+        ttk.Button(controls, text="Cancel", command=self.cancel_selected).pack(side="right", padx=2)
+
+        # Job list
+        tree_frame = ttk.Frame(content_frame)
+        tree_frame.pack(fill="both", expand=True)
+        columns = ("action", "status", "progress", "time", "result")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, selectmode="extended")
+        self.tree.heading("#0", text="Archive")
+        self.tree.heading("action", text="Action")
+        self.tree.heading("status", text="Status")
+        self.tree.heading("progress", text="Progress")
+        self.tree.heading("time", text="Time")
+        self.tree.heading("result", text="Result")
+        self.tree.column("#0", width=260)
+        self.tree.column("action", width=60, stretch=False)
+        self.tree.column("status", width=90, stretch=False)
+        self.tree.column("progress", width=100, stretch=False)
+        self.tree.column("time", width=60, stretch=False)
+        self.tree.column("result", width=260)
+        for status, color in (("PASSED", "green"), ("CREATED", "green"), ("WARNING", "#ff8c00"),
+                              ("SKIPPED", "#ff8c00"), ("FAILED", "red"), ("ERROR", "red"), ("CANCELLED", "gray")):
+            self.tree.tag_configure(status, foreground=color)
+        # The scrollbar moves the RowWindow, not the Treeview, which only
+        # ever holds the rows that fit
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self._yview)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Configure>", self._on_tree_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", self._on_mousewheel)
+        self.tree.bind("<Button-5>", self._on_mousewheel)
+
+        # Overall progress
+        self.progress = ttk.Progressbar(content_frame, mode="determinate")
+        self.progress.pack(fill="x", pady=(10, 0))
+        self.lbl_summary = ttk.Label(content_frame, text="No archives queued.", style="Pending.TLabel")
+        self.lbl_summary.pack(anchor="w")
+
+    def add_files(self):
+        filenames = filedialog.askopenfilenames(filetypes=[("Archives", "*.zip *.7z *.rar *.tar *.gz"), ("All Files", "*.*")])
+        for filename in filenames:
+            self._pending.put((self.command.get(), Path(filename)))
+        self._start_ticking()
+
+    def add_folder(self):
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+        command = self.command.get()
+        # Walking a large share can take a while: rows appear as it goes,
+        # and the page keeps ticking until the scan reports it has finished
+        self._scans += 1
+        threading.Thread(target=self._scan_folder, args=(command, Path(directory)), daemon=True).start()
+        self._start_ticking()
+
+    def _scan_folder(self, command, directory):
+        # Runs on its own thread, so it only talks to the page through _pending
+        error = None
+        try:
+            for entry in iter_archives(directory):
+                self._pending.put((command, entry.archive_path))
+        except OSError as e:
+            error = str(e)
+        finally:
+            self._pending.put(ScanFinished(directory, error))
+
+    def cancel_selected(self):
+        if self.batch is None:
+            return
+        for row_id in self._selected:
+            self.batch.cancel(row_id)
+        self._start_ticking()
+
+    def retry_selected(self):
+        if self.batch is None:
+            return
+        for row_id in self._selected:
+            if self.batch.retry(row_id):
+                self._draw_row(row_id)
+        self._start_ticking()
+
+    def clear_finished(self):
+        if self.batch is None:
+            return
+        finished = [row_id for row_id in self.window.order if self.batch.remove(row_id)]
+        self.window.remove(finished)
+        self._selected.difference_update(finished)
+        self._show_window()
+        self._draw_summary()
+
+    def _yview(self, *args):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            self.window.move_to(float(args[1]))
+        elif args[0] == "scroll":
+            step = self.window.size if args[2] == "pages" else 1
+            self.window.scroll(int(args[1]) * step)
+        self._show_window()
+
+    def _on_mousewheel(self, event):
+        if event.num == 4:
+            self.window.scroll(-1)
+        elif event.num == 5:
+            self.window.scroll(1)
+        else:
+            self.window.scroll(int(-1 * (event.delta / 120)))
+        self._show_window()
+        return "break"  # Not the page's own scrolling as well
+
+    def _on_tree_configure(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        # One row's worth of height goes to the headings
+        self.window.resize(event.height // row_height - 1)
+        self._show_window()
+
+    def _on_select(self, event):
+        self._selected = (self._selected - set(self._shown)) | set(self.tree.selection())
+
+    def _show_window(self):
+        """Puts the rows in view into the Treeview, if they changed."""
+        visible = self.window.visible()
+        if visible != self._shown:
+            if self._shown:
+                self.tree.delete(*self._shown)
+            self._shown = visible
+            for row_id in visible:
+                self.tree.insert("", tk.END, iid=row_id, text=str(self.batch.rows[row_id].archive))
+                self._draw_row(row_id)
+            self.tree.selection_set([row_id for row_id in visible if row_id in self._selected])
+        self.scrollbar.set(*self.window.fractions())
+
+    def _start_ticking(self):
+        if not self._ticking:
+            self._ticking = True
+            self.after(BATCH_TICK_MS, self._tick)
+
+    def _tick(self):
+        if self.batch is None:
+            self.batch = BatchQueue()
+        errors = []
+        for _ in range(MAX_ROWS_PER_TICK):
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, ScanFinished):
+                self._scans -= 1
+                if item.error:
+                    errors.append(f"Cannot scan {item.directory}: {item.error}")
+                continue
+            command, archive = item
+            self.window.append(self.batch.add(command, archive))
+
+        self._show_window()
+        for row_id in self.batch.poll():
+            self._draw_row(row_id)
+        self._draw_summary()
+
+        finished, total = self.batch.counts()
+        if finished < total or self._scans or not self._pending.empty():
+            self.after(BATCH_TICK_MS, self._tick)
+        else:
+            self._ticking = False
+        for error in errors:
+            messagebox.showerror("Error", error)
+
+    def _draw_row(self, row_id):
+        if row_id not in self._shown:
+            return  # Drawn once it scrolls into view
+        row = self.batch.rows[row_id]
+        status = row.status()
+        values = (row.command, status, row.progress(), row.elapsed(), row.summary())
+        self.tree.item(row_id, values=values, tags=(status,))
+
+    def _draw_summary(self):
+        finished, total = self.batch.counts()
+        self.progress.configure(maximum=max(total, 1), value=finished)
+        self.lbl_summary.config(text=f"{finished} of {total} archive(s) finished." if total else "No archives queued.")
 
 def main():
     app = DataIntegrityApp()
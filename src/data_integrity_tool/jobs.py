@@ -0,0 +1,218 @@
+"""
+Prioritised job queue served by a fixed pool of worker threads, shared
+by the HTTP daemon and the GUI's batch page. It has no network or
+platform dependencies of its own.
+"""
+import collections
+import itertools
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from . import core
+from .cache import HashCache
+
+# Finished jobs are kept for polling; the oldest are forgotten beyond this
+MAX_FINISHED_JOBS = 10_000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Options a client may pass through to the core functions
+CREATE_OPTIONS = ("engine", "refresh", "manifest", "algorithms", "tree_hash", "segment_size", "directory_sums", "timeout")
+VERIFY_OPTIONS = (
+    "engine", "refresh", "hash_file", "content_hash_file", "policy", "fail_fast", "deadline", "timeout", "layer_timeout"
+)
+COMMANDS = {"create": CREATE_OPTIONS, "verify": VERIFY_OPTIONS}
+
+class Job:
+    """One submitted create/verify request and, once finished, its outcome."""
+
+    def __init__(
+        self,
+        job_id: str,
+        command: str,
+        archive: Path,
+        priority: int,
+        options: Dict[str, Any],
+        progress: Optional[core.ProgressCallback] = None
+    ):
+        self.id = job_id
+        self.command = command
+        self.archive = archive
+        self.priority = priority
+        self.options = options
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+        self.cancel_token = core.CancelToken()
+        self.progress = progress  # Called from the worker thread
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "command": self.command,
+            "archive": str(self.archive),
+            "priority": self.priority,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+def _run_job(job: Job, cache: Optional[HashCache]) -> Any:
+    options = dict(job.options)
+    for key in ("hash_file", "content_hash_file"):
+        if options.get(key):
+            options[key] = Path(options[key])
+    if job.command == "create":
+        hash_file, content_hash_file = core.create_hashes(
+            job.archive, cache=cache, cancel=job.cancel_token, progress=job.progress, **options
+        )
+        return {
+            "hash_file": str(hash_file),
+            "content_hash_file": str(content_hash_file) if content_hash_file else None,
+        }
+    results = core.verify_layers(job.archive, cache=cache, cancel=job.cancel_token, progress=job.progress, **options)
+    return {"status": core.overall_status(results), "layers": results}
+
+class JobQueue:
+    """
+    Prioritised job queue with a fixed pool of worker threads.
+
+    Threads suffice because the heavy work runs in 7z child processes and
+    in hashlib, which releases the GIL. Safe to use from any thread.
+    """
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[HashCache] = None):
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self._queue = queue.PriorityQueue()
+        self._jobs: Dict[str, Job] = {}
+        self._finished = collections.deque()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"integrity-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        command: str,
+        archive: Path,
+        priority: int = 0,
+        options: Optional[Dict[str, Any]] = None,
+        progress: Optional[core.ProgressCallback] = None
+    ) -> Job:
+        """
+        Queues a job; raises ValueError for an unknown command or option.
+        progress, for in-process callers, receives the job's ProgressEvents.
+        """
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command: {command}")
+        options = options or {}
+        unknown = set(options) - set(COMMANDS[command])
+        if unknown:
+            raise ValueError(f"Unknown option(s) for {command}: {', '.join(sorted(unknown))}")
+
+        sequence = next(self._sequence)
+        job = Job(f"{sequence:x}-{os.urandom(4).hex()}", command, Path(archive), int(priority), options, progress)
+        with self._lock:
+            self._jobs[job.id] = job
+        # Higher priorities first, then first come first served
+        self._queue.put((-job.priority, sequence, job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued job, or stops a running one: its hashing stops and
+        its 7z is killed, and it ends CANCELLED unless it finishes first.
+        Returns False if the job is unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            if job.state == RUNNING:
+                job.cancel_token.cancel()
+                return True
+            job.state = CANCELLED
+        self._finish(job)
+        return True
+
+    def subscribe(self) -> queue.Queue:
+        """A queue receiving every job that finishes from now on."""
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue):
+        with self._lock:
+            self._subscribers.remove(events)
+
+    def counts(self) -> dict:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": states.count(QUEUED),
+            "running": states.count(RUNNING),
+            "finished": sum(states.count(state) for state in FINISHED_STATES),
+        }
+
+    def shutdown(self):
+        """Stops the workers once the jobs queued so far have run."""
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._sequence), None))
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.state != QUEUED:
+                    continue  # Cancelled while waiting
+                job.state = RUNNING
+            job.started = time.time()
+            try:
+                job.result = _run_job(job, self.cache)
+                job.state = DONE
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.state = CANCELLED if job.cancel_token.cancelled else FAILED
+            self._finish(job)
+
+    def _finish(self, job: Job):
+        job.finished = time.time()
+        job.done.set()
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self._jobs.pop(self._finished.popleft(), None)
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            events.put(job)
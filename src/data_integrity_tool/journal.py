@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Records are flushed at once but fsync'ed at most this often: a crash
+# loses at most the last second of work, never the whole run
+JOURNAL_SYNC_INTERVAL = 1.0
+
+class JournalRecord(NamedTuple):
+    """The outcome of one archive in a batch run."""
+    command: str
+    archive: str
+    fingerprint: List[Optional[List[int]]]
+    status: str
+    message: str
+    finished: float
+
+class Journal:
+    """
+    Append-only JSON-lines journal of the archives a batch run finished.
+
+    Each record carries a fingerprint (file identities of the archive and,
+    for verification, its sidecars) so a resumed run can tell whether a
+    finished archive is still unchanged. The file is never rewritten: the
+    latest record per command and archive wins, and a line torn by a crash
+    is ignored. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        self._last_sync = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load(self) -> Dict[tuple, JournalRecord]:
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = JournalRecord(**json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # Torn or foreign line
+                    records[(record.command, record.archive)] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def lookup(self, command: str, archive: Path) -> Optional[JournalRecord]:
+        """The latest record of archive for command, from earlier runs or this one."""
+        with self._lock:
+            return self._records.get((command, str(archive)))
+
+    def record(self, command: str, archive: Path, fingerprint: list, status: str, message: str):
+        record = JournalRecord(command, str(archive), fingerprint, status, message, time.time())
+        line = json.dumps(record._asdict()) + "\n"
+        with self._lock:
+            self._records[(command, record.archive)] = record
+            self._file.write(line)
+            self._file.flush()
+            if time.monotonic() - self._last_sync >= JOURNAL_SYNC_INTERVAL:
+                os.fsync(self._file.fileno())
+                self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
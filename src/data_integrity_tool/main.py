@@ -1,15 +1,17 @@
 import sys
-from . import cli
-from . import gui
 from .core import ensure_7z_installed, DependencyError
-import tkinter.messagebox
+
+# The CLI and GUI are imported only once the mode is known: scripted runs
+# should not pay for (or, on headless servers, fail on) loading tkinter.
 
 def main():
     try:
         ensure_7z_installed()
         if len(sys.argv) > 1:
+            from . import cli
             cli.main()
         else:
+            from . import gui
             gui.main()
     except DependencyError as e:
         if len(sys.argv) > 1:
@@ -18,6 +20,7 @@ def main():
         else:
             # If GUI mode, we need to create a root window to show the error
             # because gui.main() hasn't been called yet.
+            import tkinter.messagebox
             from .gui import DataIntegrityApp
             app = DataIntegrityApp()
             app.withdraw() # Hide the main window
@@ -0,0 +1,470 @@
+"""
+Hashing and verifying an archive while it streams in, e.g. a download
+piped into `verify -`. Layer 1 is hashed block by block, formats 7z can
+read sequentially (gzip, bzip2, xz, tar) are tested by a 7z reading the
+same bytes from its stdin (-si), and the bytes can be saved to a file on
+the way. The check then ends when the transfer does, with no second read.
+
+ZIP and 7z archives keep their index at the end, so 7z cannot test them
+from a pipe: they are tested from the saved file once it is complete (a
+read usually served by the page cache), or not at all without one.
+
+copy_archive applies the same single pass to a file copied elsewhere.
+"""
+import os
+import secrets
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple
+from . import core
+from .core import (
+    ArchiveCheck,
+    CancelToken,
+    ProgressCallback,
+    SevenZipResult,
+    DEFAULT_BLOCK_SIZE,
+    DEFAULT_HASH_ALGORITHM,
+    ENGINE_7Z,
+    SEVENZIP_NO_PASSWORD,
+    SEVENZIP_READ_SIZE,
+    TREE_HASH_SUFFIX,
+)
+
+# 7z -t types of the formats it can test from a pipe, by magic number
+STREAM_TYPES = ((core.GZIP_MAGIC, "gzip"), (core.BZIP2_MAGIC, "bzip2"), (core.XZ_MAGIC, "xz"))
+TAR_MAGIC = b"ustar"
+TAR_MAGIC_OFFSET = 257
+# Enough of the stream to recognise every format above
+HEAD_SIZE = TAR_MAGIC_OFFSET + len(TAR_MAGIC)
+
+def stream_type(head: bytes) -> Optional[str]:
+    """The 7z -t type of a stream starting with head, or None if 7z cannot test it from a pipe."""
+    for magic, name in STREAM_TYPES:
+        if head.startswith(magic):
+            return name
+    if head[TAR_MAGIC_OFFSET:HEAD_SIZE] == TAR_MAGIC:
+        return "tar"
+    return None
+
+class StreamDigest(NamedTuple):
+    """What one pass over a stream established."""
+    size: int
+    file_hashes: Dict[str, str]
+    check: Optional[ArchiveCheck]  # None if the stream could not be tested
+    output: Optional[Path]
+
+class _PipedTest:
+    """A '7z t -si' fed chunk by chunk; its output is parsed as it arrives."""
+
+    def __init__(self, type_name: str, progress: Optional[ProgressCallback], cancel: Optional[CancelToken]):
+        args = ["7z", "t", "-si", f"-t{type_name}", SEVENZIP_NO_PASSWORD, "-scrcSHA256"]
+        if progress:
+            args += ["-bsp1", "-bb1"]
+        args += core.default_scheduler.switches()
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.parser = core.SevenZipOutputParser(True, progress)
+        self.stderr_tail = bytearray()
+        self._broken = False
+        self._finished = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._parse_output, daemon=True),
+            threading.Thread(target=core.collect_tail, args=(self.process.stderr, self.stderr_tail), daemon=True),
+        ]
+        if cancel is not None:
+            self._threads.append(threading.Thread(
+                target=core.kill_when_cancelled, args=(self.process, cancel, self._finished), daemon=True
+            ))
+        for thread in self._threads:
+            thread.start()
+
+    def _parse_output(self):
+        while True:
+            chunk = self.process.stdout.read1(SEVENZIP_READ_SIZE)
+            self.parser.feed(chunk)
+            if not chunk:
+                return
+
+    def feed(self, chunk: bytes):
+        if self._broken:
+            return
+        try:
+            self.process.stdin.write(chunk)
+        except BrokenPipeError:
+            self._broken = True  # 7z gave up early; its exit code says why
+
+    def finish(self) -> SevenZipResult:
+        """Signals the end of the stream and waits for the verdict."""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        self._finished.set()
+        for thread in self._threads:
+            thread.join()
+        core.note_subprocess(self.started, returncode)
+        self.process.stdout.close()
+        self.process.stderr.close()
+        return SevenZipResult(returncode, self.parser.digest, self.stderr_tail.decode(errors="replace"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.process.returncode is None:
+            self.process.kill()
+            self.finish()
+
+def _create_temporary(path: Path, prefix: str = "", suffix: str = "") -> Tuple[int, Path]:
+    """
+    Creates a new file next to path, named prefix + random + suffix, and
+    returns (fd, its path). Unlike mkstemp's 0600, it gets the default
+    mode (0666 less the umask), which os.open applies without the process
+    umask being changed under other threads.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        candidate = path.with_name(f"{prefix}{secrets.token_hex(4)}{suffix}")
+        try:
+            return os.open(candidate, flags, 0o666), candidate
+        except FileExistsError:
+            continue
+
+class _Output:
+    """The saved copy: written under a temporary name, renamed once complete."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        fd, self.tmp_name = _create_temporary(path, prefix=f".{path.name}.")
+        self.file = os.fdopen(fd, "wb")
+
+    def commit(self) -> Path:
+        # On disk before it gets its name, so a crash cannot leave a torn archive
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_name, self.path)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.file.closed:
+            self.file.close()
+            os.unlink(self.tmp_name)
+
+def _read_head(read, size: int) -> bytes:
+    """Reads until size bytes are in or the stream ends (a pipe may return less per read)."""
+    head = b""
+    while len(head) < size:
+        chunk = read(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+def digest_stream(
+    stream: BinaryIO,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    output: Optional[Path] = None,
+    engine: str = ENGINE_7Z,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> StreamDigest:
+    """
+    Reads stream to its end once, hashing it with every algorithm (none is
+    fine), testing it and computing its content hash, and saving it to
+    output if given. Formats 7z can read sequentially are tested through a
+    pipe while the bytes arrive; others are tested from output once saved
+    (with engine, see check_archive), or not at all without output.
+
+    progress receives PROGRESS_BYTES events with no total and 7z's events;
+    cancel stops the transfer, kills 7z and leaves no output behind.
+    """
+    core.check_engine(engine)
+    multi = core.MultiHash(dict.fromkeys(algorithms))
+    counter = core.ByteProgress(progress, None, cancel)
+    read = getattr(stream, "read1", stream.read)
+    head = _read_head(read, HEAD_SIZE)
+    type_name = stream_type(head)
+    # The native engine checks the saved copy in-process rather than piping to 7z
+    piped = type_name is not None and (engine == ENGINE_7Z or output is None)
+    if piped:
+        core.ensure_7z_installed()
+
+    with ExitStack() as stack:
+        saved = stack.enter_context(_Output(output)) if output is not None else None
+        test = None
+        if piped:
+            scheduler = core.default_scheduler
+            need = core.SEVENZIP_BASE_MEMORY + (core.xz_dictionary_size(head) or 0) if scheduler.memory_budget else 0
+            stack.enter_context(scheduler.reserve(need, cancel))
+            test = stack.enter_context(_PipedTest(type_name, progress, cancel))
+
+        size = 0
+        chunk = head
+        while chunk:
+            multi.update(chunk)
+            size += len(chunk)
+            if saved is not None:
+                saved.file.write(chunk)
+            if test is not None:
+                test.feed(chunk)
+            counter.add(len(chunk))
+            chunk = read(block_size)
+
+        result = test.finish() if test is not None else None
+        if cancel is not None:
+            cancel.check()
+        output = saved.commit() if saved is not None else None
+
+    if result is not None:
+        check = ArchiveCheck(result.returncode == 0, result.content_hash if result.returncode == 0 else None, result.stderr)
+    elif output is not None:
+        check = core.check_archive(output, engine, progress, cancel)
+    else:
+        check = None
+    digests = {algorithm: hash_func.hexdigest() for algorithm, hash_func in multi.hashes.items()}
+    return StreamDigest(size, digests, check, output)
+
+NOT_TESTABLE = "Not run: ZIP and 7z archives cannot be tested from a stream without saving it"
+
+def verify_stream(
+    stream: BinaryIO,
+    archive_path: Path,
+    hash_file: Optional[Path] = None,
+    content_hash_file: Optional[Path] = None,
+    output: bool = False,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> dict:
+    """
+    verify_layers for an archive arriving on stream. archive_path names
+    it: expected hashes are discovered next to it as for a file (unless
+    given), and with output the stream is saved there. Returns results
+    shaped like verify_layers', without stats. A tree hash is not checked
+    from a stream.
+    """
+    results, _ = _verify_digest(
+        stream, archive_path, hash_file, content_hash_file, archive_path if output else None, (), engine, progress, cancel
+    )
+    return results
+
+def _verify_digest(
+    stream: BinaryIO,
+    archive_path: Path,
+    hash_file: Optional[Path],
+    content_hash_file: Optional[Path],
+    output: Optional[Path],
+    algorithms: Iterable[str],
+    engine: str,
+    progress: Optional[ProgressCallback],
+    cancel: Optional[CancelToken]
+) -> Tuple[dict, StreamDigest]:
+    """verify_stream, also hashing with algorithms and saving to output; returns the digest too."""
+    found = core.find_hash_files(archive_path)
+    if hash_file:
+        hash_files = [hash_file]
+    elif found["tree_hash"]:
+        hash_files = [found["tree_hash"]]
+    else:
+        hash_files = list(dict.fromkeys(found["archive_hashes"].values()))
+    content_hash_file = content_hash_file or found["content_hash"]
+
+    results = {
+        "layer1": {"status": "SKIPPED", "message": "No hash file", "details": None},
+        "layer2": {"status": "SKIPPED", "message": NOT_TESTABLE, "details": None},
+        "layer3": {"status": "SKIPPED", "message": "No content hash file", "details": None},
+    }
+    expected = {}
+    if hash_files and hash_files[0].name.endswith(TREE_HASH_SUFFIX):
+        results["layer1"] = {"status": "SKIPPED", "message": "Tree hashes are not checked from a stream", "details": None}
+    elif hash_files:
+        try:
+            expected = core.read_file_hashes(archive_path, hash_files)
+        except Exception as e:
+            results["layer1"] = {"status": "ERROR", "message": str(e), "details": None}
+
+    digest = digest_stream(stream, {**expected, **dict.fromkeys(algorithms)}, output, engine, progress=progress, cancel=cancel)
+
+    if expected:
+        mismatched = [a for a in expected if expected[a] != digest.file_hashes[a]]
+        if mismatched:
+            algorithm = mismatched[0]
+            results["layer1"] = {
+                "status": "WARNING",
+                "message": "Hash mismatch",
+                "details": {"expected": expected[algorithm], "actual": digest.file_hashes[algorithm], "algorithm": algorithm}
+            }
+        else:
+            results["layer1"] = {"status": "PASSED", "message": "Match", "details": None}
+
+    check = digest.check
+    if check is not None and check.ok:
+        results["layer2"] = {"status": "PASSED", "message": "Integrity OK", "details": None}
+    elif check is not None:
+        results["layer2"] = {"status": "FAILED", "message": "Integrity Check Failed", "details": None}
+
+    if not content_hash_file:
+        pass
+    elif check is None:
+        results["layer3"] = {"status": "SKIPPED", "message": NOT_TESTABLE, "details": None}
+    elif not check.ok:
+        results["layer3"] = {
+            "status": "ERROR",
+            "message": f"Failed to get content hash: 7z command failed: {check.error}",
+            "details": None
+        }
+    else:
+        try:
+            expected_content = core.read_content_hash(archive_path, content_hash_file)
+            actual_content = core.canonical_content_hash(check.content_hash) if check.content_hash else None
+            if expected_content != actual_content:
+                results["layer3"] = {
+                    "status": "FAILED",
+                    "message": "Hash mismatch",
+                    "details": {"expected": expected_content, "actual": actual_content}
+                }
+            else:
+                results["layer3"] = {"status": "PASSED", "message": "Match", "details": None}
+        except Exception as e:
+            results["layer3"] = {"status": "ERROR", "message": str(e), "details": None}
+    return results, digest
+
+def create_from_stream(
+    stream: BinaryIO,
+    archive_path: Path,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    directory_sums: bool = False,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None
+) -> Tuple[Path, Optional[Path]]:
+    """
+    Saves stream to archive_path and records its hashes as create_hashes
+    does, from the one pass. Raises InvalidArchiveError, without writing
+    hash files, if the archive fails its test (the copy is kept). The
+    content hash is left out if the format could not be tested.
+    """
+    algorithms = list(dict.fromkeys(algorithms))
+    if not algorithms:
+        raise ValueError("No hash algorithm given")
+    digest = digest_stream(stream, algorithms, archive_path, engine, progress=progress, cancel=cancel)
+    if digest.check is not None and not digest.check.ok:
+        raise core.InvalidArchiveError(f"Failed to get content hash: 7z command failed: {digest.check.error}")
+    content_hash = digest.check.content_hash if digest.check is not None else None
+    return core.write_hashes(archive_path, algorithms, digest.file_hashes, content_hash, directory_sums)
+
+# Layer statuses that keep copy_archive from recording the copy's hashes
+# (WARNING: the source no longer matches its own hash file)
+COPY_FAILURES = ("WARNING", "FAILED", "ERROR")
+
+class CopyResult(NamedTuple):
+    """Outcome of copy_archive."""
+    destination: Path
+    size: int
+    results: dict  # verify_stream's, for the source's hash files
+    reread: Optional[bool]  # whether the re-read matched, None if not done
+    hash_file: Optional[Path]  # None if the copy did not verify
+    content_hash_file: Optional[Path]
+
+def _reread_hashes(path: Path, algorithms: Iterable[str], cancel: Optional[CancelToken]) -> dict:
+    """Hashes path again, evicting it from the page cache first where possible so the disk is read."""
+    fadvise = getattr(os, "posix_fadvise", None)
+    if fadvise is not None:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # Only clean pages are dropped; commit() has synced the file
+            fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return core.calculate_file_hashes(path, algorithms, cancel=cancel)
+
+def _install(staged: Path, destination: Path, force: bool):
+    """Gives the verified copy its name; without force, never replaces an existing file."""
+    if force:
+        os.replace(staged, destination)
+        return
+    try:
+        os.link(staged, destination)  # Fails if destination appeared meanwhile
+    except FileExistsError:
+        raise  # An OSError too, but not one the fallback below should handle
+    except OSError:
+        # No hard links on this file system: check, then rename
+        if destination.exists():
+            raise FileExistsError(f"{destination} already exists")
+        os.replace(staged, destination)
+        return
+    os.unlink(staged)
+
+def copy_archive(
+    source: Path,
+    destination: Path,
+    algorithms: Iterable[str] = (DEFAULT_HASH_ALGORITHM,),
+    directory_sums: bool = False,
+    reread: bool = False,
+    engine: str = ENGINE_7Z,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    force: bool = False
+) -> CopyResult:
+    """
+    Copies source to destination (a file, or a directory to copy into)
+    and verifies it from the same read: the bytes are hashed and tested
+    as for verify_stream against the source's hash files, then written.
+    With reread, the copy is hashed again from disk (bypassing the page
+    cache where the OS allows) and must match what was read from the
+    source.
+
+    The copy is kept under a temporary name until it has verified. If no
+    layer fails, it is renamed to destination and the hash files are
+    written next to it as create_hashes would; otherwise it is removed
+    and hash_file is None. An existing destination raises
+    FileExistsError unless force is set.
+
+    The data passes through the process to be hashed, so it is not copied
+    with sendfile/copy_file_range, but it is still read only once.
+    """
+    algorithms = list(dict.fromkeys(algorithms))
+    if not algorithms:
+        raise ValueError("No hash algorithm given")
+    if destination.is_dir():
+        destination = destination / source.name
+    if destination.exists():
+        if os.path.samefile(source, destination):
+            raise ValueError(f"{source} and {destination} are the same file")
+        if not force:
+            raise FileExistsError(f"{destination} already exists")
+
+    # Keeps the archive's name as its suffix, so engines still recognise the format
+    fd, staged = _create_temporary(destination, prefix=".copy-", suffix=f"-{destination.name}")
+    os.close(fd)
+    try:
+        with open(source, "rb") as f:
+            results, digest = _verify_digest(f, source, None, None, staged, algorithms, engine, progress, cancel)
+        shutil.copymode(source, staged)
+
+        matched = None
+        if reread:
+            matched = _reread_hashes(staged, algorithms, cancel) == {a: digest.file_hashes[a] for a in algorithms}
+        if matched is False or any(layer["status"] in COPY_FAILURES for layer in results.values()):
+            return CopyResult(destination, digest.size, results, matched, None, None)
+        _install(staged, destination, force)
+    finally:
+        if staged.exists():
+            staged.unlink()
+
+    check = digest.check
+    content_hash = check.content_hash if check is not None else None
+    hash_file, content_hash_file = core.write_hashes(
+        destination, algorithms, digest.file_hashes, content_hash, directory_sums
+    )
+    return CopyResult(destination, digest.size, results, matched, hash_file, content_hash_file)
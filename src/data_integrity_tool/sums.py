@@ -0,0 +1,169 @@
+import os
+import re
+import stat
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Optional: advisory locking between processes (not available on Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SUMS_FILE_NAME = "INTEGRITY.SUMS"
+# Tag of the Layer 3 content hash; file hashes use the coreutils tags
+CONTENT_TAG = "CONTENT-SHA256"
+# A content hash may carry 7z's overflow suffix ("<digest>-00000001")
+_SUMS_LINE = re.compile(r"^([\w-]+) \((.*)\) = ([0-9a-fA-F]+(?:-[0-9a-fA-F]+)?)$")
+# Superseded lines are compacted away once they outnumber the live ones
+# and the file has grown past this many lines
+COMPACT_MIN_LINES = 1024
+# Directory indexes kept per process; the least recently used is dropped
+# first, and a tree run rarely returns to a directory it has left
+MAX_INDEXED_DIRECTORIES = 256
+
+def sums_path_for(directory: Path) -> Path:
+    return directory / SUMS_FILE_NAME
+
+class DirectorySums:
+    """
+    In-memory index of one directory's sums file: archive name -> {tag: digest}.
+
+    The file holds one "TAG (name) = digest" line per hash, in the style
+    of `sha256sum --tag`, so `sha256sum -c --ignore-missing` can check its
+    SHA256 lines. Updates are appended and the latest line per archive and
+    tag wins; a line torn by a crash is ignored. The index remembers how
+    far it has read, so refreshing it only parses what was appended since.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.lines = 0
+        self._identity = None  # (device, inode) of the file read
+        self._offset = 0
+        self._mtime_ns = None
+
+    def get(self, name: str) -> Optional[Dict[str, str]]:
+        entry = self.entries.get(name)
+        return dict(entry) if entry else None
+
+    def refresh(self, st: Optional[os.stat_result] = None) -> bool:
+        """Reads what changed on disk; returns False if the file is gone."""
+        try:
+            st = st or os.stat(self.path)
+        except FileNotFoundError:
+            self.entries, self.lines, self._identity, self._offset = {}, 0, None, 0
+            return False
+        identity = (st.st_dev, st.st_ino)
+        if identity == self._identity and st.st_size == self._offset and st.st_mtime_ns == self._mtime_ns:
+            return True
+        if identity != self._identity or st.st_size < self._offset:
+            # Replaced (compacted) or truncated: read it again from the start
+            self.entries, self.lines, self._offset = {}, 0, 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A trailing line without newline may still be being written
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8", "replace").splitlines():
+            match = _SUMS_LINE.match(line.strip())
+            if match:
+                tag, name, digest = match.groups()
+                self.entries.setdefault(name, {})[tag] = digest.lower()
+                self.lines += 1
+        self._identity = identity
+        self._offset += len(complete)
+        self._mtime_ns = st.st_mtime_ns
+        return True
+
+_index: "OrderedDict[Path, DirectorySums]" = OrderedDict()
+_index_lock = threading.Lock()
+# Weakly held: a directory's lock lives only while a writer uses it
+_write_locks: "weakref.WeakValueDictionary[Path, threading.Lock]" = weakref.WeakValueDictionary()
+
+def load_sums(directory: Path, st: Optional[os.stat_result] = None) -> Optional[DirectorySums]:
+    """
+    The index of directory's sums file, or None if it has none. Indexes
+    of the last MAX_INDEXED_DIRECTORIES directories with a sums file are
+    kept per process and revalidated with one stat (or the given stat
+    result), so repeated lookups in a directory read the file once.
+    """
+    path = sums_path_for(directory)
+    with _index_lock:
+        sums = _index.pop(path, None) or DirectorySums(path)
+        if not sums.refresh(st):
+            return None
+        _index[path] = sums
+        if len(_index) > MAX_INDEXED_DIRECTORIES:
+            _index.popitem(last=False)
+        return sums
+
+def lookup_sums(archive_path: Path) -> Optional[Dict[str, str]]:
+    """{tag: digest} recorded for archive_path in its directory's sums file."""
+    sums = load_sums(archive_path.parent)
+    return sums.get(archive_path.name) if sums else None
+
+def update_sums(archive_path: Path, hashes: Dict[str, str]) -> Path:
+    """
+    Records {tag: digest} for archive_path in its directory's sums file
+    and returns the file's path. The lines are appended in one write under
+    a lock (also between processes where fcntl exists); the file is
+    compacted through a temporary file and an atomic rename once mostly
+    superseded, so readers always see a complete file.
+    """
+    name = archive_path.name
+    if "\n" in name:
+        raise ValueError(f"Cannot record {name!r} in a sums file")
+    path = sums_path_for(archive_path.parent)
+    with _index_lock:
+        write_lock = _write_locks.setdefault(path, threading.Lock())
+
+    with write_lock:
+        while True:
+            f = open(path, "ab")
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            st = os.fstat(f.fileno())
+            try:
+                if os.path.samestat(st, os.stat(path)):
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()  # Compacted by another process meanwhile: append to the new file
+
+        try:
+            sums = load_sums(archive_path.parent, st) or DirectorySums(path)
+            # Terminate a line torn by a crash so it cannot swallow ours
+            data = b"\n" if st.st_size > sums._offset else b""
+            data += "".join(f"{tag} ({name}) = {digest}\n" for tag, digest in hashes.items()).encode("utf-8")
+            f.write(data)
+            f.flush()
+            sums = load_sums(archive_path.parent, os.fstat(f.fileno()))
+            if sums.lines >= COMPACT_MIN_LINES and sums.lines > 2 * sum(len(e) for e in sums.entries.values()):
+                _compact(sums)
+        finally:
+            f.close()
+    return path
+
+def _compact(sums: DirectorySums):
+    """Rewrites the file with only the live lines. Called with the file locked."""
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{SUMS_FILE_NAME}.", dir=sums.path.parent)
+    try:
+        os.chmod(tmp_name, stat.S_IMODE(os.stat(sums.path).st_mode))
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            for name in sorted(sums.entries):
+                for tag, digest in sorted(sums.entries[name].items()):
+                    tmp.write(f"{tag} ({name}) = {digest}\n")
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_name, sums.path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    with _index_lock:
+        sums.refresh()
@@ -0,0 +1,247 @@
+"""
+Watches a drop directory and creates hashes for every archive that lands
+in it, once the file has stopped changing.
+
+On Linux, inotify (through ctypes, so no extra dependency) reports new,
+renamed and deleted files, so an idle directory costs nothing.
+Elsewhere, or when inotify is unavailable, the tree is polled with
+os.scandir.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from .core import ARCHIVE_EXTENSIONS, ArchiveEntry, TreeResult, create_entry, iter_archives
+
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+# How often pending files are re-examined for stability
+TICK_SECONDS = 0.5
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+def _is_archive(path: Path) -> bool:
+    return path.name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def _scan(root: Path) -> Dict[Path, Tuple[int, int]]:
+    """(size, mtime_ns) of every archive under root."""
+    found = {}
+    pending_dirs = [root]
+    while pending_dirs:
+        try:
+            with os.scandir(pending_dirs.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append(Path(entry.path))
+                    elif entry.is_file() and _is_archive(Path(entry.path)):
+                        st = entry.stat()
+                        found[Path(entry.path)] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            continue  # Directory vanished or unreadable
+    return found
+
+class _PollingSource:
+    """Reports archives that appeared, changed or vanished since the previous scan."""
+
+    def __init__(self, root: Path, interval: float):
+        self.root = root
+        self.interval = interval
+        self._snapshot = _scan(root)
+        self._next_scan = time.monotonic() + interval
+
+    def wait(self, timeout: float) -> Set[Path]:
+        time.sleep(max(0.0, min(timeout, self._next_scan - time.monotonic())))
+        if time.monotonic() < self._next_scan:
+            return set()
+        self._next_scan = time.monotonic() + self.interval
+        snapshot = _scan(self.root)
+        changed = {path for path, facts in snapshot.items() if self._snapshot.get(path) != facts}
+        changed.update(self._snapshot.keys() - snapshot.keys())
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+class _InotifySource:
+    """Reports archives created, written, moved or deleted anywhere under root (Linux only)."""
+
+    def __init__(self, root: Path):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self._watches: Dict[int, Path] = {}
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, directory: Path) -> Set[Path]:
+        """Watches directory and its subdirectories; returns archives already in them."""
+        archives = set()
+        for dirpath, _, filenames in os.walk(directory):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), _WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self._watches[wd] = Path(dirpath)
+            archives.update(Path(dirpath) / name for name in filenames if _is_archive(Path(name)))
+        return archives
+
+    def wait(self, timeout: float) -> Set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped: fall back to one full scan
+                changed.update(_scan(self.root))
+                continue
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    try:
+                        changed.update(self._watch_tree(path))
+                    except OSError:
+                        pass  # Removed again before it could be watched
+            elif _is_archive(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def watch_directory(
+    root: Path,
+    on_result: Callable[[TreeResult], None],
+    stop: Optional[threading.Event] = None,
+    workers: int = 2,
+    settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    polling: bool = False,
+    initial_scan: bool = False,
+    **create_options
+):
+    """
+    Runs create_hashes for every archive that appears under root, until
+    stop is set.
+
+    A file is handled once its size and mtime have not changed for
+    settle_seconds, so archives still being copied are never hashed half
+    written. At most workers archives are hashed at once; each outcome is
+    passed to on_result (from a worker thread) as a TreeResult. An archive
+    rewritten later is hashed again.
+
+    inotify is used where available unless polling is set; otherwise the
+    tree is rescanned every poll_interval seconds. With initial_scan,
+    archives already present without a hash file are handled as well.
+    create_options are passed on to create_hashes.
+    """
+    if not root.is_dir():
+        raise NotADirectoryError(f"Not a directory: {root}")
+    stop = stop or threading.Event()
+    if polling:
+        source = _PollingSource(root, poll_interval)
+    else:
+        try:
+            source = _InotifySource(root)
+        except OSError:
+            source = _PollingSource(root, poll_interval)
+
+    # Deferred: concurrent.futures pulls in logging, a large share of CLI start-up
+    from concurrent.futures import ThreadPoolExecutor
+
+    # path -> ((size, mtime_ns), monotonic time it was first seen that way)
+    pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+    in_flight: Set[Path] = set()
+    handled: Dict[Path, Tuple[int, int]] = {}
+    lock = threading.Lock()
+
+    def task(path: Path, facts: Tuple[int, int]):
+        try:
+            result = create_entry(ArchiveEntry(path, None, None), **create_options)
+            on_result(result)
+        finally:
+            with lock:
+                in_flight.discard(path)
+                handled[path] = facts
+
+    def track(paths: Iterable[Path]):
+        for path in paths:
+            pending.setdefault(path, (None, 0.0))
+
+    if initial_scan:
+        track(entry.archive_path for entry in iter_archives(root) if entry.hash_file is None)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while not stop.is_set():
+                track(source.wait(TICK_SECONDS))
+                now = time.monotonic()
+                for path, (facts, since) in list(pending.items()):
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        # Deleted or moved away: forget it, so a file put
+                        # back later with the same size and mtime is hashed
+                        with lock:
+                            if path in in_flight:
+                                continue  # Forgotten once the running job ends
+                            del pending[path]
+                            handled.pop(path, None)
+                        continue
+                    current = (st.st_size, st.st_mtime_ns)
+                    if current != facts:
+                        pending[path] = (current, now)
+                        continue
+                    if now - since < settle_seconds:
+                        continue
+                    with lock:
+                        if path in in_flight:
+                            continue  # Hashed again once the running job ends
+                        del pending[path]
+                        if handled.get(path) == current:
+                            continue
+                        in_flight.add(path)
+                    executor.submit(task, path, current)
+        finally:
+            source.close()
@@ -0,0 +1,38 @@
+import io
+import os
+from unittest.mock import MagicMock
+
+# A 7z stand-in for tests that need a real child process: it records its
+# pid in $FAKE_7Z_PID and hangs if $FAKE_7Z_HANG is set
+FAKE_7Z = """#!/bin/sh
+echo $$ > "$FAKE_7Z_PID"
+if [ -n "$FAKE_7Z_HANG" ]; then exec sleep 60; fi
+echo "Everything is Ok"
+echo "SHA256 for data: abc123"
+"""
+
+def popen_7z(returncode: int = 0, stdout: str = "", stderr: str = ""):
+    """
+    Returns a subprocess.Popen side effect that fakes a 7z run: every call
+    yields a new process whose pipes replay stdout/stderr.
+    """
+    def factory(*args, **kwargs):
+        process = MagicMock()
+        process.stdout = io.BytesIO(stdout.encode())
+        process.stderr = io.BytesIO(stderr.encode())
+        process.wait.return_value = returncode
+        process.returncode = returncode
+        return process
+    return factory
+
+def install_fake_7z(tmp_path, monkeypatch):
+    """Puts FAKE_7Z first on PATH; returns the file its pid is written to."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "7z"
+    script.write_text(FAKE_7Z)
+    script.chmod(0o755)
+    pid_file = tmp_path / "7z.pid"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_7Z_PID", str(pid_file))
+    return pid_file
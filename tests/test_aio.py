@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import pytest
+from tests.helpers import install_fake_7z
+from data_integrity_tool import core
+from data_integrity_tool.aio import acreate_hashes, averify_layers
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake 7z is a shell script")
+
+@pytest.fixture
+def fake_7z(tmp_path, monkeypatch):
+    return install_fake_7z(tmp_path, monkeypatch)
+
+def test_create_and_verify_on_the_event_loop(tmp_path, fake_7z):
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+
+    async def main():
+        await acreate_hashes(archive)
+        # Several verifications in flight on one thread
+        return await asyncio.gather(*(averify_layers(archive) for _ in range(4)))
+
+    for results in asyncio.run(main()):
+        assert [results[name]["status"] for name in ("layer1", "layer2", "layer3")] == ["PASSED"] * 3
+        assert results["layer2"]["stats"]["subprocess_count"] == 1
+    assert (tmp_path / "test.zip.content.sha256").read_text() == "abc123\n"
+
+def test_cancellation_kills_7z_and_writes_nothing(tmp_path, fake_7z, monkeypatch):
+    monkeypatch.setenv("FAKE_7Z_HANG", "1")
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+
+    async def main():
+        task = asyncio.ensure_future(acreate_hashes(archive))
+        while not fake_7z.exists() or not fake_7z.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    pid = int(fake_7z.read_text())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+    assert core.default_scheduler._running == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["7z.pid", "bin", "test.zip"]
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+from tests.helpers import popen_7z
+from data_integrity_tool.cache import HashCache, file_identity
+from data_integrity_tool.core import verify_layers
+
+def test_store_merges_facts(tmp_path):
+    with HashCache(tmp_path / "cache") as cache:
+        key = (1, 2, 3, 4)
+        cache.store(key, file_hashes={"sha256": "aa"})
+        cache.store(key, archive_ok=True, content_hash="cc", content_known=True)
+
+        entry = cache.lookup(key)
+        assert entry.file_hashes == {"sha256": "aa"}
+        assert entry.archive_ok is True
+        assert entry.content_hash == "cc"
+        assert entry.content_known is True
+
+def test_failed_verdicts_are_not_cached(tmp_path):
+    with HashCache(tmp_path / "cache") as cache:
+        cache.store((1, 2, 3, 4), archive_ok=False)
+        assert cache.lookup((1, 2, 3, 4)) is None
+
+def test_lru_eviction(tmp_path):
+    cache = HashCache(tmp_path / "cache", max_entries=2)
+    for i in range(3):
+        cache.store((i, 0, 0, 0), file_hashes={"sha256": str(i)})
+    cache.lookup((0, 0, 0, 0))  # Entry 1 is now the least recently used
+    cache.store((3, 0, 0, 0), file_hashes={"sha256": "3"})
+    cache.close()
+
+    with HashCache(tmp_path / "cache", max_entries=2) as cache:
+        assert len(cache) == 2
+        assert cache.lookup((1, 0, 0, 0)) is None
+        assert cache.lookup((2, 0, 0, 0)) is None
+        assert cache.lookup((0, 0, 0, 0)) is not None
+
+def test_modified_file_changes_identity(tmp_path):
+    p = tmp_path / "a.zip"
+    p.write_bytes(b"one")
+    before = file_identity(p)
+    p.write_bytes(b"three")
+    assert file_identity(p) != before
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_reuses_cached_results(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=0, stdout="SHA256 for data: abc123\n")
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    (tmp_path / "test.zip.sha256").write_text("3a6eb0790f39ac87c94f3856b2dd2c5d110e6811602261a9a923d3bb23adc8b7  test.zip\n")
+    (tmp_path / "test.zip.content.sha256").write_text("abc123\n")
+
+    with HashCache(tmp_path / "cache") as cache:
+        first = verify_layers(archive, cache=cache)
+        with patch("data_integrity_tool.core.calculate_file_hash") as mock_hash:
+            second = verify_layers(archive, cache=cache)
+            mock_hash.assert_not_called()
+        assert mock_popen.call_count == 1
+
+        verify_layers(archive, cache=cache, refresh=True)
+        assert mock_popen.call_count == 2
+
+    for layer in ("layer1", "layer2", "layer3"):
+        assert {k: v for k, v in first[layer].items() if k != "stats"} == \
+               {k: v for k, v in second[layer].items() if k != "stats"}
+    assert second["layer1"]["status"] == "PASSED"
+    assert second["layer3"]["status"] == "PASSED"
+    assert second["layer1"]["stats"]["cached"] and second["layer2"]["stats"]["cached"]
+    assert second["layer2"]["stats"]["subprocess_count"] == 0
@@ -1,8 +1,18 @@
 import pytest
+import gzip
 import hashlib
-from pathlib import Path
+import io
+import lzma
+import os
+import threading
+import time
+import tarfile
+import zipfile
 from unittest.mock import patch, MagicMock
-from data_integrity_tool.core import calculate_file_hash, verify_archive_integrity, get_archive_content_hash, create_hashes, ArchiveError
+from tests.helpers import install_fake_7z, popen_7z
+from data_integrity_tool import core
+from data_integrity_tool.journal import Journal
+from data_integrity_tool.core import estimate_7z_memory, set_7z_limits, SevenZipScheduler, SEVENZIP_BASE_MEMORY, calculate_file_hash, calculate_file_hashes, read_hash_file, calculate_tree_hash, verify_archive_integrity, get_archive_content_hash, create_hashes, verify_layers, overall_status, iter_archives, create_tree, verify_tree, check_archive, verify_members, list_archive_members, compute_member_hashes, content_hash_from_members, run_7z_test, ProgressEvent, CancelToken, OperationCancelled, OperationTimedOut, InvalidArchiveError
 
 @pytest.fixture
 def temp_file(tmp_path):
@@ -14,29 +24,39 @@ def test_calculate_file_hash(temp_file):
     expected = hashlib.sha256(b"hello world").hexdigest()
     assert calculate_file_hash(temp_file) == expected
 
-@patch("subprocess.run")
+@pytest.mark.parametrize("options", [{}, {"read_ahead": True}, {"use_mmap": True}])
+@pytest.mark.parametrize("size", [0, 1, 4096, 10000])
+def test_calculate_file_hash_modes_agree(tmp_path, options, size):
+    data = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+    p = tmp_path / "data.bin"
+    p.write_bytes(data)
+
+    expected = hashlib.sha256(data).hexdigest()
+    assert calculate_file_hash(p, block_size=4096, **options) == expected
+
+@patch("subprocess.Popen")
 @patch("shutil.which")
-def test_verify_archive_integrity_success(mock_which, mock_run, tmp_path):
+def test_verify_archive_integrity_success(mock_which, mock_popen, tmp_path):
     mock_which.return_value = "/usr/bin/7z"
-    mock_run.return_value = MagicMock(returncode=0)
+    mock_popen.side_effect = popen_7z(returncode=0)
     
     archive = tmp_path / "test.zip"
     assert verify_archive_integrity(archive) is True
 
-@patch("subprocess.run")
+@patch("subprocess.Popen")
 @patch("shutil.which")
-def test_verify_archive_integrity_failure(mock_which, mock_run, tmp_path):
+def test_verify_archive_integrity_failure(mock_which, mock_popen, tmp_path):
     mock_which.return_value = "/usr/bin/7z"
-    mock_run.return_value = MagicMock(returncode=1)
+    mock_popen.side_effect = popen_7z(returncode=1)
     
     archive = tmp_path / "test.zip"
     assert verify_archive_integrity(archive) is False
 
-@patch("subprocess.run")
+@patch("subprocess.Popen")
 @patch("shutil.which")
-def test_get_archive_content_hash(mock_which, mock_run, tmp_path):
+def test_get_archive_content_hash(mock_which, mock_popen, tmp_path):
     mock_which.return_value = "/usr/bin/7z"
-    mock_run.return_value = MagicMock(
+    mock_popen.side_effect = popen_7z(
         returncode=0,
         stdout="Everything is Ok\nSHA256 for data: abcdef123456\n"
     )
@@ -44,6 +64,75 @@ def test_get_archive_content_hash(mock_which, mock_run, tmp_path):
     archive = tmp_path / "test.zip"
     assert get_archive_content_hash(archive) == "abcdef123456"
 
+def test_calculate_file_hashes_single_pass(temp_file):
+    digests = calculate_file_hashes(temp_file, ["blake2b", "sha256"])
+    assert digests == {
+        "blake2b": hashlib.blake2b(b"hello world").hexdigest(),
+        "sha256": hashlib.sha256(b"hello world").hexdigest(),
+    }
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+@patch("data_integrity_tool.core.get_archive_content_hash")
+def test_create_and_verify_several_algorithms(mock_get_content, mock_which, mock_popen, tmp_path):
+    mock_get_content.return_value = None
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=0, stdout="Everything is Ok\n")
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+
+    hash_file, _ = create_hashes(archive, algorithms=["blake2b", "sha256"])
+
+    assert hash_file.name == "test.zip.blake2b"
+    assert hash_file.read_text().startswith("BLAKE2b (test.zip) = ")
+    assert read_hash_file(hash_file) == ("blake2b", hashlib.blake2b(b"data").hexdigest())
+    assert read_hash_file(tmp_path / "test.zip.sha256") == ("sha256", hashlib.sha256(b"data").hexdigest())
+
+    # Both sidecars are discovered and checked; a bad one is reported by algorithm
+    hash_file.write_text(f"BLAKE2b (test.zip) = {'0' * 128}\n")
+    with patch("data_integrity_tool.core.calculate_file_hash") as mock_single:
+        results = verify_layers(archive)
+        mock_single.assert_not_called()
+    assert results["layer1"]["status"] == "WARNING"
+    assert results["layer1"]["details"]["algorithm"] == "blake2b"
+
+def test_tree_hash_parallel_matches_sequential(tmp_path):
+    data = bytes(range(256)) * 40 + b"tail"
+    p = tmp_path / "data.bin"
+    p.write_bytes(data)
+
+    parallel = calculate_tree_hash(p, segment_size=1000, workers=4)
+    sequential = calculate_tree_hash(p, segment_size=1000, workers=1)
+
+    assert parallel == sequential
+    assert parallel.size == len(data)
+    assert parallel.segments[-1] == hashlib.sha256(data[10000:]).hexdigest()
+    joined = b"".join(hashlib.sha256(data[i:i + 1000]).digest() for i in range(0, len(data), 1000))
+    assert parallel.root == hashlib.sha256(joined).hexdigest()
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+@patch("data_integrity_tool.core.get_archive_content_hash")
+def test_tree_hash_localises_corruption(mock_get_content, mock_which, mock_popen, tmp_path):
+    mock_get_content.return_value = None
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=0, stdout="Everything is Ok\n")
+    archive = tmp_path / "big.zip"
+    data = bytearray(os.urandom(10000))
+    archive.write_bytes(data)
+
+    tree_file, _ = create_hashes(archive, tree_hash=True, segment_size=1000)
+    assert tree_file.name == "big.zip.treehash.json"
+    assert verify_layers(archive)["layer1"]["status"] == "PASSED"
+
+    data[2500] ^= 0xFF
+    data[3999] ^= 0xFF
+    data[9000] ^= 0xFF
+    archive.write_bytes(data)
+    layer1 = verify_layers(archive)["layer1"]
+    assert layer1["status"] == "WARNING"
+    assert layer1["details"]["ranges"] == [(2000, 4000), (9000, 10000)]
+
 @patch("data_integrity_tool.core.calculate_file_hash")
 @patch("data_integrity_tool.core.get_archive_content_hash")
 def test_create_hashes(mock_get_content, mock_calc_hash, temp_file):
@@ -61,3 +150,467 @@ def test_create_hashes(mock_get_content, mock_calc_hash, temp_file):
     
     assert "hash123" in hash_file.read_text()
     assert "content123" in content_hash_file.read_text()
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_reports_stats(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=2, stderr="ERROR: Data Error\n")
+
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    (tmp_path / "test.zip.sha256").write_text("0" * 64 + "  test.zip\n")
+    (tmp_path / "test.zip.content.sha256").write_text("abc\n")
+
+    reported = []
+    results = verify_layers(archive, stats_hook=lambda path, layer, stats: reported.append((path, layer, stats)))
+
+    layer1, layer2, layer3 = (results[name]["stats"] for name in ("layer1", "layer2", "layer3"))
+    assert layer1["bytes_read"] == 4 and layer1["subprocess_count"] == 0
+    assert layer2["subprocess_count"] == 1
+    assert layer2["subprocess_returncode"] == 2
+    assert layer2["subprocess_seconds"] >= 0 and layer2["wall_seconds"] >= 0
+    assert layer3["subprocess_seconds"] is None
+    assert [(path, layer) for path, layer, _ in reported] == [
+        (archive, "layer1"), (archive, "layer2"), (archive, "layer3")
+    ]
+    assert reported[1][2] is layer2
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_single_7z_pass(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(
+        returncode=0,
+        stdout="Everything is Ok\nSHA256 for data: abcdef123456\n"
+    )
+
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    content_hash_file = tmp_path / "test.zip.content.sha256"
+    content_hash_file.write_text("ABCDEF123456\n")
+
+    results = verify_layers(archive)
+
+    assert mock_popen.call_count == 1
+    assert results["layer2"]["status"] == "PASSED"
+    assert results["layer3"]["status"] == "PASSED"
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_reports_progress(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(stdout=" 40% T a.txt\b\b\b 100%\nEverything is Ok\nSHA256 for data: abc123\n")
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(data)
+    (tmp_path / "test.zip.sha256").write_text(hashlib.sha256(data).hexdigest() + "  test.zip\n")
+    (tmp_path / "test.zip.content.sha256").write_text("abc123\n")
+
+    events = []
+    results = verify_layers(archive, progress=events.append)
+
+    assert overall_status(results) == "PASSED"
+    assert [e.layer for e in events if e.kind == "layer"] == ["layer1", "layer2"]
+    # Throttled, but the final count is always reported
+    hashed = [e for e in events if e.kind == "bytes"]
+    assert hashed[-1] == ProgressEvent("bytes", done=len(data), total=len(data))
+    assert len(hashed) < 4
+    assert [e.percent for e in events if e.kind == "percent"] == [40, 100]
+    assert events.index(hashed[-1]) < events.index(next(e for e in events if e.layer == "layer2"))
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_corrupt_archive_fails_both_layers(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=2, stderr="Data Error")
+
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    (tmp_path / "test.zip.content.sha256").write_text("abcdef123456\n")
+
+    results = verify_layers(archive)
+
+    assert mock_popen.call_count == 1
+    assert results["layer2"]["status"] == "FAILED"
+    assert results["layer3"]["status"] == "ERROR"
+    assert "Data Error" in results["layer3"]["message"]
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_verify_layers_policies(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=2, stderr="Data Error")
+
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    (tmp_path / "test.zip.sha256").write_text(hashlib.sha256(b"data").hexdigest() + "  test.zip\n")
+    (tmp_path / "test.zip.content.sha256").write_text("abcdef123456\n")
+
+    # Byte-identical: the fast policy never decompresses
+    results = verify_layers(archive, policy="fast")
+    assert mock_popen.call_count == 0
+    assert results["layer1"]["status"] == "PASSED"
+    assert results["layer2"]["details"] == {"reason": "policy"}
+    assert results["layer3"]["status"] == "SKIPPED"
+    assert overall_status(results) == "PASSED"
+
+    # A deadline runs the decompression only if it fits
+    results = verify_layers(archive, deadline=0)
+    assert mock_popen.call_count == 0
+    assert results["layer2"]["details"] == {"reason": "deadline"}
+    assert overall_status(results) == "SKIPPED"
+
+    # Layer 1 mismatch: fast falls back to the full check, and fail-fast stops after it fails
+    (tmp_path / "test.zip.sha256").write_text("0" * 64 + "  test.zip\n")
+    results = verify_layers(archive, policy="fast", fail_fast=True)
+    assert mock_popen.call_count == 1
+    assert results["layer1"]["status"] == "WARNING"
+    assert results["layer2"]["status"] == "FAILED"
+    assert overall_status(results) == "FAILED"
+
+    with pytest.raises(ValueError):
+        verify_layers(archive, policy="sloppy")
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_create_hashes_rejects_invalid_archive(mock_which, mock_popen, temp_file):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=2, stderr="Can not open the file as archive")
+
+    with pytest.raises(InvalidArchiveError):
+        create_hashes(temp_file)
+
+    assert mock_popen.call_count == 1
+    assert not temp_file.with_name(temp_file.name + ".sha256").exists()
+    assert not temp_file.with_name(temp_file.name + ".content.sha256").exists()
+
+def test_iter_archives_finds_sidecars(tmp_path):
+    (tmp_path / "b.zip").touch()
+    (tmp_path / "b.zip.sha256").touch()
+    (tmp_path / "b.zip.content.sha256").touch()
+    (tmp_path / "notes.txt").touch()
+    nested = tmp_path / "sub"
+    nested.mkdir()
+    (nested / "a.7z").touch()
+    (nested / "a.7z.sha256").touch()
+
+    entries = list(iter_archives(tmp_path))
+
+    assert [e.archive_path for e in entries] == [tmp_path / "b.zip", nested / "a.7z"]
+    assert entries[0].hash_file == tmp_path / "b.zip.sha256"
+    assert entries[0].content_hash_file == tmp_path / "b.zip.content.sha256"
+    assert entries[1].hash_file == nested / "a.7z.sha256"
+    assert entries[1].content_hash_file is None
+
+@patch("data_integrity_tool.core.verify_layers")
+def test_verify_tree_streams_results(mock_verify, tmp_path):
+    def fake_verify(archive_path, hash_file, content_hash_file, **kwargs):
+        layer2 = "FAILED" if archive_path.name == "bad.zip" else "PASSED"
+        return {
+            "layer1": {"status": "SKIPPED", "message": "No hash file", "details": None},
+            "layer2": {"status": layer2, "message": "", "details": None},
+            "layer3": {"status": "SKIPPED", "message": "No content hash file", "details": None},
+        }
+    mock_verify.side_effect = fake_verify
+    for name in ("good.zip", "bad.zip"):
+        (tmp_path / name).touch()
+
+    results = {r.archive_path.name: r.status for r in verify_tree(tmp_path, workers=2)}
+
+    assert results == {"good.zip": "SKIPPED", "bad.zip": "FAILED"}
+
+def _data_sum(*members):
+    """7z's 'SHA256 for data': per-file digests summed as little-endian integers, plus any carry."""
+    total = sum(int.from_bytes(hashlib.sha256(m).digest(), "little") for m in members)
+    digest = (total % (1 << 256)).to_bytes(32, "little").hex()
+    return f"{digest}-{total >> 256:08x}" if total >> 256 else digest
+
+# 'SHA256 for data' as 7z prints it for a ZIP holding OVERFLOWING_MEMBERS,
+# whose two digests sum past 2^256: the carry follows the digest
+OVERFLOWING_MEMBERS = {"a.txt": b"alpha 0\n", "b.txt": b"bravo 0\n"}
+OVERFLOWING_7Z_OUTPUT = (
+    "Everything is Ok\n\nFiles: 2\nSize:       16\n\n"
+    "SHA256 for data:              c3a173c050e30410b2ab1076aa82c9cc4f3dc0d2acaaac9db0fc64fa84ef7a33-00000001\n"
+)
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_content_hash_carry_matches_across_engines(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(stdout=OVERFLOWING_7Z_OUTPUT)
+    archive = tmp_path / "test.zip"
+    _write_zip(archive, OVERFLOWING_MEMBERS)
+
+    from_7z = check_archive(archive).content_hash
+    assert from_7z.endswith("-00000001")
+    assert check_archive(archive, engine="native").content_hash == from_7z
+    assert content_hash_from_members(compute_member_hashes(archive, engine="native")) == from_7z
+
+    # A sidecar written by either engine verifies with the other
+    create_hashes(archive, engine="native")
+    assert verify_layers(archive)["layer3"]["status"] == "PASSED"
+    create_hashes(archive)
+    assert verify_layers(archive, engine="native")["layer3"]["status"] == "PASSED"
+    # Old sidecars may hold the carry in another width or case
+    (tmp_path / "test.zip.content.sha256").write_text(from_7z.upper().replace("-00000001", "-1") + "\n")
+    assert verify_layers(archive, engine="native")["layer3"]["status"] == "PASSED"
+
+MEMBERS = {"a.txt": b"content 1\n", "dir/b.txt": b"content 2\n" * 1000, "empty.txt": b""}
+
+def test_native_engine_zip(tmp_path):
+    archive = tmp_path / "test.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("dir/", "")
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+
+    check = check_archive(archive, engine="native")
+    assert check.ok
+    assert check.content_hash == _data_sum(*MEMBERS.values())
+
+def test_native_engine_tar_matches_zip(tmp_path):
+    archive = tmp_path / "test.tar"
+    with tarfile.open(archive, "w") as tf:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+    check = check_archive(archive, engine="native")
+    assert check.ok
+    assert check.content_hash == _data_sum(*MEMBERS.values())
+
+def test_native_engine_tar_gz_hashes_inner_stream(tmp_path):
+    # 7z treats .tar.gz as a gzip stream holding one file, the tar itself
+    tar_path = tmp_path / "test.tar"
+    with tarfile.open(tar_path, "w") as tf:
+        info = tarfile.TarInfo("a.txt")
+        info.size = 3
+        tf.addfile(info, io.BytesIO(b"abc"))
+    archive = tmp_path / "test.tar.gz"
+    archive.write_bytes(gzip.compress(tar_path.read_bytes()))
+
+    check = check_archive(archive, engine="native")
+    assert check.content_hash == _data_sum(tar_path.read_bytes())
+
+def test_native_engine_detects_crc_error(tmp_path):
+    archive = tmp_path / "test.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("a.txt", b"hello world")
+    data = archive.read_bytes()
+    archive.write_bytes(data.replace(b"hello world", b"hello w0rld"))
+
+    check = check_archive(archive, engine="native")
+    assert not check.ok
+    assert check.content_hash is None
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_native_engine_falls_back_to_7z(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=0, stdout="SHA256 for data: abc\n")
+    archive = tmp_path / "test.7z"
+    archive.write_bytes(b"7z\xbc\xaf\x27\x1c" + b"\0" * 64)
+
+    assert check_archive(archive, engine="native").content_hash == "abc"
+    assert mock_popen.call_count == 1
+
+def _write_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+def test_manifest_localizes_corrupt_member(tmp_path):
+    archive = tmp_path / "test.zip"
+    _write_zip(archive, {"a.txt": b"alpha" * 10, "b.txt": b"bravo" * 10, "c.csv": b"1,2,3"})
+    create_hashes(archive, engine="native", manifest=True)
+    assert (tmp_path / "test.zip.content.sha256").read_text().strip() == _data_sum(b"alpha" * 10, b"bravo" * 10, b"1,2,3")
+
+    assert verify_members(archive, engine="native")["status"] == "PASSED"
+
+    archive.write_bytes(archive.read_bytes().replace(b"bravo" * 10, b"brave" * 10))
+    result = verify_members(archive, engine="native")
+    assert result["status"] == "FAILED"
+    assert [m["name"] for m in result["details"]["mismatches"]] == ["b.txt"]
+    assert result["details"]["checked"] == 3
+
+    partial = verify_members(archive, patterns=["*.csv"], engine="native")
+    assert partial["status"] == "PASSED"
+    assert partial["details"]["checked"] == 1
+
+@patch("subprocess.run")
+@patch("shutil.which")
+def test_list_archive_members(mock_which, mock_run, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_run.return_value = MagicMock(returncode=0, stdout=(
+        "Path = test.7z\nType = 7z\n\n----------\n"
+        "Path = dir\nSize = 0\nFolder = +\n\n"
+        "Path = dir/a.txt\nSize = 12\nFolder = -\nCRC = 0A1B2C3D\n\n"
+    ))
+
+    assert list_archive_members(tmp_path / "test.7z") == [("dir/a.txt", 12)]
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_run_7z_test_streams_progress(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(stdout=(
+        "Testing archive: test.7z\n"
+        "  0%\x08\x08\x08\x08    \x08\x08\x08\x08 40% - a.txt\r"
+        "T a.txt\nT dir/b.txt\n 100%\r\n"
+        "Everything is Ok\n\nSHA256 for data:              00ff\n"
+        "SHA256 for data and names:    1234\n"
+    ))
+    events = []
+
+    result = run_7z_test(tmp_path / "test.7z", content_hash=True, progress=events.append)
+
+    assert result.returncode == 0
+    assert result.content_hash == "00ff"
+    assert [e.percent for e in events if e.kind == "percent"] == [0, 40, 100]
+    assert [e.entry for e in events if e.kind == "entry"] == ["a.txt", "dir/b.txt"]
+    assert "-bsp1" in mock_popen.call_args[0][0]
+
+def test_estimate_7z_memory_reads_xz_dictionary(tmp_path):
+    archive = tmp_path / "data.xz"
+    archive.write_bytes(lzma.compress(b"x" * 1000, preset=6))  # 8 MiB dictionary
+    assert estimate_7z_memory(archive) == SEVENZIP_BASE_MEMORY + 8 * 1024 * 1024
+
+    plain = tmp_path / "data.zip"
+    plain.write_bytes(b"PK\x03\x04")
+    assert estimate_7z_memory(plain) == SEVENZIP_BASE_MEMORY
+
+@patch("data_integrity_tool.core.estimate_7z_memory")
+def test_scheduler_admits_by_memory(mock_estimate, tmp_path):
+    mock_estimate.return_value = 60
+    scheduler = SevenZipScheduler(max_processes=4, memory_budget=100)
+    entered = threading.Event()
+
+    def second():
+        with scheduler.slot(tmp_path / "b.7z"):
+            entered.set()
+
+    with scheduler.slot(tmp_path / "a.7z"):
+        thread = threading.Thread(target=second)
+        thread.start()
+        time.sleep(0.2)
+        assert not entered.is_set()  # 60 + 60 exceeds the budget
+    thread.join(5)
+    assert entered.is_set()
+
+@patch("subprocess.Popen")
+def test_run_7z_test_passes_thread_limit(mock_popen, tmp_path):
+    mock_popen.side_effect = popen_7z(returncode=0)
+    set_7z_limits(threads=2)
+    try:
+        run_7z_test(tmp_path / "a.7z")
+    finally:
+        set_7z_limits()
+    assert "-mmt=2" in mock_popen.call_args[0][0]
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_invalid_archive_abandons_file_hash(mock_which, mock_popen, tmp_path, monkeypatch):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(returncode=2, stderr="Cannot open the file as archive")
+    abandoned = threading.Event()
+    def slow_file_hashes(archive_path, algorithms, progress, cancel):
+        # Stands in for reading a multi-GB file
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if cancel.cancelled:
+                abandoned.set()
+                cancel.check()
+            time.sleep(0.01)
+        return {a: "00" for a in algorithms}, {}
+    monkeypatch.setattr(core, "_timed_file_hashes", slow_file_hashes)
+    archive = tmp_path / "bad.zip"
+    archive.write_bytes(b"not an archive")
+
+    started = time.monotonic()
+    with pytest.raises(InvalidArchiveError):
+        create_hashes(archive)
+    assert abandoned.is_set()
+    assert time.monotonic() - started < 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bad.zip"]
+
+def test_cancel_token_stops_hashing(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * (4 * 1024 * 1024))
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(OperationCancelled):
+        calculate_file_hash(path, cancel=token)
+    with pytest.raises(OperationTimedOut):
+        calculate_tree_hash(path, segment_size=1024 * 1024, cancel=CancelToken(timeout=0))
+    # A child fires with its parent
+    assert CancelToken(timeout=60, parent=token).cancelled
+    assert not CancelToken(timeout=60).cancelled
+
+@pytest.mark.parametrize("options", [{}, {"read_ahead": True}, {"use_mmap": True}])
+def test_cancel_mid_file_stops_every_read_mode(tmp_path, options):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * (4 * 1024 * 1024))
+    token = CancelToken()
+    def cancel_after_first_block(event):
+        token.cancel()
+    with pytest.raises(OperationCancelled):
+        calculate_file_hash(path, block_size=1024 * 1024, progress=cancel_after_first_block, cancel=token, **options)
+
+@pytest.mark.skipif(os.name == "nt", reason="fake 7z is a shell script")
+def test_layer_timeout_kills_7z(tmp_path, monkeypatch):
+    pid_file = install_fake_7z(tmp_path, monkeypatch)
+    monkeypatch.setenv("FAKE_7Z_HANG", "1")
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+    (tmp_path / "test.zip.sha256").write_text(hashlib.sha256(b"data").hexdigest() + "  test.zip\n")
+
+    started = time.monotonic()
+    results = verify_layers(archive, layer_timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    assert results["layer1"]["status"] == "PASSED"
+    assert results["layer2"]["status"] == "ERROR"
+    assert results["layer2"]["details"] == {"reason": "timeout"}
+    # Running out of time says nothing about the archive
+    assert overall_status(results) == "ERROR"
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+@pytest.mark.skipif(os.name == "nt", reason="fake 7z is a shell script")
+def test_timed_out_archive_is_retried_on_resume(tmp_path, monkeypatch):
+    install_fake_7z(tmp_path, monkeypatch)
+    monkeypatch.setenv("FAKE_7Z_HANG", "1")
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    (archives / "test.zip").write_bytes(b"data")
+    (archives / "test.zip.sha256").write_text(hashlib.sha256(b"data").hexdigest() + "  test.zip\n")
+    (archives / "test.zip.content.sha256").write_text("abc123\n")
+    journal_path = tmp_path / "run.journal"
+
+    with Journal(journal_path) as journal:
+        [result] = verify_tree(archives, journal=journal, layer_timeout=0.5)
+    assert result.status == "ERROR"
+
+    monkeypatch.delenv("FAKE_7Z_HANG")
+    with Journal(journal_path) as journal:
+        [result] = verify_tree(archives, journal=journal, resume=True)
+    assert result.status == "PASSED"
+    assert not result.message.endswith("(from journal)")
+
+@pytest.mark.skipif(os.name == "nt", reason="fake 7z is a shell script")
+def test_create_tree_timeout_and_cancel(tmp_path, monkeypatch):
+    install_fake_7z(tmp_path, monkeypatch)
+    monkeypatch.setenv("FAKE_7Z_HANG", "1")
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    (archives / "test.zip").write_bytes(b"data")
+
+    [result] = create_tree(archives, timeout=0.5)
+    assert result.status == "ERROR"
+    assert sorted(p.name for p in archives.iterdir()) == ["test.zip"]
+
+    with pytest.raises(OperationTimedOut):
+        list(create_tree(archives, cancel=CancelToken(timeout=0.5)))
+    assert sorted(p.name for p in archives.iterdir()) == ["test.zip"]
@@ -0,0 +1,160 @@
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from data_integrity_tool.core import OperationCancelled
+from data_integrity_tool.daemon import make_server, write_token_file
+from data_integrity_tool.jobs import JobQueue, DONE, FAILED, CANCELLED, RUNNING
+
+PASSING = {name: {"status": "PASSED", "message": "", "details": None} for name in ("layer1", "layer2", "layer3")}
+
+@patch("data_integrity_tool.core.verify_layers")
+def test_higher_priority_jobs_run_first(mock_verify, tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+    def fake_verify(archive_path, **kwargs):
+        if archive_path.name == "blocker.zip":
+            started.set()
+            release.wait(5)
+        order.append(archive_path.name)
+        return PASSING
+    mock_verify.side_effect = fake_verify
+
+    jobs = JobQueue(workers=1)
+    jobs.submit("verify", tmp_path / "blocker.zip")
+    started.wait(5)
+    low = jobs.submit("verify", tmp_path / "low.zip", priority=0)
+    high = jobs.submit("verify", tmp_path / "high.zip", priority=10)
+    cancelled = jobs.submit("verify", tmp_path / "cancelled.zip", priority=5)
+    assert jobs.cancel(cancelled.id)
+    release.set()
+    jobs.shutdown()
+
+    assert order == ["blocker.zip", "high.zip", "low.zip"]
+    assert (low.state, high.state, cancelled.state) == (DONE, DONE, CANCELLED)
+    assert high.result["status"] == "PASSED"
+
+@patch("data_integrity_tool.core.verify_layers")
+def test_running_job_can_be_cancelled(mock_verify, tmp_path):
+    def fake_verify(archive_path, cancel, **kwargs):
+        while not cancel.cancelled:
+            time.sleep(0.01)
+        raise OperationCancelled("Cancelled")
+    mock_verify.side_effect = fake_verify
+
+    jobs = JobQueue(workers=1)
+    job = jobs.submit("verify", tmp_path / "stuck.zip")
+    while job.state != RUNNING:
+        time.sleep(0.01)
+    assert jobs.cancel(job.id)
+    assert job.done.wait(5)
+    assert job.state == CANCELLED
+    assert not jobs.cancel(job.id)
+    jobs.shutdown()
+
+def test_http_api_submit_and_wait(tmp_path):
+    jobs = JobQueue(workers=2)
+    server = make_server(jobs, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        request = urllib.request.Request(
+            f"{base}/jobs",
+            data=json.dumps({"command": "create", "archive": str(tmp_path / "missing.zip")}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 202
+            job_id = json.load(response)["id"]
+
+        with urllib.request.urlopen(f"{base}/jobs/{job_id}?wait=5") as response:
+            job = json.load(response)
+        assert job["state"] == FAILED
+        assert job["error"].startswith("FileNotFoundError")
+
+        bad = urllib.request.Request(
+            f"{base}/jobs", data=json.dumps({"command": "rm", "archive": "x"}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(bad)
+            assert False, "Unknown commands must be rejected"
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        jobs.shutdown()
+
+def status_of(request):
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def test_http_api_only_accepts_api_clients(tmp_path):
+    jobs = JobQueue(workers=1)
+    token = write_token_file(tmp_path / "token")
+    assert stat.S_IMODE(os.stat(tmp_path / "token").st_mode) == 0o600
+    server = make_server(jobs, port=0, token=token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    body = json.dumps({"command": "create", "archive": str(tmp_path / "missing.zip")}).encode()
+    auth = {"Authorization": f"Bearer {token}"}
+
+    def post(**headers):
+        return status_of(urllib.request.Request(f"{base}/jobs", data=body, headers=headers))
+
+    try:
+        assert post(**{"Content-Type": "application/json"}) == 401
+        # What a web page can send without a preflight
+        assert post(**auth, **{"Content-Type": "text/plain"}) == 415
+        assert post(**auth, **{"Content-Type": "application/json", "Origin": "https://example.org"}) == 403
+        assert post(**auth, **{"Content-Type": "application/json", "Host": "evil.example:80"}) == 403
+        assert post(**auth, **{"Content-Type": "application/json; charset=utf-8"}) == 202
+        assert status_of(urllib.request.Request(f"{base}/health")) == 401
+    finally:
+        server.shutdown()
+        server.server_close()
+        jobs.shutdown()
+
+def test_non_loopback_host_needs_a_token():
+    with pytest.raises(ValueError):
+        make_server(JobQueue(workers=1), host="0.0.0.0", port=0)
+
+def test_platforms_without_unix_sockets_can_still_serve_tcp(tmp_path):
+    code = (
+        "import socket\n"
+        "del socket.AF_UNIX\n"
+        "from pathlib import Path\n"
+        "from data_integrity_tool.daemon import make_server\n"
+        "from data_integrity_tool.jobs import JobQueue\n"
+        "try:\n"
+        f"    make_server(JobQueue(workers=1), socket_path=Path({str(tmp_path / 'api.sock')!r}))\n"
+        "except OSError as e:\n"
+        "    print(e)\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent / "src"))
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert "not supported" in result.stdout
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no Unix sockets")
+def test_unix_socket_is_created_owner_only(tmp_path):
+    jobs = JobQueue(workers=1)
+    server = make_server(jobs, socket_path=tmp_path / "api.sock")
+    try:
+        assert stat.S_IMODE(os.stat(tmp_path / "api.sock").st_mode) == 0o600
+    finally:
+        server.server_close()
+        jobs.shutdown()
@@ -8,7 +8,7 @@ import os
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from data_integrity_tool.core import find_hash_files
+from data_integrity_tool.core import find_hash_files, sidecar_archive_path
 
 class TestFindHashFiles(unittest.TestCase):
     def setUp(self):
@@ -50,5 +50,12 @@ class TestFindHashFiles(unittest.TestCase):
         self.assertEqual(result['archive_hash'], hash_file)
         self.assertEqual(result['content_hash'], content_hash_file)
 
+    def test_sidecar_archive_path(self):
+        for suffix in (".sha256", ".blake2b", ".treehash.json", ".content.sha256"):
+            sidecar = Path(str(self.archive_path) + suffix)
+            self.assertEqual(sidecar_archive_path(sidecar), self.archive_path)
+        self.assertIsNone(sidecar_archive_path(Path(self.test_dir) / "INTEGRITY.SUMS"))
+        self.assertIsNone(sidecar_archive_path(self.archive_path))
+
 if __name__ == '__main__':
     unittest.main()
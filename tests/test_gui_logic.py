@@ -4,12 +4,15 @@ from pathlib import Path
 import sys
 import tempfile
 import shutil
+import threading
+import time
 import tkinter as tk
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from data_integrity_tool.gui import DataIntegrityApp, VerifyPage
+from data_integrity_tool.core import ProgressEvent
+from data_integrity_tool.gui import BatchQueue, DataIntegrityApp, ProgressMonitor, RowWindow, VerifyPage
 
 class TestGUILogic(unittest.TestCase):
     def setUp(self):
@@ -47,5 +50,118 @@ class TestGUILogic(unittest.TestCase):
         self.assertEqual(self.verify_page.archive_hash_path.get(), "")
         self.assertEqual(self.verify_page.content_hash_path.get(), "")
 
+class TestBatchQueue(unittest.TestCase):
+    """The batch page's model; needs no display."""
+
+    def poll_until_finished(self, batch):
+        changed = set()
+        deadline = time.monotonic() + 5
+        while batch.counts()[0] < batch.counts()[1] and time.monotonic() < deadline:
+            changed |= batch.poll()
+            time.sleep(0.01)
+        return changed | batch.poll()
+
+    @patch("data_integrity_tool.core.verify_layers")
+    def test_cancel_and_retry(self, mock_verify):
+        release = threading.Event()
+        def fake_verify(archive_path, **kwargs):
+            if archive_path.name == "blocker.zip":
+                release.wait(5)
+            status = "FAILED" if archive_path.name == "bad.zip" else "PASSED"
+            return {name: {"status": status, "message": "Mismatch", "details": None} for name in ("layer1", "layer2", "layer3")}
+        mock_verify.side_effect = fake_verify
+
+        batch = BatchQueue(workers=1)
+        blocker = batch.add("verify", Path("blocker.zip"))
+        good = batch.add("verify", Path("good.zip"))
+        bad = batch.add("verify", Path("bad.zip"))
+        self.assertTrue(batch.cancel(good))
+        self.assertFalse(batch.retry(bad))  # Still queued
+        release.set()
+
+        self.assertEqual(self.poll_until_finished(batch), {blocker, good, bad})
+        self.assertEqual([batch.rows[r].status() for r in (blocker, good, bad)], ["PASSED", "CANCELLED", "FAILED"])
+        self.assertEqual(batch.rows[bad].summary(), "layer1: Mismatch, layer2: Mismatch, layer3: Mismatch")
+
+        self.assertTrue(batch.retry(good))
+        self.assertEqual(batch.counts(), (2, 3))
+        self.assertEqual(self.poll_until_finished(batch), {good})
+        self.assertEqual(batch.rows[good].status(), "PASSED")
+        self.assertTrue(batch.remove(blocker))
+        self.assertEqual(batch.counts(), (2, 2))
+
+    @patch("data_integrity_tool.core.verify_layers")
+    def test_rows_show_job_progress(self, mock_verify):
+        reported, release = threading.Event(), threading.Event()
+        def fake_verify(archive_path, progress=None, **kwargs):
+            progress(ProgressEvent("layer", layer="layer1"))
+            progress(ProgressEvent("bytes", done=50, total=100))
+            reported.set()
+            release.wait(5)
+            return {name: {"status": "PASSED", "message": "", "details": None} for name in ("layer1", "layer2", "layer3")}
+        mock_verify.side_effect = fake_verify
+
+        batch = BatchQueue(workers=1)
+        row_id = batch.add("verify", Path("a.zip"))
+        self.assertTrue(reported.wait(5))
+        batch.poll()
+        self.assertEqual(batch.rows[row_id].progress(), "Hashing 50%")
+        release.set()
+        self.poll_until_finished(batch)
+        self.assertEqual(batch.rows[row_id].progress(), "")
+
+class TestRowWindow(unittest.TestCase):
+    """The rows the batch page keeps in its Treeview; needs no display."""
+
+    def test_only_the_rows_in_view_are_shown(self):
+        window = RowWindow(size=3)
+        for i in range(10):
+            window.append(f"row{i}")
+        self.assertEqual(window.visible(), ["row0", "row1", "row2"])
+        self.assertEqual(window.fractions(), (0.0, 0.3))
+
+        window.scroll(100)
+        self.assertEqual(window.visible(), ["row7", "row8", "row9"])
+        window.move_to(0.5)
+        self.assertEqual(window.visible(), ["row5", "row6", "row7"])
+
+        # Removing rows near the end pulls the window back
+        window.remove(["row8", "row9", "row7"])
+        self.assertEqual(window.visible(), ["row4", "row5", "row6"])
+        window.resize(20)
+        self.assertEqual(window.visible(), [f"row{i}" for i in range(7)])
+        self.assertEqual(window.fractions(), (0.0, 1.0))
+
+class TestProgressMonitor(unittest.TestCase):
+    """Progress as the pages draw it; needs no display."""
+
+    def test_events_are_coalesced_per_tick(self):
+        monitor = ProgressMonitor()
+        calls = []
+        monitor(ProgressEvent("layer", layer="layer1"))
+        self.assertEqual(monitor.summary(), (0.0, "Starting..."))
+        for done in range(0, 101, 10):
+            monitor(ProgressEvent("bytes", done=done * 1024 * 1024, total=200 * 1024 * 1024))
+        monitor.log("one")
+        monitor.call(lambda: calls.append(1))
+        monitor.log("two")
+
+        lines, updates = monitor.drain()
+        self.assertEqual(lines, ["one", "two"])
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(monitor.summary(), (0.5, "Hashing: 50% (100 of 200 MiB)"))
+
+        # Hashing done, 7z running: the label follows the 7z pass
+        monitor(ProgressEvent("bytes", done=200 * 1024 * 1024, total=200 * 1024 * 1024))
+        monitor(ProgressEvent("layer", layer="layer2"))
+        monitor(ProgressEvent("percent", percent=25))
+        monitor(ProgressEvent("entry", entry="docs/a.txt"))
+        monitor.drain()
+        self.assertEqual(monitor.summary(), (0.25, "Testing: 25% (docs/a.txt)"))
+
+        monitor.finish()
+        self.assertEqual(monitor.drain(), ([], []))
+        self.assertEqual(monitor.summary()[0], 1.0)
+
 if __name__ == '__main__':
     unittest.main()
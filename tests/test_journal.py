@@ -0,0 +1,45 @@
+import os
+from unittest.mock import patch
+from data_integrity_tool.core import verify_tree
+from data_integrity_tool.journal import Journal
+
+def test_latest_record_wins_and_torn_lines_are_ignored(tmp_path):
+    path = tmp_path / "run.journal"
+    with Journal(path) as journal:
+        journal.record("verify", tmp_path / "a.zip", [[1, 2, 3, 4]], "ERROR", "boom")
+        journal.record("verify", tmp_path / "a.zip", [[1, 2, 3, 4]], "PASSED", "OK")
+    with open(path, "a") as f:
+        f.write('{"command": "verify", "archive": "b.zi')  # Killed mid-write
+
+    with Journal(path) as journal:
+        record = journal.lookup("verify", tmp_path / "a.zip")
+        assert record.status == "PASSED"
+        assert journal.lookup("verify", tmp_path / "b.zip") is None
+        assert journal.lookup("create", tmp_path / "a.zip") is None
+
+@patch("data_integrity_tool.core.verify_layers")
+def test_verify_tree_resumes_unchanged_archives(mock_verify, tmp_path):
+    def fake_verify(archive_path, hash_file, content_hash_file, **kwargs):
+        status = "PASSED" if archive_path.read_bytes() == b"ok" else "FAILED"
+        return {name: {"status": status, "message": "", "details": None} for name in ("layer1", "layer2", "layer3")}
+    mock_verify.side_effect = fake_verify
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    for name in ("a.zip", "b.zip", "c.zip"):
+        (archives / name).write_bytes(b"ok")
+    journal_path = tmp_path / "run.journal"
+
+    with Journal(journal_path) as journal:
+        assert {r.status for r in verify_tree(archives, journal=journal)} == {"PASSED"}
+    assert mock_verify.call_count == 3
+
+    # b.zip changes after it was verified: only it is read again
+    (archives / "b.zip").write_bytes(b"bad")
+    st = os.stat(archives / "b.zip")
+    os.utime(archives / "b.zip", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    with Journal(journal_path) as journal:
+        results = {r.archive_path.name: r for r in verify_tree(archives, journal=journal, resume=True)}
+    assert mock_verify.call_count == 4
+    assert results["b.zip"].status == "FAILED"
+    assert results["a.zip"].status == "PASSED"
+    assert results["a.zip"].message.endswith("(from journal)")
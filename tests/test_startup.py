@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pytest
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+# Generous enough for slow CI machines, tight enough to catch tkinter or
+# other heavyweight imports creeping back into the CLI path
+CLI_IMPORT_BUDGET_SECONDS = 0.25
+RUNS = 3
+HEAVY_MODULES = ("tkinter", "sqlite3", "concurrent.futures")
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+def best_time(code: str) -> float:
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        run_python(code)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_cli_import_skips_heavy_modules():
+    result = run_python(
+        "import sys\n"
+        "import data_integrity_tool.main, data_integrity_tool.cli\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    assert result.stdout.strip() == "[]"
+
+def test_cli_cold_start_latency():
+    interpreter = best_time("pass")
+    cli = best_time("import data_integrity_tool.main, data_integrity_tool.cli")
+    assert cli - interpreter < CLI_IMPORT_BUDGET_SECONDS
+
+def test_gui_import_skips_http_daemon():
+    pytest.importorskip("tkinter")
+    # The daemon is optional on Windows, where the GUI is the entry point
+    result = run_python(
+        "import sys\n"
+        "import data_integrity_tool.gui\n"
+        "print('data_integrity_tool.daemon' in sys.modules)"
+    )
+    assert result.stdout.strip() == "False"
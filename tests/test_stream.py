@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import io
+import os
+import stat
+import sys
+import pytest
+from tests.helpers import install_fake_7z
+from data_integrity_tool import core
+from data_integrity_tool.core import CancelToken, OperationTimedOut, write_hash_file
+from data_integrity_tool.stream import copy_archive, create_from_stream, stream_type, verify_stream
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake 7z is a shell script")
+
+GZ_DATA = gzip.compress(b"payload" * 1000)
+ZIP_DATA = b"PK\x03\x04" + b"\0" * 100
+
+@pytest.fixture
+def fake_7z(tmp_path, monkeypatch):
+    return install_fake_7z(tmp_path, monkeypatch)
+
+def statuses(results):
+    return [results[name]["status"] for name in ("layer1", "layer2", "layer3")]
+
+def test_stream_type():
+    assert stream_type(GZ_DATA) == "gzip"
+    assert stream_type(b"\0" * 257 + b"ustar\x0000") == "tar"
+    assert stream_type(ZIP_DATA) is None
+
+def test_verify_gzip_stream_and_save_it(tmp_path, fake_7z):
+    archive = tmp_path / "test.tar.gz"
+    write_hash_file(archive, "sha256", hashlib.sha256(GZ_DATA).hexdigest())
+    (tmp_path / "test.tar.gz.content.sha256").write_text("abc123\n")
+
+    results = verify_stream(io.BytesIO(GZ_DATA), archive, output=True)
+
+    assert statuses(results) == ["PASSED"] * 3
+    assert archive.read_bytes() == GZ_DATA
+    assert core.default_scheduler._running == 0
+
+def test_zip_stream_is_only_hashed_without_output(tmp_path, fake_7z):
+    archive = tmp_path / "test.zip"
+    write_hash_file(archive, "sha256", hashlib.sha256(ZIP_DATA).hexdigest())
+    (tmp_path / "test.zip.content.sha256").write_text("abc123\n")
+
+    results = verify_stream(io.BytesIO(ZIP_DATA), archive)
+
+    assert statuses(results) == ["PASSED", "SKIPPED", "SKIPPED"]
+    assert not archive.exists()
+    assert not fake_7z.exists()
+
+def test_create_from_zip_stream_tests_the_saved_copy(tmp_path, fake_7z):
+    archive = tmp_path / "test.zip"
+
+    hash_file, content_hash_file = create_from_stream(io.BytesIO(ZIP_DATA), archive, ["sha256", "blake2b"])
+
+    assert archive.read_bytes() == ZIP_DATA
+    assert hash_file.read_text().split()[0] == hashlib.sha256(ZIP_DATA).hexdigest()
+    assert (tmp_path / "test.zip.blake2b").exists()
+    assert content_hash_file.read_text() == "abc123\n"
+
+def test_timeout_kills_7z_and_leaves_no_output(tmp_path, fake_7z, monkeypatch):
+    monkeypatch.setenv("FAKE_7Z_HANG", "1")
+    archive = tmp_path / "test.tar.gz"
+
+    with pytest.raises(OperationTimedOut):
+        verify_stream(io.BytesIO(GZ_DATA), archive, output=True, cancel=CancelToken(timeout=0.5))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["7z.pid", "bin"]
+    assert core.default_scheduler._running == 0
+
+def test_copy_verifies_the_source_and_hashes_the_copy(tmp_path, fake_7z):
+    source = tmp_path / "src" / "test.tar.gz"
+    source.parent.mkdir()
+    source.write_bytes(GZ_DATA)
+    write_hash_file(source, "sha256", hashlib.sha256(GZ_DATA).hexdigest())
+    (tmp_path / "dst").mkdir()
+
+    result = copy_archive(source, tmp_path / "dst", reread=True)
+
+    assert result.destination == tmp_path / "dst" / "test.tar.gz"
+    assert result.destination.read_bytes() == GZ_DATA
+    assert statuses(result.results) == ["PASSED", "PASSED", "SKIPPED"]
+    assert result.reread is True
+    assert result.hash_file.read_text() == source.with_name("test.tar.gz.sha256").read_text()
+    assert result.content_hash_file.read_text() == "abc123\n"
+
+def test_copy_of_a_modified_source_writes_no_hash_files(tmp_path, fake_7z):
+    source = tmp_path / "test.zip"
+    source.write_bytes(ZIP_DATA)
+    write_hash_file(source, "sha256", hashlib.sha256(b"original").hexdigest())
+
+    result = copy_archive(source, tmp_path / "copy.zip")
+
+    assert result.results["layer1"]["status"] == "WARNING"
+    assert result.hash_file is None
+    # The unverified copy is removed, temporary name and all
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["7z.pid", "bin", "test.zip", "test.zip.sha256"]
+
+def test_copy_does_not_replace_an_existing_file_unless_forced(tmp_path, fake_7z):
+    source = tmp_path / "test.zip"
+    source.write_bytes(ZIP_DATA)
+    destination = tmp_path / "copy.zip"
+    destination.write_bytes(b"keep me")
+
+    with pytest.raises(FileExistsError):
+        copy_archive(source, destination)
+    assert destination.read_bytes() == b"keep me"
+
+    result = copy_archive(source, destination, force=True)
+    assert result.hash_file is not None
+    assert destination.read_bytes() == ZIP_DATA
+
+def test_copy_gets_the_default_file_mode(tmp_path, fake_7z):
+    source = tmp_path / "test.zip"
+    source.write_bytes(ZIP_DATA)
+    source.chmod(0o644)
+    umask = os.umask(0o022)
+    try:
+        result = copy_archive(source, tmp_path / "copy.zip")
+        create_from_stream(io.BytesIO(ZIP_DATA), tmp_path / "saved.zip", ["sha256"])
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(result.destination.stat().st_mode) == 0o644
+    assert stat.S_IMODE((tmp_path / "saved.zip").stat().st_mode) == 0o644
@@ -0,0 +1,72 @@
+import hashlib
+from unittest.mock import patch
+from tests.helpers import popen_7z
+from data_integrity_tool import sums
+from data_integrity_tool.core import create_hashes, find_hash_files, iter_archives, verify_layers
+from data_integrity_tool.sums import SUMS_FILE_NAME, load_sums, lookup_sums, update_sums
+
+def test_latest_line_wins_and_appends_are_read_incrementally(tmp_path):
+    archive = tmp_path / "a.zip"
+    update_sums(archive, {"SHA256": "AA", "CONTENT-SHA256": "bb"})
+    update_sums(archive, {"SHA256": "cc"})
+    assert lookup_sums(archive) == {"SHA256": "cc", "CONTENT-SHA256": "bb"}
+
+    # Another writer appends; a crash leaves a torn line behind
+    with open(tmp_path / SUMS_FILE_NAME, "a") as f:
+        f.write("SHA256 (b.zip) = dd\nSHA256 (c.zi")
+    assert lookup_sums(tmp_path / "b.zip") == {"SHA256": "dd"}
+    update_sums(tmp_path / "d.zip", {"SHA256": "ee", "CONTENT-SHA256": "ff-00000001"})
+    assert lookup_sums(tmp_path / "d.zip") == {"SHA256": "ee", "CONTENT-SHA256": "ff-00000001"}
+    assert lookup_sums(tmp_path / "c.zip") is None
+
+def test_index_keeps_only_recent_directories_with_sums(tmp_path, monkeypatch):
+    monkeypatch.setattr(sums, "MAX_INDEXED_DIRECTORIES", 2)
+    monkeypatch.setattr(sums, "_index", sums.OrderedDict())
+    directories = [tmp_path / name for name in ("a", "b", "c", "empty")]
+    for directory in directories:
+        directory.mkdir()
+    for directory in directories[:3]:
+        update_sums(directory / "x.zip", {"SHA256": "aa"})
+
+    for directory in directories:
+        load_sums(directory)
+    assert list(sums._index) == [sums.sums_path_for(d) for d in directories[1:3]]
+    # An evicted directory is simply read again
+    assert lookup_sums(directories[0] / "x.zip") == {"SHA256": "aa"}
+    assert not sums._write_locks
+
+def test_superseded_lines_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(sums, "COMPACT_MIN_LINES", 4)
+    for i in range(4):
+        update_sums(tmp_path / "a.zip", {"SHA256": f"{i:02x}"})
+    assert (tmp_path / SUMS_FILE_NAME).read_text() == "SHA256 (a.zip) = 03\n"
+
+    update_sums(tmp_path / "b.zip", {"SHA256": "ff"})
+    assert load_sums(tmp_path).entries == {"a.zip": {"SHA256": "03"}, "b.zip": {"SHA256": "ff"}}
+    assert list(tmp_path.iterdir()) == [tmp_path / SUMS_FILE_NAME]
+
+@patch("subprocess.Popen")
+@patch("shutil.which")
+def test_directory_sums_replace_sidecars(mock_which, mock_popen, tmp_path):
+    mock_which.return_value = "/usr/bin/7z"
+    mock_popen.side_effect = popen_7z(stdout="Everything is Ok\nSHA256 for data: abc123\n")
+    archive = tmp_path / "test.zip"
+    archive.write_bytes(b"data")
+
+    hash_file, content_hash_file = create_hashes(archive, directory_sums=True, algorithms=["sha256", "blake2b"])
+
+    assert hash_file == content_hash_file == tmp_path / SUMS_FILE_NAME
+    assert sorted(p.name for p in tmp_path.iterdir()) == [SUMS_FILE_NAME, "test.zip"]
+    assert f"SHA256 (test.zip) = {hashlib.sha256(b'data').hexdigest()}\n" in hash_file.read_text()
+
+    found = find_hash_files(archive)
+    assert found["archive_hashes"] == {"sha256": hash_file, "blake2b": hash_file}
+    assert found["content_hash"] == hash_file
+    [entry] = iter_archives(tmp_path)
+    assert entry.hash_file == entry.content_hash_file == hash_file
+
+    results = verify_layers(archive)
+    assert [results[name]["status"] for name in ("layer1", "layer2", "layer3")] == ["PASSED"] * 3
+
+    archive.write_bytes(b"changed")
+    assert verify_layers(archive)["layer1"]["details"]["algorithm"] == "sha256"
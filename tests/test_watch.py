@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from data_integrity_tool.watch import watch_directory
+
+@pytest.mark.parametrize("polling", [
+    True,
+    pytest.param(False, marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")),
+])
+@patch("data_integrity_tool.core.create_hashes")
+def test_new_archive_is_hashed_once_stable(mock_create, tmp_path, polling):
+    mock_create.side_effect = lambda path, **options: (path.with_name(path.name + ".sha256"), None)
+    (tmp_path / "old.zip").write_bytes(b"already here")
+    results = []
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_directory, args=(tmp_path, results.append, stop), kwargs={
+        "settle_seconds": 0.3, "poll_interval": 0.1, "polling": polling
+    })
+    watcher.start()
+    try:
+        time.sleep(0.2)
+        (tmp_path / "sub").mkdir()
+        with open(tmp_path / "sub" / "new.zip", "wb") as f:
+            # Still growing: must not be picked up before it settles
+            for _ in range(3):
+                f.write(b"x" * 1000)
+                f.flush()
+                time.sleep(0.15)
+            assert not results
+        (tmp_path / "notes.txt").write_text("ignored")
+
+        deadline = time.monotonic() + 5
+        while not results and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        watcher.join()
+
+    assert [r.archive_path.name for r in results] == ["new.zip"]
+    assert results[0].status == "CREATED"
+    mock_create.assert_called_once()
+
+@pytest.mark.parametrize("polling", [
+    True,
+    pytest.param(False, marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")),
+])
+@patch("data_integrity_tool.core.create_hashes")
+def test_archive_put_back_after_deletion_is_hashed_again(mock_create, tmp_path, polling):
+    mock_create.side_effect = lambda path, **options: (path.with_name(path.name + ".sha256"), None)
+    results = []
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_directory, args=(tmp_path, results.append, stop), kwargs={
+        "settle_seconds": 0.2, "poll_interval": 0.1, "polling": polling
+    })
+    watcher.start()
+
+    def wait_for(count):
+        deadline = time.monotonic() + 5
+        while len(results) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    try:
+        time.sleep(0.2)
+        archive = tmp_path / "a.zip"
+        archive.write_bytes(b"data")
+        st = archive.stat()
+        wait_for(1)
+        archive.unlink()
+        time.sleep(0.5)
+        # Restored unchanged, e.g. by cp -p: same size and mtime
+        archive.write_bytes(b"data")
+        os.utime(archive, ns=(st.st_atime_ns, st.st_mtime_ns))
+        wait_for(2)
+    finally:
+        stop.set()
+        watcher.join()
+
+    assert [r.archive_path.name for r in results] == ["a.zip", "a.zip"]